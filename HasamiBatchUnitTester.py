@@ -0,0 +1,74 @@
+# Description: Hasami Shogi Game batched boards unit tester
+
+import unittest
+
+import numpy as np
+
+from hasamishogigame import HasamiShogiGame, CELL_NAMES
+from hasamibatch import BatchedHasamiBoards, BLACK, RED, EMPTY
+
+
+class TestBatchedHasamiBoards(unittest.TestCase):
+    """Contains unit tests for the BatchedHasamiBoards class"""
+
+    def assert_same_game(self, batch, index, game):
+        """Checks that a game of the batch is in the same position as a HasamiShogiGame"""
+        values = {'NONE': EMPTY, 'BLACK': BLACK, 'RED': RED}
+        board = [values[game.get_square_occupant(cell)] for cell in CELL_NAMES]
+        self.assertEqual(board, batch.boards[index].ravel().tolist())
+        self.assertEqual(game.get_active_player(), batch.get_active_player(index))
+        self.assertEqual(game.get_game_state(), batch.get_game_state(index))
+        self.assertEqual(game.get_num_captured_pieces('BLACK'), batch.captured[index, 0])
+        self.assertEqual(game.get_num_captured_pieces('RED'), batch.captured[index, 1])
+
+    def test_start(self):
+        """Tests the starting boards and their legal moves"""
+        batch = BatchedHasamiBoards(3)
+        self.assertEqual([63, 63, 63], batch.count_legal_moves().tolist())
+        self.assertEqual(sorted(HasamiShogiGame().legal_moves()), sorted(batch.legal_moves(1)))
+        self.assert_same_game(batch, 2, HasamiShogiGame())
+
+    def test_captures(self):
+        """Tests a row capture and a corner capture against HasamiShogiGame"""
+        moves = [[('i6', 'd6'), ('a5', 'd5'), ('i8', 'h8'), ('a4', 'd4'), ('i3', 'd3')],
+                 [('i9', 'b9'), ('a8', 'b8'), ('i8', 'c8'), ('b8', 'b4'), ('c8', 'a8')]]
+        batch = BatchedHasamiBoards(2)
+        games = [HasamiShogiGame(), HasamiShogiGame()]
+        for ply in range(5):
+            starts = np.array([CELL_NAMES.index(moves[index][ply][0]) for index in range(2)])
+            ends = np.array([CELL_NAMES.index(moves[index][ply][1]) for index in range(2)])
+            counts = batch.apply_moves(starts, ends)
+            for index in range(2):
+                games[index].make_move(*moves[index][ply])
+        self.assertEqual([2, 1], counts.tolist())
+        for index in range(2):
+            self.assert_same_game(batch, index, games[index])
+
+    def test_random_games_match(self):
+        """Tests that random batched games play out exactly like HasamiShogiGame, game for game"""
+        batch = BatchedHasamiBoards(64)
+        games = [HasamiShogiGame() for _ in range(64)]
+        rng = np.random.default_rng(3)
+        for ply in range(500):
+            starts, ends = batch.random_moves(rng)
+            if ply % 100 == 0:
+                self.assertEqual([game.count_legal_moves() for game in games], batch.count_legal_moves().tolist())
+                self.assertEqual(sorted(games[ply % 64].legal_moves()), sorted(batch.legal_moves(ply % 64)))
+            batch.apply_moves(starts, ends)
+            for index, game in enumerate(games):
+                if starts[index] >= 0:
+                    self.assertTrue(game.make_move(CELL_NAMES[starts[index]], CELL_NAMES[ends[index]]))
+                else:
+                    self.assertEqual([], list(game.legal_moves()))
+        self.assertTrue((batch.state != 0).any())
+        for index, game in enumerate(games):
+            self.assert_same_game(batch, index, game)
+
+    def test_from_games(self):
+        """Tests loading the positions of HasamiShogiGame objects"""
+        game = HasamiShogiGame()
+        game.make_move('i6', 'd6')
+        game.make_move('a5', 'd5')
+        batch = BatchedHasamiBoards.from_games([HasamiShogiGame(), game])
+        self.assert_same_game(batch, 1, game)
+        self.assertEqual(batch.count_legal_moves()[1], game.count_legal_moves())
@@ -0,0 +1,100 @@
+# Description: Hasami Shogi Game opening book unit tester
+
+import os
+import tempfile
+import unittest
+
+from hasamibench import random_game
+from hasamibook import OpeningBook, BOOK_ENTRY, build_book, count_moves, self_play
+from hasamirecord import GameRecordReader, GameRecordWriter
+from hasamisearch import SearchEngine
+from hasamishogigame import HasamiShogiGame, CELL_INDEX, MIRROR, board_geometry, transform_move
+
+
+class TestOpeningBook(unittest.TestCase):
+    """Contains unit tests for building, reading and playing from the opening book"""
+
+    def setUp(self):
+        """Writes a record file of random games, each game played twice, and builds a book of its first 4 plies"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.records = os.path.join(self.directory.name, 'games.hsgr')
+        self.path = os.path.join(self.directory.name, 'book.hsob')
+        self.games = []
+        with GameRecordWriter(self.records) as writer:
+            for seed in range(6):
+                moves = random_game(seed, 60)
+                game = HasamiShogiGame()
+                for move in moves:
+                    game.make_move(*move)
+                result = ('BLACK_WON', 'RED_WON', 'UNFINISHED')[seed % 3]
+                writer.write_game(moves, result)
+                writer.write_game(moves, result)
+                self.games.append((moves, result))
+        self.num_games, self.num_entries = build_book([self.records], self.path, max_plies=4)
+
+    def tearDown(self):
+        """Removes the temporary directory"""
+        self.directory.cleanup()
+
+    def test_build(self):
+        """Tests the entries of the start position and the size of the file"""
+        self.assertEqual(12, self.num_games)
+        with OpeningBook(self.path) as book:
+            self.assertEqual((4, 12, self.num_entries), (book.max_plies, book.num_games, book.num_entries))
+            moves = book.probe(HasamiShogiGame())
+            self.assertEqual(12, sum(move[2] for move in moves))
+            # The start position is its own mirror image, so a move and its mirror image share an entry
+            first = self.games[0][0][0]
+            found = [move for move in moves if move[:2] in (first, transform_move(first, MIRROR))]
+            self.assertEqual(1, len(found))
+            self.assertGreaterEqual(found[0][2], 2)
+            self.assertEqual([], book.probe_key(12345))
+        self.assertEqual(self.num_entries * BOOK_ENTRY.size, os.path.getsize(self.path) - 10)
+
+    def test_min_count(self):
+        """Tests the move counts and that moves played too few times are not picked"""
+        squares = [([(CELL_INDEX[start], CELL_INDEX[end]) for start, end in moves], result)
+                   for moves, result in self.games]
+        counts, _ = count_moves(squares, 4)
+        self.assertEqual(self.num_entries, len(counts))
+        self.assertEqual(len(self.games) * 4, sum(played for played, _ in counts.values()))
+        with OpeningBook(self.path) as book:
+            game = HasamiShogiGame()
+            most = max(move[2] for move in book.probe(game))
+            self.assertIsNone(book.best_move(game, min_count=most + 1))
+            self.assertEqual(most, book.best_move(game, min_count=most)[2])
+
+    def test_engine(self):
+        """Tests that the engine plays the book move in the book and searches once out of it"""
+        moves, _ = self.games[0]
+        with OpeningBook(self.path) as book:
+            engine = SearchEngine(table_bits=10, book=book)
+            game = HasamiShogiGame()
+            # Black won games 0 and 3, so their first moves score best
+            best = [moves[0], self.games[3][0][0]]
+            best += [transform_move(move, MIRROR) for move in best]
+            self.assertIn(engine.best_move(game, max_depth=2), best)
+            self.assertTrue(engine.stats['book'])
+            self.assertEqual(0, engine.stats['nodes'])
+            for move in moves[:4]:
+                game.make_move(*move)
+            self.assertIsNotNone(engine.best_move(game, max_depth=1))
+            self.assertFalse(engine.stats['book'])
+            self.assertGreater(engine.stats['nodes'], 0)
+
+            # The book is for the standard board, games on other boards are searched
+            large = HasamiShogiGame(board_geometry(13, 13))
+            self.assertEqual([], book.probe(large))
+            self.assertIsNotNone(engine.best_move(large, max_depth=1))
+            self.assertFalse(engine.stats['book'])
+
+    def test_self_play(self):
+        """Tests that self-play games are written to a record file"""
+        records = os.path.join(self.directory.name, 'selfplay.hsgr')
+        self_play(records, 2, depth=1, workers=1, max_plies=20)
+        with GameRecordReader(records) as reader:
+            self.assertEqual(2, len(list(reader)))
+
+
+if __name__ == '__main__':
+    unittest.main()
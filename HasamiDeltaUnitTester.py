@@ -0,0 +1,68 @@
+# Description: Hasami Shogi Game move delta unit tester
+
+import unittest
+
+from hasamibench import random_game
+from hasamidelta import DELTA_HEADER_SIZE, DeltaBoard, decode_delta, encode_delta, iter_deltas
+from hasamishogigame import HasamiShogiGame, CELL_INDEX, CELL_NAMES, MoveDelta, board_geometry
+
+
+class TestMoveDelta(unittest.TestCase):
+    """Contains unit tests for move deltas, their packing and the client board that applies them"""
+
+    def test_last_delta(self):
+        """Tests the delta of a capturing move"""
+        game = HasamiShogiGame()
+        self.assertIsNone(game.last_delta())
+        game.make_move('i4', 'e4')
+        self.assertEqual(MoveDelta(CELL_INDEX['i4'], CELL_INDEX['e4'], (), 'RED', 'UNFINISHED'), game.last_delta())
+        game.make_move('a5', 'e5')
+        # Black closes e5 in between e4 and e6
+        game.make_move('i6', 'e6')
+        self.assertEqual(MoveDelta(CELL_INDEX['i6'], CELL_INDEX['e6'], (CELL_INDEX['e5'],), 'RED', 'UNFINISHED'),
+                         game.last_delta())
+
+    def test_encode_decode(self):
+        """Tests that deltas come back unchanged, alone and as a stream"""
+        deltas = [MoveDelta(72, 0, (), 'RED', 'UNFINISHED'), MoveDelta(10, 13, (12, 14, 22), 'BLACK', 'UNFINISHED'),
+                  MoveDelta(80, 8, (7,), 'RED', 'BLACK_WON')]
+        data = b''.join(encode_delta(delta) for delta in deltas)
+        self.assertEqual(3 * DELTA_HEADER_SIZE + 4, len(data))
+        self.assertEqual(deltas, list(iter_deltas(data)))
+        self.assertEqual((deltas[1], len(data) - 4), decode_delta(data, DELTA_HEADER_SIZE))
+        with self.assertRaises(ValueError):
+            decode_delta(data[:-1], DELTA_HEADER_SIZE * 2 + 3)
+        # Bad state bits and squares off the board are errors too
+        for bad in ([0, 1, 0x60], [0, 1, 0x80], [81, 1, 0], [0, 255, 0], [0, 1, 1, 81]):
+            with self.assertRaises(ValueError):
+                decode_delta(bytes(bad))
+
+        # Squares of larger boards don't fit the format, so other boards are rejected
+        geometry = board_geometry(19, 19)
+        with self.assertRaises(ValueError):
+            encode_delta(MoveDelta(342, 300, (), 'RED', 'UNFINISHED'), geometry)
+        with self.assertRaises(ValueError):
+            DeltaBoard(geometry=geometry)
+
+    def test_apply(self):
+        """Tests that a client board following the deltas of whole games stays equal to the game"""
+        for seed in range(20):
+            game = HasamiShogiGame()
+            board = DeltaBoard()
+            for cell_start, cell_end in random_game(seed, 200):
+                game.make_move(cell_start, cell_end)
+                board.apply(encode_delta(game.last_delta()))
+                self.assertEqual(bytes(game.save_state()), bytes(board.save_state()))
+            self.assertEqual(game.get_game_state(), board.game_state)
+            for cell in CELL_NAMES:
+                self.assertEqual(game.get_square_occupant(cell), board.get_square_occupant(cell))
+
+        # A client joining late starts from the game's state
+        late = DeltaBoard(game.save_state())
+        self.assertEqual(game.get_bitboards(), late.get_bitboards())
+        self.assertEqual(game.get_num_captured_pieces('RED'), late.get_num_captured_pieces('RED'))
+        self.assertEqual('i B B B B B B B B B', DeltaBoard().rows()[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# Description: Hasami Shogi Game batch evaluation features unit tester
+
+import unittest
+
+import numpy as np
+
+from hasamibench import random_game
+from hasamibatch import BatchedHasamiBoards, BLACK, RED
+from hasamishogigame import HasamiShogiGame, CompactGameState, ROW_MASKS, COLUMN_MASKS
+from hasamisearch import SearchEngine
+import hasamifeatures
+from hasamifeatures import FEATURE_NAMES, batch_evaluate, batch_features, positions_from_games, turns_from_games
+
+
+def threatened_pieces(game, player):
+    """Counts a player's pieces that the opponent could capture with one move, by making every opponent move"""
+    boards = game.get_bitboards()
+    opponent = 1 - player
+    test = HasamiShogiGame()
+    test.load_state(CompactGameState.pack(boards, ('BLACK', 'RED')[opponent], game.get_num_captured_pieces('BLACK'),
+                                          game.get_num_captured_pieces('RED')))
+    captured = 0
+    for move in list(test.legal_moves()):
+        test.make_move(*move)
+        captured |= boards[player] & ~test.get_bitboards()[player]
+        test.unmake_move()
+    return captured.bit_count()
+
+
+class TestBatchFeatures(unittest.TestCase):
+    """Contains unit tests for the batch features and scores"""
+
+    def setUp(self):
+        """Plays random games of different lengths"""
+        self.games = []
+        for seed in range(60):
+            game = HasamiShogiGame()
+            for cell_start, cell_end in random_game(seed, 10 + seed * 3):
+                game.make_move(cell_start, cell_end)
+            self.games.append(game)
+
+    def test_positions(self):
+        """Tests the position array built from the bitboards against the batched boards"""
+        positions = positions_from_games(self.games)
+        self.assertEqual((len(self.games), 81), positions.shape)
+        self.assertEqual(positions.tolist(),
+                         BatchedHasamiBoards.from_games(self.games).boards.reshape(len(self.games), 81).tolist())
+
+    def test_features(self):
+        """Tests every feature against the games, the threats against making every capture"""
+        features = batch_features(positions_from_games(self.games))
+        self.assertEqual((len(self.games), len(FEATURE_NAMES)), features.shape)
+        for game, row in zip(self.games, features.tolist()):
+            material, mobility, threatened, edge, corner = row
+            self.assertEqual(game.get_num_captured_pieces('RED') - game.get_num_captured_pieces('BLACK'), material)
+            self.assertEqual(game.count_legal_moves('BLACK') - game.count_legal_moves('RED'), mobility)
+            if game.get_game_state() == 'UNFINISHED':
+                self.assertEqual(threatened_pieces(game, 0) - threatened_pieces(game, 1), threatened)
+            black, red = game.get_bitboards()
+            corners = 1 | 1 << 8 | 1 << 72 | 1 << 80
+            edges = (ROW_MASKS[0] | ROW_MASKS[-1] | COLUMN_MASKS[0] | COLUMN_MASKS[-1]) & ~corners
+            self.assertEqual((black & edges).bit_count() - (red & edges).bit_count(), edge)
+            self.assertEqual((black & corners).bit_count() - (red & corners).bit_count(), corner)
+        start = batch_features(positions_from_games([HasamiShogiGame()]))[0].tolist()
+        self.assertEqual([0, 0, 0, 0, 0], start)
+
+    def test_scores(self):
+        """Tests the default scores against SearchEngine.evaluate, and the scores for the player to move"""
+        positions = positions_from_games(self.games)
+        engine = SearchEngine(table_bits=1)
+        _, scores = batch_evaluate(positions)
+        self.assertEqual([engine.evaluate(game, 'BLACK') for game in self.games], scores.tolist())
+        turns = turns_from_games(self.games)
+        self.assertEqual([BLACK if game.get_active_player() == 'BLACK' else RED for game in self.games], turns.tolist())
+        _, scores = batch_evaluate(positions, turn=turns)
+        self.assertEqual([engine.evaluate(game, game.get_active_player()) for game in self.games], scores.tolist())
+        features, scores = batch_evaluate(positions, weights=[0, 0, 0, 1, 0])
+        self.assertEqual(features[:, 3].tolist(), scores.tolist())
+
+    def test_chunks(self):
+        """Tests that positions split over several chunks give the same features"""
+        positions = positions_from_games(self.games)
+        expected = batch_features(positions)
+        chunk_size = hasamifeatures.CHUNK_SIZE
+        hasamifeatures.CHUNK_SIZE = 7
+        try:
+            self.assertEqual(expected.tolist(), batch_features(positions).tolist())
+        finally:
+            hasamifeatures.CHUNK_SIZE = chunk_size
+        self.assertEqual((0, len(FEATURE_NAMES)), batch_features(np.zeros((0, 81), dtype=np.int8)).shape)
+
+
+if __name__ == '__main__':
+    unittest.main()
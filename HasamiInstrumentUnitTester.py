@@ -0,0 +1,74 @@
+# Description: Hasami Shogi Game instrumentation unit tester
+
+import unittest
+import hasamiinstrument
+from hasamibench import random_game
+from hasamishogigame import HasamiShogiGame
+
+
+def play(moves):
+    """Plays moves on a new game and returns the final position"""
+    game = HasamiShogiGame()
+    for cell_start, cell_end in moves:
+        game.make_move(cell_start, cell_end)
+    return game.save_state(), game.get_game_state(), game.position_key()
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Contains unit tests for the opt-in instrumentation"""
+
+    def setUp(self):
+        """Starts every test with instrumentation on and empty counters"""
+        self.original = HasamiShogiGame.make_move
+        hasamiinstrument.enable()
+        hasamiinstrument.reset()
+
+    def tearDown(self):
+        """Turns instrumentation off"""
+        hasamiinstrument.disable()
+        hasamiinstrument.reset()
+
+    def test_same_results(self):
+        """Tests that games play out the same with instrumentation on and off"""
+        games = [random_game(seed, 1000) for seed in range(3)]
+        instrumented = [play(moves) for moves in games]
+        hasamiinstrument.disable()
+        self.assertEqual([play(moves) for moves in games], instrumented)
+
+    def test_counters(self):
+        """Tests the call counts, capture histogram and dump"""
+        moves = random_game(4, 1000)
+        hasamiinstrument.reset()
+        play(moves)
+        game = HasamiShogiGame()
+        self.assertFalse(game.make_move('i1', 'h2'))
+        self.assertEqual(63, len(list(game.legal_moves())))
+
+        stats = hasamiinstrument.snapshot()
+        self.assertEqual(len(moves) + 1, stats['calls']['make_move'])
+        self.assertEqual(len(moves), stats['moves'])
+        self.assertEqual(len(moves), sum(stats['captures'].values()))
+        game = HasamiShogiGame()
+        for cell_start, cell_end in moves:
+            game.make_move(cell_start, cell_end)
+        pieces = sum(count * captured for captured, count in stats['captures'].items())
+        self.assertEqual(game.get_num_captured_pieces('BLACK') + game.get_num_captured_pieces('RED'), pieces)
+        self.assertEqual(1, stats['calls']['legal_moves'])
+        self.assertGreater(stats['seconds']['make_move'], 0)
+
+        dump = hasamiinstrument.dump(stats)
+        self.assertIn('hasami_method_calls_total{method="make_move"} %d\n' % (len(moves) + 1), dump)
+        self.assertIn('hasami_moves_total %d\n' % len(moves), dump)
+
+        hasamiinstrument.reset()
+        self.assertEqual({}, hasamiinstrument.snapshot()['calls'])
+
+    def test_disable(self):
+        """Tests that disable puts the original methods back"""
+        self.assertTrue(hasamiinstrument.enabled())
+        self.assertIsNot(self.original, HasamiShogiGame.make_move)
+        hasamiinstrument.disable()
+        self.assertFalse(hasamiinstrument.enabled())
+        self.assertIs(self.original, HasamiShogiGame.make_move)
+        HasamiShogiGame().make_move('i1', 'c1')
+        self.assertEqual({}, hasamiinstrument.snapshot()['calls'])
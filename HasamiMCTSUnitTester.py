@@ -0,0 +1,61 @@
+# Description: Hasami Shogi Game Monte Carlo Tree Search player unit tester
+
+import random
+import unittest
+from hasamishogigame import HasamiShogiGame
+from hasamimcts import MCTSPlayer, rollout
+from hasamitournament import make_player
+
+
+class TestMCTSPlayer(unittest.TestCase):
+    """Contains unit tests for the MCTSPlayer class"""
+
+    def setUp(self):
+        """Sets up a game where Black can capture two Red pieces with i3 to d3"""
+        self.game = HasamiShogiGame()
+        self.game.make_move('i6', 'd6')
+        self.game.make_move('a5', 'd5')
+        self.game.make_move('i8', 'h8')
+        self.game.make_move('a4', 'd4')
+        self.rng = random.Random(0)
+
+    def test_rollout_leaves_game_unchanged(self):
+        """Tests that a rollout takes back all its moves"""
+        key = self.game.position_key()
+        self.assertIn(rollout(self.game, self.rng), ('BLACK', 'RED', 'DRAW'))
+        self.assertEqual(key, self.game.position_key())
+
+    def test_finds_win(self):
+        """Tests that the player takes a winning capture"""
+        # Both players are two pieces from losing, so only the capture wins for sure
+        self.game._player_cap_pieces[0][1] = 6
+        self.game._player_cap_pieces[1][1] = 6
+        player = MCTSPlayer(playouts=400, rollout_plies=20)
+        key = self.game.position_key()
+        self.assertEqual(('i3', 'd3'), player.choose_move(self.game, self.rng))
+        self.assertEqual(key, self.game.position_key())
+        self.assertEqual(400, player.stats['playouts'])
+        self.assertGreater(player.stats['playouts_per_sec'], 0)
+
+    def test_tree_reuse(self):
+        """Tests that the subtree of the played moves is kept for the next move"""
+        player = MCTSPlayer(playouts=300, rollout_plies=10)
+        move = player.choose_move(self.game, self.rng)
+        self.game.make_move(*move)
+        reply = max(player._root.children, key=lambda child: child.visits).move
+        self.game.make_move(*reply)
+        player.choose_move(self.game, self.rng)
+        self.assertGreater(player.stats['reused_visits'], 0)
+        self.assertEqual(player.stats['reused_visits'] + 300, player.stats['root_visits'])
+
+    def test_time_limit_and_workers(self):
+        """Tests the time budget with rollouts in worker processes"""
+        player = make_player('mcts:playouts=None,time=0.3,workers=1,batch=4,rollout_plies=10')
+        try:
+            move = player.choose_move(self.game, self.rng)
+        finally:
+            player.close()
+        self.assertIn(move, list(self.game.legal_moves()))
+        self.assertGreater(player.stats['playouts'], 0)
+        self.assertLess(player.stats['seconds'], 2.0)
+        self.assertIn('playouts/sec', player.report())
@@ -0,0 +1,36 @@
+# Description: Hasami Shogi Game perft unit tester
+
+import unittest
+from hasamiperft import PERFT_POSITIONS, PerftCounts, check_position, perft, setup_position
+
+
+class TestPerft(unittest.TestCase):
+    """Contains unit tests for the perft move counts"""
+
+    def test_reference_counts(self):
+        """Tests every stored position against its reference counts to depth 2"""
+        for name in PERFT_POSITIONS:
+            counts, seconds, matches = check_position(name, 2)
+            self.assertTrue(matches, name)
+            self.assertEqual(PERFT_POSITIONS[name][-1][:2], counts)
+
+    def test_position_unchanged(self):
+        """Tests that perft takes back every move and counts the same moves as legal_moves"""
+        for board, player_turn, black_captured, red_captured, reference in PERFT_POSITIONS.values():
+            game = setup_position(board, player_turn, black_captured, red_captured)
+            state = game.save_state()
+            key = game.position_key()
+            self.assertEqual(len(list(game.legal_moves())), perft(game, 2)[0].nodes)
+            self.assertEqual(state, game.save_state())
+            self.assertEqual(key, game.position_key())
+
+    def test_finished_game(self):
+        """Tests that a won game has no moves to count"""
+        game = setup_position(*PERFT_POSITIONS['endgame'][:-1])
+        for move in list(game.legal_moves()):
+            game.make_move(*move)
+            if game.get_game_state() == 'RED_WON':
+                break
+            game.unmake_move()
+        self.assertEqual('RED_WON', game.get_game_state())
+        self.assertEqual([PerftCounts(0, 0, 0, 0)], perft(game, 1))
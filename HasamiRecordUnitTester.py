@@ -0,0 +1,81 @@
+# Description: Hasami Shogi Game binary game record unit tester
+
+import os
+import tempfile
+import unittest
+from hasamibench import random_game
+from hasamishogigame import HasamiShogiGame, CELL_NAMES
+from hasamirecord import GameRecordWriter, GameRecordReader, FILE_MAGIC, GAME_HEADER
+
+
+class TestGameRecords(unittest.TestCase):
+    """Contains unit tests for the game record writer and reader"""
+
+    def setUp(self):
+        """Writes three random games to a record file"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.hsg')
+        self.games = []
+        with GameRecordWriter(self.path) as writer:
+            for seed in (0, 1, 5):
+                moves = random_game(seed, 1000)
+                game = HasamiShogiGame()
+                for cell_start, cell_end in moves:
+                    game.make_move(cell_start, cell_end)
+                writer.write_game(moves, game.get_game_state())
+                self.games.append((moves, game))
+
+    def tearDown(self):
+        """Removes the temporary directory"""
+        self.directory.cleanup()
+
+    def test_size(self):
+        """Tests that each move takes 2 bytes"""
+        size = len(FILE_MAGIC) + sum(GAME_HEADER.size + 2 * len(moves) for moves, _ in self.games)
+        self.assertEqual(size, os.path.getsize(self.path))
+
+    def test_read_and_replay(self):
+        """Tests that the games read back replay to the same positions"""
+        with GameRecordReader(self.path) as reader:
+            records = list(reader)
+            self.assertEqual(3, len(records))
+            for record, (moves, game) in zip(records, self.games):
+                self.assertEqual(game.get_game_state(), record.result)
+                self.assertEqual(len(moves), record.plies)
+                self.assertEqual(moves, record.moves())
+                replayed = record.replay()
+                self.assertEqual(game.position_key(), replayed.position_key())
+                self.assertEqual(game.get_num_captured_pieces('RED'), replayed.get_num_captured_pieces('RED'))
+            self.assertEqual(records[2].moves(), reader.game_at(records[2].offset).moves())
+            self.assertEqual(self.games[1][0][:3], records[1].moves()[:3])
+            self.assertEqual(CELL_NAMES.index(self.games[0][0][0][0]), records[0].squares()[0][0])
+
+    def test_append_and_cut_off(self):
+        """Tests appending to an existing file, and that a game cut off at the end is left out"""
+        with GameRecordWriter(self.path) as writer:
+            writer.write_game([('i1', 'c1'), ('a1', 'b1')], 'UNFINISHED')
+        with open(self.path, 'ab') as records:
+            records.write(GAME_HEADER.pack(0, 10) + b'\x00\x01')
+        with GameRecordReader(self.path) as reader:
+            records = list(reader)
+            self.assertEqual(4, len(records))
+            self.assertEqual([('i1', 'c1'), ('a1', 'b1')], records[3].moves())
+
+        # A writer opened after the cut off game removes it, so the games it appends are read
+        size = os.path.getsize(self.path)
+        with GameRecordWriter(self.path) as writer:
+            writer.write_game([('i2', 'c2')], 'RED_WON')
+        # The new game is as long as the cut off bytes it replaces
+        self.assertEqual(size, os.path.getsize(self.path))
+        with GameRecordReader(self.path) as reader:
+            records = list(reader)
+            self.assertEqual(5, len(records))
+            self.assertEqual(([('i2', 'c2')], 'RED_WON'), (records[4].moves(), records[4].result))
+
+    def test_not_a_record_file(self):
+        """Tests that other files are refused"""
+        other = os.path.join(self.directory.name, 'other.txt')
+        with open(other, 'w') as text:
+            text.write('i1 c1')
+        with self.assertRaises(ValueError):
+            GameRecordReader(other)
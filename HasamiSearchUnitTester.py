@@ -0,0 +1,61 @@
+# Description: Hasami Shogi Game search engine unit tester
+
+import unittest
+from hasamishogigame import HasamiShogiGame, CompactGameState
+from hasamisearch import SearchEngine, best_move, WIN_BOUND
+
+
+class TestSearchEngine(unittest.TestCase):
+    """Contains unit tests for the SearchEngine class and best_move"""
+
+    def setUp(self):
+        """Sets up a game where Black can capture two Red pieces with i3 to d3"""
+        self.game = HasamiShogiGame()
+        self.game.make_move('i6', 'd6')
+        self.game.make_move('a5', 'd5')
+        self.game.make_move('i8', 'h8')
+        self.game.make_move('a4', 'd4')
+        self.engine = SearchEngine(table_bits=12)
+
+    def test_finds_capture(self):
+        """Tests that the search takes the two pieces"""
+        move = self.engine.best_move(self.game, max_depth=2)
+        self.assertEqual(('i3', 'd3'), move)
+        self.assertEqual(2, self.engine.stats['depth'])
+
+    def test_capture_order(self):
+        """Tests that ordering captures first finds the same move"""
+        engine = SearchEngine(table_bits=12, capture_order=True)
+        self.assertEqual(('i3', 'd3'), engine.best_move(self.game, max_depth=3))
+
+    def test_finds_win(self):
+        """Tests that the search finds a winning capture and scores it as a win"""
+        self.game._player_cap_pieces[1][1] = 6
+        move = self.engine.best_move(self.game, max_depth=3)
+        self.assertEqual(('i3', 'd3'), move)
+        self.assertGreater(self.engine.stats['score'], WIN_BOUND)
+
+    def test_game_unchanged(self):
+        """Tests that the game is in the same position after the search"""
+        key = self.game.position_key()
+        self.engine.best_move(self.game, max_depth=3)
+        self.assertEqual(key, self.game.position_key())
+        self.assertEqual('BLACK', self.game.get_active_player())
+        self.assertTrue(self.game.unmake_move())
+        self.assertEqual('NONE', self.game.get_square_occupant('d4'))
+
+    def test_time_limit(self):
+        """Tests that the search stops close to the time limit and reports its statistics"""
+        move = self.engine.best_move(HasamiShogiGame(), max_depth=50, time_limit=0.05)
+        self.assertIsNotNone(move)
+        self.assertLess(self.engine.stats['seconds'], 0.5)
+        self.assertGreater(self.engine.stats['nodes_per_sec'], 0)
+        self.assertTrue(0.0 <= self.engine.stats['table_hit_rate'] <= 1.0)
+        self.assertIn('nodes/sec', self.engine.report())
+
+    def test_best_move_finished_game(self):
+        """Tests that there is no move once the game is over"""
+        # The game state is kept by the moves, so a finished position is loaded rather than made by editing counts
+        self.game.load_state(CompactGameState.pack(self.game.get_bitboards(), 'BLACK', 0, 8))
+        self.assertEqual('BLACK_WON', self.game.get_game_state())
+        self.assertIsNone(best_move(self.game, max_depth=2))
@@ -0,0 +1,96 @@
+# Description: Hasami Shogi Game asyncio server unit tester
+
+import asyncio
+import json
+import unittest
+from hasamiserver import HasamiServer, encode, run_load
+
+
+class TestGameServer(unittest.IsolatedAsyncioTestCase):
+    """Contains unit tests for the game server and the load generator"""
+
+    async def asyncSetUp(self):
+        """Starts a server on a free port"""
+        self.server = HasamiServer(idle_timeout=0.2)
+        self.port = await self.server.start('127.0.0.1', 0)
+
+    async def asyncTearDown(self):
+        """Stops the server"""
+        await self.server.close()
+
+    async def connect(self):
+        """Opens a client connection"""
+        return await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def request(self, connection, **request):
+        """Sends a request and reads the next message"""
+        reader, writer = connection
+        writer.write(encode(request))
+        await writer.drain()
+        return await self.receive(connection)
+
+    async def receive(self, connection):
+        """Reads the next message"""
+        return json.loads(await asyncio.wait_for(connection[0].readline(), 5))
+
+    async def test_play(self):
+        """Tests joining a game, moves pushed to both players and move errors"""
+        black = await self.connect()
+        red = await self.connect()
+        joined = await self.request(black, op='join', game='g')
+        self.assertEqual({'type': 'joined', 'game': 'g', 'player': 'BLACK'}, joined)
+        self.assertEqual('RED', (await self.request(red, op='join', game='g'))['player'])
+        self.assertEqual('BLACK', (await self.receive(black))['active_player'])
+        self.assertNotIn('move', await self.receive(red))
+
+        self.assertEqual('not your turn', (await self.request(red, op='move', game='g', start='a1', end='b1'))['error'])
+        illegal = await self.request(black, op='move', game='g', start='i1', end='h2')
+        self.assertEqual('illegal move', illegal['error'])
+        state = await self.request(black, op='move', game='g', start='i1', end='c1')
+        self.assertEqual(['i1', 'c1'], state['move'])
+        self.assertEqual([], state['captured_cells'])
+        self.assertEqual('RED', state['active_player'])
+        self.assertEqual(state, await self.receive(red))
+        self.assertEqual('side is taken', (await self.request(await self.connect(), op='join', game='g',
+                                                             player='RED'))['error'])
+
+        # Leaving closes the game for both players
+        closed = await self.request(red, op='leave', game='g')
+        self.assertEqual({'type': 'closed', 'game': 'g', 'reason': 'left'}, closed)
+        self.assertEqual(closed, await self.receive(black))
+        self.assertEqual(0, self.server.num_games())
+
+    async def test_line_too_long(self):
+        """Tests that a request line over the stream limit gets an error reply and closes the connection"""
+        # One byte over the default limit of 64 KiB, so the server has read every byte sent when it gives up
+        connection = await self.connect()
+        connection[1].write(b'x' * ((1 << 16) + 1))
+        await connection[1].drain()
+        self.assertTrue((await self.receive(connection))['error'].startswith('bad request'))
+        self.assertEqual(b'', await asyncio.wait_for(connection[0].read(), 5))
+        self.assertEqual('BLACK', (await self.request(await self.connect(), op='join', game='g'))['player'])
+
+    async def test_disconnect_and_timeout(self):
+        """Tests that games close when a player goes away or nobody moves"""
+        black = await self.connect()
+        red = await self.connect()
+        await self.request(black, op='join', game='g1')
+        await self.request(red, op='join', game='g1')
+        await self.receive(black)
+        await self.receive(red)
+        black[1].close()
+        self.assertEqual('disconnected', (await self.receive(red))['reason'])
+
+        await self.request(red, op='join', game='g2')
+        self.assertEqual('timeout', (await self.receive(red))['reason'])
+        self.assertEqual(1, self.server.stats['timeouts'])
+        self.assertEqual(0, self.server.num_games())
+
+    async def test_load(self):
+        """Tests the load generator plays every game to the end"""
+        summary = await run_load('127.0.0.1', self.port, num_games=50, connections=4, plies=10, think=0.001)
+        self.assertEqual(0, summary['errors'])
+        self.assertLessEqual(summary['moves'], 500)
+        self.assertEqual(summary['moves'], self.server.stats['moves'])
+        self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+        self.assertEqual(0, self.server.num_games())
@@ -0,0 +1,166 @@
+# Description: Hasami Shogi Game endgame tablebase unit tester
+
+import functools
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from hasamishogigame import HasamiShogiGame, CompactGameState, CELL_NAMES, board_geometry, capture_mask
+from hasamisearch import SearchEngine, WIN_SCORE
+from hasamitablebase import Tablebase, class_size, combination_rank, describe, position_index, write_tablebase
+from hasamitablegen import (NO_WIN, _ClassData, _decode, _forward_chunk, _predecessors_chunk, captured_pieces,
+                            combination_table, retrograde)
+
+
+def to_board(squares):
+    """Turns a list of square indexes into a bitboard"""
+    board = 0
+    for square in squares:
+        board |= 1 << int(square)
+    return board
+
+
+def endgame(mover, opponent):
+    """Creates a game with Black to move, Black and Red on the given squares and their other pieces captured"""
+    game = HasamiShogiGame()
+    game.load_state(CompactGameState.pack([to_board(mover), to_board(opponent)], 'BLACK', 9 - len(mover),
+                                          9 - len(opponent)))
+    return game
+
+
+class TestTablebase(unittest.TestCase):
+    """Contains unit tests for the tablebase generator, the tablebase file and the search lookup"""
+
+    def test_ranks(self):
+        """Tests that the combination tables list the square sets in rank order"""
+        for pieces in (2, 3):
+            table = combination_table(pieces)
+            self.assertEqual(class_size(pieces, 0), len(table))
+            for rank in (0, 1, 77, len(table) - 1):
+                self.assertEqual(rank, combination_rank(to_board(table[rank])))
+
+    def test_captures(self):
+        """Tests the array capture check against the game's capture tables"""
+        rng = random.Random(3)
+        for _ in range(300):
+            squares = rng.sample(range(81), 7)
+            own, opponent = squares[:3], squares[3:]
+            expected = capture_mask(to_board(own), to_board(opponent), own[0])
+            result = captured_pieces(np.array([own[0]]), np.array([own]), np.array([opponent]))[0]
+            self.assertEqual(expected, to_board(square for square, taken in zip(opponent, result) if taken))
+
+    def test_forward(self):
+        """Tests the move counts of the forward pass against the legal moves of the game"""
+        rng = random.Random(4)
+        indexes = np.array(sorted(rng.sample(range(class_size(2, 2)), 200)), dtype=np.int64)
+        for index, mover, opponent in zip(indexes, *_decode((2, 2), indexes)):
+            valid, remaining, exit_win, exit_loss, exit_draw = _forward_chunk((2, 2), int(index), int(index) + 1)
+            if not valid[0]:
+                self.assertTrue(set(mover) & set(opponent))
+                continue
+            game = endgame(mover, opponent)
+            self.assertEqual(index, position_index(*game.get_bitboards()))
+            quiet = 0
+            wins = 0
+            for move in list(game.legal_moves()):
+                game.make_move(*move)
+                if game.get_game_state() == 'BLACK_WON':
+                    wins += 1
+                else:
+                    quiet += 1
+                game.unmake_move()
+            self.assertEqual(quiet, remaining[0])
+            self.assertEqual(1 if wins else NO_WIN, exit_win[0])
+
+    def test_predecessors(self):
+        """Tests that every move without a capture is found again walking backwards from the position it reaches"""
+        rng = random.Random(5)
+        for _ in range(20):
+            squares = rng.sample(range(81), 4)
+            game = endgame(squares[:2], squares[2:])
+            index = position_index(*game.get_bitboards())
+            for move in list(game.legal_moves()):
+                game.make_move(*move)
+                if game.get_game_state() == 'UNFINISHED':
+                    red, black = game.get_bitboards()[::-1]
+                    found = _predecessors_chunk((2, 2), np.array([position_index(red, black)], dtype=np.int64))
+                    self.assertIn(index, found.tolist())
+                game.unmake_move()
+
+    def test_retrograde(self):
+        """Tests the ply by ply solver on a small made up game against a direct minimax"""
+        rng = random.Random(6)
+        size = 300
+        moves = [rng.sample(range(size), rng.randint(0, 3)) for _ in range(size)]
+        capture_wins = [rng.random() < 0.1 for _ in range(size)]
+
+        @functools.lru_cache(maxsize=None)
+        def value(node, plies):
+            """Minimax result of a node looking plies moves ahead, as in the tablebase: odd win, even loss, 0 draw"""
+            if capture_wins[node]:
+                return 1
+            if plies <= 1 or not moves[node]:
+                return 0
+            results = [value(successor, plies - 1) for successor in moves[node]]
+            wins = [result + 1 for result in results if result and result % 2 == 0]
+            if wins:
+                return min(wins)
+            if all(result % 2 for result in results):
+                return max(results) + 1
+            return 0
+
+        data = _ClassData((2, 2), np.ones(size, dtype=bool), np.array([len(successors) for successors in moves],
+                                                                     dtype=np.int16),
+                          np.array([1 if win else NO_WIN for win in capture_wins], dtype=np.uint8),
+                          np.zeros(size, dtype=np.uint8), np.zeros(size, dtype=bool))
+
+        def predecessors(material, nodes):
+            nodes = set(nodes.tolist())
+            return np.array([node for node in range(size) for successor in moves[node] if successor in nodes],
+                            dtype=np.int64)
+
+        values = retrograde({(2, 2): data}, predecessors)[(2, 2)]
+        self.assertEqual([value(node, 60) for node in range(size)], values.tolist())
+        self.assertTrue(values.any())
+
+    def test_file_and_search(self):
+        """Tests writing and probing a tablebase file, and the engine playing the tablebase move"""
+        # Black on e4 and c6 captures Red's e5 by moving c6 to e6
+        mover = [CELL_NAMES.index('e4'), CELL_NAMES.index('c6')]
+        opponent = [CELL_NAMES.index('e5'), CELL_NAMES.index('a9')]
+        game = endgame(mover, opponent)
+        index = position_index(*game.get_bitboards())
+        table = bytearray(class_size(2, 2))
+        table[index] = 1
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tablebase.hstb')
+            with self.assertRaises(ValueError):
+                write_tablebase(path, {(2, 2): b'\x00'})
+            write_tablebase(path, {(2, 2): bytes(table)})
+            with Tablebase(path) as tablebase:
+                self.assertEqual({(2, 2)}, set(tablebase.classes))
+                self.assertEqual(1, tablebase.probe(game))
+                self.assertIsNone(tablebase.probe(HasamiShogiGame()))
+                engine = SearchEngine(table_bits=10, tablebase=tablebase)
+                self.assertEqual(('c6', 'e6'), engine.best_move(game, max_depth=4))
+                self.assertEqual(WIN_SCORE - 1, engine.stats['score'])
+                self.assertGreater(engine.stats['tablebase_hits'], 0)
+
+                # The tablebase is for the standard board, a 2 against 2 game on a larger board is searched instead
+                geometry = board_geometry(13, 13)
+                cell_index = geometry.cell_index
+                large = HasamiShogiGame(geometry)
+                large.load_state(CompactGameState.pack(
+                    [to_board([cell_index['e4'], cell_index['c6']]), to_board([cell_index['e5'], cell_index['a13']])],
+                    'BLACK', 11, 11, geometry))
+                self.assertIsNone(tablebase.probe(large))
+                engine = SearchEngine(table_bits=10, tablebase=tablebase)
+                self.assertEqual(('c6', 'e6'), engine.best_move(large, max_depth=2))
+                self.assertEqual(0, engine.stats['tablebase_hits'])
+        self.assertEqual('win in 1', describe(1))
+        self.assertEqual('loss in 4', describe(4))
+        self.assertEqual('draw', describe(0))
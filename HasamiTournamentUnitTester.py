@@ -0,0 +1,69 @@
+# Description: Hasami Shogi Game tournament runner unit tester
+
+import json
+import os
+import random
+import tempfile
+import unittest
+from hasamitournament import run_tournament, make_player, play_game, game_seed, read_finished, SearchPlayer
+
+
+class TestTournament(unittest.TestCase):
+    """Contains unit tests for the tournament runner"""
+
+    def setUp(self):
+        """Creates a results file name in a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, 'results.jsonl')
+
+    def tearDown(self):
+        """Removes the temporary directory"""
+        self.directory.cleanup()
+
+    def read_results(self):
+        """Reads the results file"""
+        with open(self.output) as results:
+            return [json.loads(line) for line in results]
+
+    def test_make_player(self):
+        """Tests creating players from specs"""
+        player = make_player('search:depth=2,mobility=3')
+        self.assertIsInstance(player, SearchPlayer)
+        self.assertEqual(2, player._depth)
+        self.assertEqual(3.0, player._engine.mobility_score)
+
+    def test_games_are_deterministic(self):
+        """Tests that a game seed always plays the same game"""
+        first, plies = play_game(make_player('random'), make_player('random'), random.Random(game_seed(1, 7)))
+        second, same_plies = play_game(make_player('random'), make_player('random'), random.Random(game_seed(1, 7)))
+        self.assertEqual(plies, same_plies)
+        self.assertEqual(first.position_key(), second.position_key())
+
+    def test_run_and_resume(self):
+        """Tests that results are written per game and a second run only plays the missing games"""
+        summary = run_tournament('random', 'search:depth=1', 6, self.output, workers=2, chunk_size=2, max_plies=40)
+        self.assertEqual(6, summary['played'])
+        self.assertEqual(6, sum(summary['wins'].values()))
+        results = self.read_results()
+        self.assertEqual(list(range(6)), sorted(result['game'] for result in results))
+        self.assertEqual('random', [result for result in results if result['game'] == 0][0]['black'])
+
+        # Simulate a run stopped while writing a line
+        with open(self.output, 'a') as partial:
+            partial.write('{"game": 6, "bla')
+        self.assertEqual(set(range(6)), read_finished(self.output))
+
+        summary = run_tournament('random', 'search:depth=1', 9, self.output, workers=2, chunk_size=2, max_plies=40)
+        self.assertEqual(3, summary['played'])
+        self.assertEqual(6, summary['skipped'])
+        again = self.read_results()
+        self.assertEqual(list(range(9)), sorted(result['game'] for result in again))
+
+        # The games played in the first run are the same as a fresh run would give
+        fresh = os.path.join(self.directory.name, 'fresh.jsonl')
+        run_tournament('random', 'search:depth=1', 6, fresh, workers=1, chunk_size=4, max_plies=40)
+        with open(fresh) as fresh_file:
+            fresh_results = sorted((json.loads(line) for line in fresh_file), key=lambda result: result['game'])
+        for result, fresh_result in zip(sorted(results, key=lambda result: result['game']), fresh_results):
+            self.assertEqual(fresh_result['plies'], result['plies'])
+            self.assertEqual(fresh_result['captures'], result['captures'])
@@ -1,7 +1,34 @@
 # Description: Hasami Shogi Game Unit tester
 
+import copy
+import pickle
+import random
 import unittest
-from HasamiShogiGame import HasamiShogiGame
+
+import hasamishogigame
+from hasamishogigame import (HasamiShogiGame, CELL_NAMES, CompactGameState, STATE_SIZE, SYMMETRIES, IDENTITY, FLIP,
+                             BoardGeometry, board_geometry, transform_boards, transform_move)
+from hasamilegacy import ListHasamiShogiGame
+from hasamibench import random_game
+
+# Move lists of the capture tests below, replayed against the original list board by test_capture_scenarios_parity
+CAPTURE_SCENARIOS = [
+    ['i6', 'd6', 'a5', 'd5', 'i8', 'h8', 'a4', 'd4', 'i3', 'd3'],
+    ['i1', 'd1', 'a4', 'd4', 'i2', 'h2', 'a5', 'd5', 'i9', 'h9', 'a3', 'd3', 'i8', 'h8', 'a2', 'd2', 'i6', 'd6'],
+    ['i1', 'f1', 'a4', 'h4', 'f1', 'f2', 'a3', 'g3', 'f2', 'f3', 'g3', 'g4', 'f3', 'f4'],
+    ['i1', 'b1', 'a9', 'e9', 'b1', 'b4', 'e9', 'd9', 'i4', 'c4', 'd9', 'd4'],
+    ['i8', 'h8', 'a9', 'h9', 'h8', 'h7', 'a8', 'i8'],
+    ['i2', 'h2', 'a1', 'h1', 'h2', 'h3', 'a2', 'i2'],
+    ['i9', 'b9', 'a8', 'b8', 'i8', 'c8', 'b8', 'b4', 'c8', 'a8'],
+    ['i1', 'b1', 'a2', 'b2', 'i2', 'c2', 'b2', 'b3', 'c2', 'a2'],
+    ['i3', 'h3', 'a5', 'e5', 'h3', 'h1'],
+    ['i2', 'h2', 'a4', 'd4', 'i6', 'h6', 'a5', 'd5', 'i7', 'b7', 'a6', 'c6', 'h6', 'g6', 'a9', 'b9', 'i3', 'd3',
+     'a1', 'b1', 'b7', 'b6', 'b1', 'c1', 'g6', 'd6', 'a3', 'a5', 'i8', 'h8', 'a5', 'd5', 'i9', 'h9', 'a2', 'a4',
+     'h8', 'g8', 'a4', 'd4', 'h9', 'g9', 'a7', 'd7', 'g9', 'f9', 'a8', 'd8', 'f9', 'd9', 'c1', 'c6', 'i5', 'i6',
+     'b9', 'c9', 'i6', 'd6', 'c9', 'c8'],
+    ['i1', 'h1', 'a3', 'g3', 'h1', 'h4', 'a1', 'i1', 'i3', 'h3', 'g3', 'g1', 'h4', 'e4', 'a2', 'f2', 'e4', 'e1',
+     'f2', 'f1', 'h3', 'h1'],
+]
 
 
 class TestHasamiShogiGame(unittest.TestCase):
@@ -66,6 +93,12 @@ class TestHasamiShogiGame(unittest.TestCase):
 
         self.assertFalse(self.game.make_move('a1', 'g1'))
 
+    def test_move_check_off_board(self):
+        """Tests that move_check rejects a cell that is not on the board"""
+        self.assertTrue(self.game.move_check('i1', 'd1'))
+        self.assertFalse(self.game.move_check('i1', 'j1'))
+        self.assertFalse(self.game.move_check('z9', 'i9'))
+
     def test_get_square_occupant(self):
         """Tests the return of the cell piece"""
         # Test Black piece
@@ -309,6 +342,50 @@ class TestHasamiShogiGame(unittest.TestCase):
         # Try to make additional moves after a player has won
         self.assertFalse(self.game.make_move('c9', 'c8'))
 
+    def test_piece_counts(self):
+        """Tests the piece counts and squares, and the game state kept through a win and its take back"""
+        self.assertEqual((9, 9), (self.game.get_num_pieces('BLACK'), self.game.get_num_pieces('RED')))
+        self.assertEqual(list(range(72, 81)), list(self.game.piece_squares()))
+        self.assertIsNone(self.game.get_num_captured_pieces('GREEN'))
+        moves = CAPTURE_SCENARIOS[9]
+        for cell_start, cell_end in zip(moves[::2], moves[1::2]):
+            self.game.make_move(cell_start, cell_end)
+            for player in ('BLACK', 'RED'):
+                self.assertEqual(9 - self.game.get_num_captured_pieces(player), self.game.get_num_pieces(player))
+        self.assertEqual('BLACK_WON', self.game.get_game_state())
+        self.assertEqual([CELL_NAMES.index('c9')], list(self.game.piece_squares('RED')))
+        self.game.unmake_move()
+        self.assertEqual('UNFINISHED', self.game.get_game_state())
+        self.assertEqual(6, self.game.get_num_pieces('RED'))
+
+    def test_capture_threats(self):
+        """Tests the capture threat map and hints, and that the map kept through moves matches a rebuilt one"""
+        self.assertEqual({}, self.game.capture_threats())
+        for cell_start, cell_end in zip(CAPTURE_SCENARIOS[0][:8:2], CAPTURE_SCENARIOS[0][1:8:2]):
+            self.game.make_move(cell_start, cell_end)
+        captured = 1 << CELL_NAMES.index('d4') | 1 << CELL_NAMES.index('d5')
+        self.assertEqual(captured, self.game.capture_threats('BLACK')[CELL_NAMES.index('d3')])
+        self.assertEqual(('i3', 'd3', ['d4', 'd5']), self.game.capture_hints()[0])
+        self.assertNotIn(CELL_NAMES.index('d3'), self.game.capture_threats('RED'))
+
+        # Changing squares directly updates the map too
+        for cell in ('d4', 'd5'):
+            self.game.set_board(CELL_NAMES.index(cell), cell, '.')
+        self.assertEqual({}, self.game.capture_threats('BLACK'))
+        for cell in ('d4', 'd5'):
+            self.game.set_board(CELL_NAMES.index(cell), cell, 'R')
+        self.assertEqual(captured, self.game.capture_threats('BLACK')[CELL_NAMES.index('d3')])
+        self.assertEqual(self.game.clone().capture_threats('BLACK'), self.game.capture_threats('BLACK'))
+        for moves in CAPTURE_SCENARIOS:
+            self.game.reset()
+            for cell_start, cell_end in zip(moves[::2], moves[1::2]):
+                for player in ('BLACK', 'RED'):
+                    self.assertEqual(self.game.clone().capture_threats(player), self.game.capture_threats(player))
+                self.game.make_move(cell_start, cell_end)
+                self.game.unmake_move()
+                self.game.make_move(cell_start, cell_end)
+        self.assertEqual([], self.game.capture_hints())
+
     def test_make_move(self):
         """Test make move returns True after successful move"""
         self.assertTrue(self.game.make_move('i3','d3'))
@@ -330,4 +407,268 @@ class TestHasamiShogiGame(unittest.TestCase):
         self.game.make_move('f2', 'f1')
         self.game.make_move('h3', 'h1')
 
-        self.assertEqual(3, self.game.get_num_captured_pieces('RED'))
\ No newline at end of file
+        self.assertEqual(3, self.game.get_num_captured_pieces('RED'))
+
+    def test_corner_own_piece(self):
+        """Tests that a player can not capture their own corner piece"""
+        self.game.make_move('i3', 'h3')
+        self.game.make_move('a5', 'e5')
+        self.game.make_move('h3', 'h1')
+
+        self.assertEqual('BLACK', self.game.get_square_occupant('i1'))
+        self.assertEqual(0, self.game.get_num_captured_pieces('BLACK'))
+
+    def test_list_board_parity(self):
+        """Tests that random games give the same board, captures and turn as the original list board"""
+        for seed in range(20):
+            game = HasamiShogiGame()
+            list_game = ListHasamiShogiGame()
+            for cell_start, cell_end in random_game(seed):
+                self.assertEqual(list_game.make_move(cell_start, cell_end), game.make_move(cell_start, cell_end))
+                self.assertEqual(list_game.get_active_player(), game.get_active_player())
+                for player in ('BLACK', 'RED'):
+                    self.assertEqual(list_game.get_num_captured_pieces(player), game.get_num_captured_pieces(player))
+            for cell in CELL_NAMES:
+                self.assertEqual(list_game.get_square_occupant(cell), game.get_square_occupant(cell))
+
+    def test_legal_moves_start(self):
+        """Tests the legal moves from the starting board"""
+        moves = list(self.game.legal_moves())
+
+        # Each of the 9 black pieces can move up 7 squares, and no piece can move sideways
+        self.assertEqual(63, len(moves))
+        self.assertEqual(63, self.game.count_legal_moves())
+        self.assertEqual(63, self.game.count_legal_moves('RED'))
+        self.assertIn(('i1', 'b1'), moves)
+        self.assertNotIn(('i1', 'a1'), moves)
+
+    def test_legal_moves_match_make_move(self):
+        """Tests that legal_moves lists exactly the moves make_move accepts"""
+        for seed in range(3):
+            for ply, (cell_start, cell_end) in enumerate(random_game(seed, 60)):
+                if ply % 20 == 0:
+                    accepted = set()
+                    for start in CELL_NAMES:
+                        if self.game.get_square_occupant(start) != self.game.get_active_player():
+                            continue
+                        for end in CELL_NAMES:
+                            if copy.deepcopy(self.game).make_move(start, end):
+                                accepted.add((start, end))
+                    moves = list(self.game.legal_moves())
+                    self.assertEqual(accepted, set(moves))
+                    self.assertEqual(len(moves), len(accepted))
+                    self.assertEqual(len(moves), self.game.count_legal_moves())
+                self.game.make_move(cell_start, cell_end)
+            self.game = HasamiShogiGame()
+
+    def test_unmake_move(self):
+        """Tests that unmaking random games move by move gives back every position exactly"""
+        def position(game):
+            board = tuple(game.get_square_occupant(cell) for cell in CELL_NAMES)
+            return (board, game.get_active_player(), game.get_game_state(),
+                    game.get_num_captured_pieces('BLACK'), game.get_num_captured_pieces('RED'))
+
+        self.assertFalse(self.game.unmake_move())
+        # Random games 0 and 5 are played until one player wins
+        for seed in range(6):
+            history = [position(self.game)]
+            for cell_start, cell_end in random_game(seed, 1000):
+                self.game.make_move(cell_start, cell_end)
+                history.append(position(self.game))
+            history.pop()
+            while history:
+                self.assertTrue(self.game.unmake_move())
+                self.assertEqual(history.pop(), position(self.game))
+            self.assertFalse(self.game.unmake_move())
+
+    def test_position_key(self):
+        """Tests that the position key follows the position and not the order of the moves"""
+        start_key = self.game.position_key()
+        other = HasamiShogiGame()
+
+        self.game.make_move('i1', 'h1')
+        self.assertNotEqual(start_key, self.game.position_key())
+        self.game.make_move('a1', 'b1')
+        self.game.make_move('i2', 'h2')
+        self.game.make_move('a2', 'b2')
+
+        # Same position reached with the moves in a different order
+        other.make_move('i2', 'h2')
+        other.make_move('a2', 'b2')
+        other.make_move('i1', 'h1')
+        other.make_move('a1', 'b1')
+        self.assertEqual(other.position_key(), self.game.position_key())
+
+        # Same pieces but a different player to move
+        other.make_move('h1', 'g1')
+        other.make_move('b1', 'c1')
+        other.make_move('g1', 'h1')
+        self.assertNotEqual(other.position_key(), self.game.position_key())
+
+    def test_position_key_debug(self):
+        """Tests the incremental position key against the key computed from scratch over random games"""
+        hasamishogigame.DEBUG_POSITION_KEY = True
+        try:
+            for seed in (0, 5):
+                start_key = self.game.position_key()
+                moves = random_game(seed, 1000)
+                for cell_start, cell_end in moves:
+                    self.game.make_move(cell_start, cell_end)
+                for _ in moves:
+                    self.game.unmake_move()
+                self.assertEqual(start_key, self.game.position_key())
+
+            # Setting squares directly keeps the key up to date too
+            self.game.set_board(0, 'a1', 'B')
+            self.game.set_board(40, 'e5', 'R')
+            self.game.set_board(80, 'i9', '.')
+            self.game.position_key()
+        finally:
+            hasamishogigame.DEBUG_POSITION_KEY = False
+
+    def test_capture_scenarios_parity(self):
+        """Tests the capture tables against the original list board on every capture test above"""
+        for scenario in CAPTURE_SCENARIOS:
+            game = HasamiShogiGame()
+            list_game = ListHasamiShogiGame()
+            for index in range(0, len(scenario), 2):
+                cell_start, cell_end = scenario[index], scenario[index + 1]
+                self.assertEqual(list_game.make_move(cell_start, cell_end), game.make_move(cell_start, cell_end))
+                for player in ('BLACK', 'RED'):
+                    self.assertEqual(list_game.get_num_captured_pieces(player), game.get_num_captured_pieces(player))
+                for cell in CELL_NAMES:
+                    self.assertEqual(list_game.get_square_occupant(cell), game.get_square_occupant(cell))
+
+    def test_capture_check(self):
+        """Tests listing the pieces a move would capture without making it"""
+        self.game.make_move('i6', 'd6')
+        self.game.make_move('a5', 'd5')
+        self.game.make_move('i8', 'h8')
+        self.game.make_move('a4', 'd4')
+
+        self.assertEqual([self.game.search_board('d4', 'yes'), self.game.search_board('d5', 'yes')],
+                         self.game.capture_check('d3'))
+        self.assertEqual([], self.game.capture_check('e4'))
+        self.assertEqual('NONE', self.game.get_square_occupant('d3'))
+
+    def test_save_load_state(self):
+        """Tests packing games into compact states and loading them back"""
+        for seed in (0, 3, 7):
+            moves = random_game(seed, 1000)
+            game = HasamiShogiGame()
+            for cell_start, cell_end in moves:
+                game.make_move(cell_start, cell_end)
+            state = game.save_state()
+            data = bytes(state)
+            self.assertEqual(STATE_SIZE, len(data))
+            self.assertIs(data, bytes(CompactGameState(data)))
+
+            loaded = HasamiShogiGame()
+            loaded.load_state(data)
+            self.assertEqual(state, loaded.save_state())
+            self.assertEqual(game.get_bitboards(), loaded.get_bitboards())
+            self.assertEqual(game.get_active_player(), loaded.get_active_player())
+            self.assertEqual(game.get_game_state(), loaded.get_game_state())
+            self.assertEqual(game.position_key(), loaded.position_key())
+            for player in ('BLACK', 'RED'):
+                self.assertEqual(game.get_num_captured_pieces(player), loaded.get_num_captured_pieces(player))
+            self.assertFalse(loaded.unmake_move())
+
+        self.game.make_move('i1', 'c1')
+        self.assertEqual('RED', CompactGameState(bytes(self.game.save_state())).unpack()[1])
+        with self.assertRaises(ValueError):
+            CompactGameState(b'\x00' * (STATE_SIZE - 1))
+
+    def test_canonical_key(self):
+        """Tests that symmetric positions share a canonical key and that moves map through the symmetries"""
+        self.assertEqual((self.game.position_key(), IDENTITY), self.game.canonical_key())
+        for seed in (1, 4):
+            game = HasamiShogiGame()
+            for cell_start, cell_end in random_game(seed, 25):
+                game.make_move(cell_start, cell_end)
+            key, transform = game.canonical_key()
+            moves = sorted(game.legal_moves())
+            captured = [game.get_num_captured_pieces('BLACK'), game.get_num_captured_pieces('RED')]
+            for symmetry in SYMMETRIES:
+                boards, player_turn = transform_boards(game.get_bitboards(), game.get_active_player(), symmetry)
+                # Flipping swaps the colours, and so the captured pieces
+                if symmetry & FLIP:
+                    captured.reverse()
+                other = HasamiShogiGame()
+                other.load_state(CompactGameState.pack(boards, player_turn, *captured))
+                if symmetry & FLIP:
+                    captured.reverse()
+                self.assertEqual(key, other.canonical_key()[0])
+                self.assertEqual(moves, sorted(transform_move(move, symmetry) for move in other.legal_moves()))
+            canonical = HasamiShogiGame()
+            canonical.load_state(CompactGameState.pack(*transform_boards(game.get_bitboards(),
+                                                                         game.get_active_player(), transform), 0, 0))
+            self.assertEqual(key, canonical.position_key())
+
+    def test_board_geometry(self):
+        """Tests that the tables of other board sizes find the same captures as the standard board's"""
+        with self.assertRaises(ValueError):
+            BoardGeometry(3, 9)
+        self.assertIs(hasamishogigame.STANDARD_GEOMETRY, board_geometry(9, 9))
+        # Long lines are scanned with the ray masks instead of looked up, both must agree
+        rng = random.Random(7)
+        for rows, columns in ((9, 9), (6, 8), (10, 6), (13, 13)):
+            geometry = board_geometry(rows, columns)
+            scan = hasamishogigame._scan_capture_function(geometry.ray_masks, geometry.corner_guards)
+            for _ in range(300):
+                squares = rng.sample(range(geometry.squares), 30)
+                own = sum(1 << square for square in squares[:10])
+                opponent = sum(1 << square for square in squares[10:])
+                self.assertEqual(scan(own, opponent, squares[0]), geometry.capture_mask(own, opponent, squares[0]))
+
+        # A 13x13 game: a capture across the long row, a corner capture and taking everything back
+        geometry = board_geometry(13, 13)
+        game = HasamiShogiGame(geometry)
+        self.assertEqual(('m13', 169, 12), (geometry.cell_names[-1], geometry.squares, geometry.captures_to_win))
+        self.assertEqual(len(list(game.legal_moves())), game.count_legal_moves())
+        for cell_start, cell_end in (('m1', 'g1'), ('a2', 'g2'), ('m13', 'l13'), ('a3', 'g3'), ('m4', 'g4'),
+                                     ('a12', 'k12'), ('l13', 'b13'), ('a6', 'f6'), ('m11', 'b11'), ('a7', 'f7'),
+                                     ('b11', 'b12'), ('f7', 'e7'), ('b12', 'a12')):
+            self.assertTrue(game.make_move(cell_start, cell_end))
+            self.assertEqual(geometry.compute_position_key(game.get_bitboards(), game.get_active_player()),
+                             game.position_key())
+        self.assertEqual(['NONE'] * 3, [game.get_square_occupant(cell) for cell in ('g2', 'g3', 'a13')])
+        self.assertEqual(3, game.get_num_captured_pieces('RED'))
+        state = game.save_state()
+        self.assertEqual(geometry.state_size, len(bytes(state)))
+        other = pickle.loads(pickle.dumps(game))
+        self.assertIs(geometry, other.get_geometry())
+        self.assertEqual(game.position_key(), other.position_key())
+        other.load_state(state)
+        self.assertEqual(game.get_bitboards(), other.get_bitboards())
+        self.assertEqual(game.canonical_key(), copy.deepcopy(game).canonical_key())
+        while game.unmake_move():
+            pass
+        self.assertEqual(HasamiShogiGame(geometry).position_key(), game.position_key())
+
+    def test_clone_snapshot(self):
+        """Tests that clones and snapshots play on without changing the game they were copied from"""
+        for cell_start, cell_end in random_game(2, 30):
+            self.game.make_move(cell_start, cell_end)
+        state = bytes(self.game.save_state())
+        move = next(iter(self.game.legal_moves()))
+
+        clone = self.game.clone()
+        self.assertEqual(state, bytes(clone.save_state()))
+        self.assertEqual(self.game.position_key(), clone.position_key())
+        self.assertFalse(clone.unmake_move())
+        clone.make_move(*move)
+        self.assertEqual(state, bytes(self.game.save_state()))
+
+        snapshot = self.game.snapshot()
+        self.assertEqual(state, bytes(snapshot.save_state()))
+        snapshot.make_move(*move)
+        self.assertEqual(bytes(clone.save_state()), bytes(snapshot.save_state()))
+        self.assertEqual(state, bytes(self.game.save_state()))
+        # The snapshot keeps the moves made before it was taken
+        for _ in range(31):
+            self.assertTrue(snapshot.unmake_move())
+        self.assertEqual(HasamiShogiGame().position_key(), snapshot.position_key())
+        self.assertEqual(state, bytes(self.game.save_state()))
+        self.game.make_move(*move)
+        self.assertEqual(bytes(clone.save_state()), bytes(self.game.save_state()))
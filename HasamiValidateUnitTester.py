@@ -0,0 +1,98 @@
+# Description: Hasami Shogi Game bulk validation unit tester
+
+import io
+import unittest
+from hasamibench import random_game
+from hasamishogigame import HasamiShogiGame, CompactGameState, CELL_INDEX, board_geometry
+from hasamivalidate import GameValidator, validate_games, parse_game_line, stream_games
+
+
+class TestValidation(unittest.TestCase):
+    """Contains unit tests for the bulk game validation"""
+
+    def test_legal_games(self):
+        """Tests that random games are legal and end in the same position as a fresh game"""
+        games = [random_game(seed, 60) for seed in range(5)]
+        for moves, result in zip(games, validate_games(games)):
+            game = HasamiShogiGame()
+            for cell_start, cell_end in moves:
+                game.make_move(cell_start, cell_end)
+            self.assertIsNone(result.illegal_ply)
+            self.assertEqual(game.get_game_state(), result.result)
+            self.assertEqual(game.get_bitboards(), (result.black, result.red))
+            self.assertEqual(game.get_active_player(), result.active_player)
+            self.assertEqual(game.get_num_captured_pieces('RED'), result.red_captured)
+
+    def test_first_illegal_ply(self):
+        """Tests that validation stops at the first illegal move"""
+        validator = GameValidator()
+        result = validator.validate([('i1', 'c1'), ('a1', 'b1'), ('c1', 'b2'), ('i2', 'h2')])
+        self.assertEqual(2, result.illegal_ply)
+        self.assertEqual('BLACK', result.active_player)
+
+        # Unknown cells and moves after the game is won are illegal too
+        self.assertEqual(0, validator.validate([('z1', 'c1')]).illegal_ply)
+        moves = random_game(0, 1000)
+        self.assertEqual(len(moves), validator.validate(moves + [moves[-1]]).illegal_ply)
+
+    def test_square_moves(self):
+        """Tests moves given as square indexes"""
+        moves = random_game(2, 30)
+        squares = [(CELL_INDEX[start], CELL_INDEX[end]) for start, end in moves]
+        validator = GameValidator()
+        self.assertEqual(validator.validate(moves), validator.validate(squares))
+
+        # Squares off the board, as a damaged record can hold, are illegal moves
+        for start, end in ((72, 200), (200, 63), (-1, 63), (72, -1), (72, 255)):
+            self.assertEqual(0, validator.validate([(start, end)]).illegal_ply)
+
+    def test_workers(self):
+        """Tests that worker processes give the same results in the same order"""
+        games = [random_game(seed, 30) for seed in range(7)]
+        games[3] = games[3][:5] + [('a1', 'a1')]
+        self.assertEqual(list(validate_games(games)), list(validate_games(games, workers=2, chunk_size=2)))
+        self.assertEqual(5, list(validate_games(games))[3].illegal_ply)
+
+    def test_stream(self):
+        """Tests the result lines of streamed games, in this process and over worker processes"""
+        games = [random_game(seed, 80) for seed in range(6)]
+        lines = [' '.join(start + '-' + end for start, end in moves) for moves in games]
+        lines += ['i1 c1, a1 b1, c1 b2', '', 'i1 c1 a1']
+        self.assertEqual([('i1', 'c1'), ('a1', 'b1')], parse_game_line('i1-c1;a1 b1\n'))
+        self.assertEqual([('i1', 'c1'), ('a1', '')], parse_game_line('i1 c1 a1'))
+
+        output = io.StringIO()
+        self.assertEqual(len(lines), stream_games(iter(lines), output, chunk_size=4))
+        results = [line.split('\t') for line in output.getvalue().splitlines()]
+        self.assertEqual(len(lines), len(results))
+        for moves, (result, plies, black, red, position) in zip(games, results):
+            game = HasamiShogiGame()
+            for cell_start, cell_end in moves:
+                game.make_move(cell_start, cell_end)
+            self.assertEqual([game.get_game_state(), len(moves), game.get_num_captured_pieces('BLACK'),
+                              game.get_num_captured_pieces('RED')], [result, int(plies), int(black), int(red)])
+            self.assertEqual(game.save_state(), CompactGameState(bytes.fromhex(position)))
+        self.assertEqual(['ILLEGAL', '2'], results[-3][:2])
+        self.assertEqual(['UNFINISHED', '0'], results[-2][:2])
+        self.assertEqual(['ILLEGAL', '1'], results[-1][:2])
+
+        pooled = io.StringIO()
+        stream_games(iter(lines), pooled, workers=2, chunk_size=2)
+        self.assertEqual(output.getvalue(), pooled.getvalue())
+
+    def test_stream_board_size(self):
+        """Tests that streamed games are replayed on the board size asked for"""
+        geometry = board_geometry(5, 6)
+        game = HasamiShogiGame(geometry)
+        game.make_move('e1', 'c1')
+        for workers in (1, 2):
+            output = io.StringIO()
+            stream_games(iter(['e1 c1', 'i1 c1']), output, workers=workers, geometry=geometry)
+            results = [line.split('\t') for line in output.getvalue().splitlines()]
+            self.assertEqual(['UNFINISHED', '1'], results[0][:2])
+            self.assertEqual(game.save_state(), CompactGameState(bytes.fromhex(results[0][4]), geometry))
+            self.assertEqual(['ILLEGAL', '0'], results[1][:2])
+        # The standard board is used again once no size is given
+        output = io.StringIO()
+        stream_games(iter(['e1 c1']), output)
+        self.assertEqual('ILLEGAL', output.getvalue().split('\t')[0])
@@ -0,0 +1,250 @@
+# Batched Hasami Shogi boards for simulating thousands of games at once. Every board of the batch is updated together
+# with NumPy array operations, instead of one HasamiShogiGame object per game. Needs NumPy.
+
+import numpy as np
+
+from hasamishogigame import BOARD_ROWS, BOARD_COLUMNS, BOARD_SQUARES, CELL_NAMES, CORNER_GUARDS, LINE_STEPS, PLAYERS
+
+# Board values. Each player's pieces have the value of that player, so the opponent of value v is -v.
+EMPTY = 0
+BLACK = 1
+RED = -1
+PLAYER_VALUES = (BLACK, RED)
+
+# Game states, in the same order as get_game_state of HasamiShogiGame
+UNFINISHED = 0
+BLACK_WON = 1
+RED_WON = 2
+GAME_STATES = ('UNFINISHED', 'BLACK_WON', 'RED_WON')
+
+# Row and column steps of the four directions, in LINE_STEPS order (top, bottom, left, right)
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+MAX_DISTANCE = max(BOARD_ROWS, BOARD_COLUMNS) - 1
+
+# Boards are padded by MAX_DISTANCE + 1 squares on every side, so any slide or capture line can be read with a slice
+# without going off the array. The padding is marked with OFF_BOARD.
+PAD = MAX_DISTANCE + 1
+OFF_BOARD = 2
+
+# Moves are numbered by direction, then distance, then start square, the same layout as move_mask. MOVE_START and
+# MOVE_END give the start and end squares of each move number. Moves off the board are never set in move_mask.
+STEPS = np.array(list(LINE_STEPS.values()))
+MOVE_COUNT = len(DIRECTIONS) * MAX_DISTANCE * BOARD_SQUARES
+MOVE_START = np.tile(np.arange(BOARD_SQUARES), len(DIRECTIONS) * MAX_DISTANCE)
+MOVE_END = np.array([square + distance * STEPS[direction]
+                     for direction in range(len(DIRECTIONS))
+                     for distance in range(1, MAX_DISTANCE + 1)
+                     for square in range(BOARD_SQUARES)])
+
+# Corner captures. For each square, the corner it can capture and the other guard square. Squares that are not next to
+# a corner point at square BOARD_SQUARES, a dummy square that apply_moves keeps empty.
+CORNER_OF = np.full(BOARD_SQUARES, BOARD_SQUARES)
+GUARD_OF = np.full(BOARD_SQUARES, BOARD_SQUARES)
+for _square, (_corner, _guard) in CORNER_GUARDS.items():
+    CORNER_OF[_square] = _corner
+    GUARD_OF[_square] = _guard
+
+
+class BatchedHasamiBoards:
+    """
+    A batch of Hasami Shogi games stored as one (N, 9, 9) int8 array. Follows the same rules as HasamiShogiGame, so
+    every game plays out exactly as it would on its own HasamiShogiGame.
+    """
+
+    def __init__(self, size):
+        """
+        Initializes size games at the starting board, with Black to move.
+        :param size: Number of games in the batch
+        """
+        self.size = size
+        self.boards = np.zeros((size, BOARD_ROWS, BOARD_COLUMNS), dtype=np.int8)
+        self.boards[:, 0, :] = RED
+        self.boards[:, -1, :] = BLACK
+        # Value of the player to move in each game
+        self.turn = np.full(size, BLACK, dtype=np.int8)
+        # Number of captured pieces of each player, in PLAYERS order
+        self.captured = np.zeros((size, len(PLAYERS)), dtype=np.int16)
+        self.state = np.full(size, UNFINISHED, dtype=np.int8)
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Creates a batch holding the positions of the given games.
+        :param games: list of HasamiShogiGame
+        :return: BatchedHasamiBoards
+        """
+        batch = cls(len(games))
+        values = {'NONE': EMPTY, 'BLACK': BLACK, 'RED': RED}
+        for index, game in enumerate(games):
+            flat = batch.boards[index].reshape(BOARD_SQUARES)
+            for square, cell in enumerate(CELL_NAMES):
+                flat[square] = values[game.get_square_occupant(cell)]
+            batch.turn[index] = values[game.get_active_player()]
+            for player_index, player in enumerate(PLAYERS):
+                batch.captured[index, player_index] = game.get_num_captured_pieces(player)
+            batch.state[index] = GAME_STATES.index(game.get_game_state())
+        return batch
+
+    def get_game_state(self, index):
+        """
+        Provides the state of one game of the batch.
+        :param index: Game number in the batch
+        :return: 'UNFINISHED', 'RED_WON', 'BLACK_WON'
+        """
+        return GAME_STATES[self.state[index]]
+
+    def get_active_player(self, index):
+        """
+        Returns who's turn it is in one game of the batch.
+        :param index: Game number in the batch
+        :return: either 'RED' or 'BLACK'
+        """
+        return PLAYERS[PLAYER_VALUES.index(self.turn[index])]
+
+    def _padded(self, fill):
+        """
+        Copies the boards into a larger array with PAD squares of padding on every side.
+        :param fill: Value of the padding squares
+        :return: (N, rows + 2 * PAD, columns + 2 * PAD) int8 array
+        """
+        padded = np.full((self.size, BOARD_ROWS + 2 * PAD, BOARD_COLUMNS + 2 * PAD), fill, dtype=np.int8)
+        padded[:, PAD:PAD + BOARD_ROWS, PAD:PAD + BOARD_COLUMNS] = self.boards
+        return padded
+
+    def reach(self):
+        """
+        Finds how far every piece of the player to move can slide in each direction. A slide of k squares is legal if
+        the k squares in that direction are empty, so each distance builds on the one before.
+        :return: (N, 4, 9, 9) int8 array with the number of squares the piece on [row, column] can slide in
+        [direction], directions in LINE_STEPS order. 0 for empty squares, opponent pieces and finished games.
+        """
+        empty = self._padded(OFF_BOARD) == EMPTY
+        own = (self.boards == self.turn[:, None, None]) & (self.state == UNFINISHED)[:, None, None]
+        reach = np.zeros((self.size, len(DIRECTIONS), BOARD_ROWS, BOARD_COLUMNS), dtype=np.int8)
+        for direction, (row_step, column_step) in enumerate(DIRECTIONS):
+            clear = own
+            for distance in range(1, MAX_DISTANCE + 1):
+                row = PAD + distance * row_step
+                column = PAD + distance * column_step
+                clear = clear & empty[:, row:row + BOARD_ROWS, column:column + BOARD_COLUMNS]
+                reach[:, direction] += clear
+        return reach
+
+    def move_mask(self):
+        """
+        Finds the legal moves of every game.
+        :return: (N, 4, 8, 9, 9) bool array, True where the piece on [row, column] can slide [distance - 1] squares in
+        [direction], directions in LINE_STEPS order. All False for finished games.
+        """
+        distances = np.arange(MAX_DISTANCE, dtype=np.int8)[None, None, :, None, None]
+        return self.reach()[:, :, None] > distances
+
+    def count_legal_moves(self):
+        """
+        Counts the legal moves of every game.
+        :return: (N,) array with the number of legal moves of the player to move
+        """
+        return self.reach().reshape(self.size, -1).sum(axis=1, dtype=np.int32)
+
+    def legal_moves(self, index):
+        """
+        Lists the legal moves of one game of the batch.
+        :param index: Game number in the batch
+        :return: list of (start cell, end cell) tuples
+        """
+        moves = np.flatnonzero(self.move_mask()[index].reshape(MOVE_COUNT))
+        return [(CELL_NAMES[MOVE_START[move]], CELL_NAMES[MOVE_END[move]]) for move in moves]
+
+    def random_moves(self, rng):
+        """
+        Picks a random legal move in every game, each legal move of a game being equally likely.
+        :param rng: numpy.random.Generator
+        :return: (starts, ends) arrays of square indexes, -1 for games with no legal move
+        """
+        # Each (direction, start square) slot holds as many moves as its reach. Pick the r-th move of each game, which
+        # is in the first slot where the running count passes r.
+        reach = self.reach().reshape(self.size, -1)
+        running = np.cumsum(reach, axis=1, dtype=np.int16)
+        counts = running[:, -1]
+        picks = (rng.random(self.size) * counts).astype(np.int16)
+        slots = np.argmax(running > picks[:, None], axis=1)
+        games = np.arange(self.size)
+        distances = picks - running[games, slots] + reach[games, slots] + 1
+        starts = slots % BOARD_SQUARES
+        ends = starts + distances * STEPS[slots // BOARD_SQUARES]
+        has_move = counts > 0
+        return np.where(has_move, starts, -1), np.where(has_move, ends, -1)
+
+    def apply_moves(self, starts, ends):
+        """
+        Makes one move in every game, resolves the custodian and corner captures, updates the captured pieces and game
+        states, and changes the player to move. Moves must be legal, games with a start of -1 are left as they are.
+        :param starts: (N,) array of start square indexes
+        :param ends: (N,) array of end square indexes
+        :return: (N,) array with the number of pieces captured by each move
+        """
+        games = np.flatnonzero(starts >= 0)
+        starts = starts[games]
+        ends = ends[games]
+        turn = self.turn[games]
+        flat = self.boards.reshape(self.size, BOARD_SQUARES)
+        flat[games, starts] = EMPTY
+        flat[games, ends] = turn
+
+        # Custodian captures. Read the squares in each direction from the end square, count the opponent pieces next
+        # to it, and capture them if the square after them holds a piece of the player who moved.
+        padded = self._padded(OFF_BOARD)
+        end_rows = ends // BOARD_COLUMNS + PAD
+        end_columns = ends % BOARD_COLUMNS + PAD
+        distances = np.arange(1, MAX_DISTANCE + 2)
+        capture_games = []
+        capture_squares = []
+        for row_step, column_step in DIRECTIONS:
+            rows = end_rows[:, None] + distances * row_step
+            columns = end_columns[:, None] + distances * column_step
+            line = padded[games[:, None], rows, columns]
+            run = np.cumprod(line == -turn[:, None], axis=1).sum(axis=1)
+            closed = line[np.arange(len(games)), run] == turn
+            taken = closed[:, None] & (distances[:MAX_DISTANCE] <= run[:, None])
+            hit_games, hit_distances = np.nonzero(taken)
+            capture_games.append(hit_games)
+            capture_squares.append((rows[hit_games, hit_distances] - PAD) * BOARD_COLUMNS +
+                                   columns[hit_games, hit_distances] - PAD)
+
+        # Corner captures, against a dummy always empty square for end squares that are not next to a corner
+        board_plus = np.concatenate([flat[games], np.zeros((len(games), 1), dtype=np.int8)], axis=1)
+        corners = CORNER_OF[ends]
+        local = np.arange(len(games))
+        corner_taken = (board_plus[local, corners] == -turn) & (board_plus[local, GUARD_OF[ends]] == turn)
+        capture_games.append(local[corner_taken])
+        capture_squares.append(corners[corner_taken])
+
+        capture_games = np.concatenate(capture_games)
+        capture_squares = np.concatenate(capture_squares)
+        flat[games[capture_games], capture_squares] = EMPTY
+        counts = np.zeros(self.size, dtype=np.int16)
+        counts[games] = np.bincount(capture_games, minlength=len(games))
+
+        # The opponent of the player who moved loses the captured pieces. Black's captured pieces are in column 0.
+        opponent_columns = np.where(turn == BLACK, 1, 0)
+        self.captured[games, opponent_columns] += counts[games]
+        self.state[games] = np.where(self.captured[games, 0] >= 8, RED_WON,
+                                     np.where(self.captured[games, 1] >= 8, BLACK_WON, UNFINISHED))
+        self.turn[games] = np.where(self.state[games] == UNFINISHED, -turn, turn)
+        return counts
+
+    def play_random(self, rng, max_plies=200):
+        """
+        Plays random legal moves in every game until every game is finished, out of moves or at max_plies.
+        :param rng: numpy.random.Generator
+        :param max_plies: Most moves to make in each game
+        :return: (N,) array with the number of moves made in each game
+        """
+        plies = np.zeros(self.size, dtype=np.int32)
+        for _ in range(max_plies):
+            starts, ends = self.random_moves(rng)
+            if not (starts >= 0).any():
+                break
+            self.apply_moves(starts, ends)
+            plies += starts >= 0
+        return plies
@@ -0,0 +1,391 @@
+# Benchmarks for the Hasami Shogi Game engine. Run the file as a script to run every benchmark, or give the names of the
+# benchmarks to run, for example `python hasamibench.py moves`.
+
+import copy
+import random
+import sys
+import time
+import tracemalloc
+
+from hasamishogigame import HasamiShogiGame, CELL_NAMES, CELL_INDEX
+from hasamilegacy import ListHasamiShogiGame
+
+
+def random_game(seed, max_plies=200):
+    """
+    Plays a game of random legal moves and returns the moves played. The same seed always gives the same game.
+    :param seed: Seed for the random number generator
+    :param max_plies: The game is stopped after this many moves if nobody has won yet
+    :return: list of (start cell, end cell) tuples
+    """
+    rng = random.Random(seed)
+    game = HasamiShogiGame()
+    moves = []
+    while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+        legal = list(game.legal_moves())
+        if not legal:
+            break
+        move = rng.choice(legal)
+        game.make_move(*move)
+        moves.append(move)
+    return moves
+
+
+def replay(game_class, games):
+    """
+    Replays the given games on a fresh game object each and returns the number of moves made.
+    :param game_class: Class of the game to replay the moves on
+    :param games: list of move lists from random_game
+    :return: the number of moves replayed
+    """
+    count = 0
+    for moves in games:
+        game = game_class()
+        for cell_start, cell_end in moves:
+            game.make_move(cell_start, cell_end)
+        count += len(moves)
+    return count
+
+
+def bench_moves(num_games=200):
+    """
+    Compares the moves per second of the bitboard board against the original list board.
+    :param num_games: Number of random games to replay on each board
+    :return: Does not return anything, prints the results
+    """
+    games = [random_game(seed) for seed in range(num_games)]
+    results = {}
+    for name, game_class in (('list', ListHasamiShogiGame), ('bitboard', HasamiShogiGame)):
+        start = time.perf_counter()
+        count = replay(game_class, games)
+        elapsed = time.perf_counter() - start
+        results[name] = count / elapsed
+        print('%-10s %8d moves %10.0f moves/sec' % (name, count, results[name]))
+    print('speedup    %.1fx' % (results['bitboard'] / results['list']))
+
+
+def bench_movegen(num_positions=20):
+    """
+    Compares listing the legal moves by trying every start and end cell pair against the legal_moves generator.
+    :param num_positions: Number of positions, taken from random games, to list the moves of
+    :return: Does not return anything, prints the results
+    """
+    positions = []
+    for seed in range(num_positions):
+        game = HasamiShogiGame()
+        for cell_start, cell_end in random_game(seed, 40):
+            game.make_move(cell_start, cell_end)
+        positions.append(game)
+
+    start = time.perf_counter()
+    for game in positions:
+        [(cell_start, cell_end) for cell_start in CELL_NAMES for cell_end in CELL_NAMES
+         if copy.deepcopy(game).make_move(cell_start, cell_end)]
+    brute_force = (time.perf_counter() - start) / num_positions
+    start = time.perf_counter()
+    for _ in range(100):
+        for game in positions:
+            list(game.legal_moves())
+    generator = (time.perf_counter() - start) / num_positions / 100
+    start = time.perf_counter()
+    for _ in range(100):
+        for game in positions:
+            game.count_legal_moves()
+    counter = (time.perf_counter() - start) / num_positions / 100
+    print('pairs      %10.1f us/position' % (brute_force * 1e6))
+    print('generator  %10.1f us/position' % (generator * 1e6))
+    print('count      %10.1f us/position' % (counter * 1e6))
+
+
+def bench_batch(num_games=2000, max_plies=200):
+    """
+    Compares random games played one HasamiShogiGame at a time against the same number played as one batch.
+    :param num_games: Number of random games to play each way
+    :param max_plies: Most moves in each game
+    :return: Does not return anything, prints the results
+    """
+    import numpy as np
+    from hasamibatch import BatchedHasamiBoards
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    count = 0
+    for _ in range(num_games // 10):
+        game = HasamiShogiGame()
+        for _ in range(max_plies):
+            legal = list(game.legal_moves())
+            if not legal:
+                break
+            game.make_move(*rng.choice(legal))
+            count += 1
+    scalar = count / (time.perf_counter() - start)
+
+    batch = BatchedHasamiBoards(num_games)
+    start = time.perf_counter()
+    count = batch.play_random(np.random.default_rng(0), max_plies).sum()
+    batched = count / (time.perf_counter() - start)
+    print('scalar     %10.0f moves/sec' % scalar)
+    print('batch      %10.0f moves/sec' % batched)
+
+
+def bench_validate(num_games=500):
+    """
+    Measures bulk validation of random games on one reused game object.
+    :param num_games: Number of random games to validate
+    :return: Does not return anything, prints the results
+    """
+    from hasamivalidate import validate_games
+
+    games = [random_game(seed, 40 + seed % 80) for seed in range(num_games)]
+    moves = sum(len(game) for game in games)
+    start = time.perf_counter()
+    for _ in validate_games(games):
+        pass
+    elapsed = time.perf_counter() - start
+    print('validate   %10.0f games/sec %10.0f moves/sec' % (num_games / elapsed, moves / elapsed))
+
+
+def _traced_bytes(build):
+    """
+    Measures the memory held by the objects a function builds.
+    :param build: Function without parameters returning the objects
+    :return: (objects, bytes allocated by build and still alive)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objects, after - before
+
+
+def bench_memory(num_games=10000, plies=30):
+    """
+    Measures the bytes per live game of idle sessions, kept as HasamiShogiGame objects and as CompactGameState.
+    :param num_games: Number of games kept alive
+    :param plies: Random moves played in each game before it is kept
+    :return: Does not return anything, prints the results
+    """
+    games = [random_game(seed, plies) for seed in range(100)]
+
+    def build_games():
+        sessions = []
+        for index in range(num_games):
+            game = HasamiShogiGame()
+            for move in games[index % len(games)]:
+                game.make_move(*move)
+            sessions.append(game)
+        return sessions
+
+    sessions, game_bytes = _traced_bytes(build_games)
+    states, state_bytes = _traced_bytes(lambda: [game.save_state() for game in sessions])
+    _, fresh_bytes = _traced_bytes(lambda: [HasamiShogiGame() for _ in range(num_games)])
+    print('HasamiShogiGame, fresh      %8.0f bytes/game' % (fresh_bytes / num_games))
+    print('HasamiShogiGame, %3d moves  %8.0f bytes/game' % (plies, game_bytes / num_games))
+    print('CompactGameState            %8.0f bytes/game' % (state_bytes / num_games))
+
+
+def bench_features(num_positions=20000):
+    """
+    Compares SearchEngine.evaluate, one position at a time, against the batch features and scores of hasamifeatures.py.
+    :param num_positions: Number of positions to evaluate in the batch
+    :return: Does not return anything, prints the results
+    """
+    import numpy as np
+    from hasamibatch import BatchedHasamiBoards
+    from hasamifeatures import batch_evaluate, positions_from_games
+    from hasamisearch import SearchEngine
+
+    games = []
+    for seed in range(200):
+        game = HasamiShogiGame()
+        for cell_start, cell_end in random_game(seed, 40):
+            game.make_move(cell_start, cell_end)
+        games.append(game)
+    engine = SearchEngine(table_bits=1)
+    start = time.perf_counter()
+    for game in games:
+        engine.evaluate(game, 'BLACK')
+    scalar = len(games) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    positions_from_games(games)
+    convert = len(games) / (time.perf_counter() - start)
+
+    batch = BatchedHasamiBoards(num_positions)
+    batch.play_random(np.random.default_rng(0), 40)
+    positions = batch.boards.reshape(num_positions, -1)
+    start = time.perf_counter()
+    batch_evaluate(positions)
+    batched = num_positions / (time.perf_counter() - start)
+    print('evaluate   %10.0f positions/sec' % scalar)
+    print('convert    %10.0f positions/sec' % convert)
+    print('batch      %10.0f positions/sec' % batched)
+
+
+def bench_clone(num_branches=1000000, plies=40):
+    """
+    Compares branching a game with copy.deepcopy, clone and snapshot. Each branch copies a game part way through a
+    random game and makes one move on the copy. deepcopy is timed over a hundredth of the branches, it is that slow.
+    :param num_branches: Number of branches made with clone and with snapshot
+    :param plies: Number of moves made before branching
+    :return: Does not return anything, prints the results
+    """
+    game = HasamiShogiGame()
+    for cell_start, cell_end in random_game(3, plies):
+        game.make_move(cell_start, cell_end)
+    moves = [(CELL_INDEX[cell_start], CELL_INDEX[cell_end]) for cell_start, cell_end in game.legal_moves()]
+
+    def branch(copy_game, count):
+        start = time.perf_counter()
+        for index in range(count):
+            copy_game().make_square_move(*moves[index % len(moves)])
+        return count / (time.perf_counter() - start)
+
+    rates = {
+        'deepcopy': branch(lambda: copy.deepcopy(game), max(num_branches // 100, 1)),
+        'clone': branch(game.clone, num_branches),
+        'snapshot': branch(game.snapshot, num_branches),
+    }
+    for name, rate in rates.items():
+        print('%-10s %10.0f branches/sec  %6.0fx deepcopy' % (name, rate, rate / rates['deepcopy']))
+
+
+def bench_delta(num_games=200):
+    """
+    Compares publishing every move of random games as the whole board, printed as print_board does, against packing
+    the move's delta and applying it to a client's DeltaBoard.
+    :param num_games: Number of games to replay
+    :return: Does not return anything, prints the results
+    """
+    import contextlib
+    import io
+    from hasamidelta import DeltaBoard, encode_delta
+
+    games = [random_game(seed) for seed in range(num_games)]
+    moves = sum(len(game_moves) for game_moves in games)
+    sent = 0
+    start = time.perf_counter()
+    for game_moves in games:
+        game = HasamiShogiGame()
+        for cell_start, cell_end in game_moves:
+            game.make_move(cell_start, cell_end)
+            board = io.StringIO()
+            with contextlib.redirect_stdout(board):
+                game.print_board()
+            sent += len(board.getvalue())
+    print('board      %10.0f moves/sec  %6.1f bytes/move' % (moves / (time.perf_counter() - start), sent / moves))
+
+    sent = 0
+    start = time.perf_counter()
+    for game_moves in games:
+        game = HasamiShogiGame()
+        client = DeltaBoard()
+        for cell_start, cell_end in game_moves:
+            game.make_move(cell_start, cell_end)
+            delta = encode_delta(game.last_delta())
+            client.apply(delta)
+            sent += len(delta)
+    print('delta      %10.0f moves/sec  %6.1f bytes/move' % (moves / (time.perf_counter() - start), sent / moves))
+
+
+def bench_scaling(sizes=((9, 9), (13, 13), (19, 19)), num_games=20, max_plies=200):
+    """
+    Measures how the engine scales with the board size: building the tables, making and taking back moves, move
+    generation and capture resolution, on random games played on each board.
+    :param sizes: (rows, columns) of the boards
+    :param num_games: Number of random games per board
+    :param max_plies: The games are stopped after this many moves
+    :return: Does not return anything, prints the results
+    """
+    from hasamishogigame import BoardGeometry, PLAYER_INDEX
+
+    print('%-7s %9s %12s %7s %12s %12s %12s' % ('board', 'tables', 'moves/sec', 'legal', 'movegen', 'count',
+                                                'capture'))
+    for rows, columns in sizes:
+        start = time.perf_counter()
+        geometry = BoardGeometry(rows, columns)
+        tables = time.perf_counter() - start
+
+        rng = random.Random(0)
+        games = []
+        positions = []
+        for _ in range(num_games):
+            game = HasamiShogiGame(geometry)
+            moves = []
+            while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+                legal = list(game.legal_moves())
+                if not legal:
+                    break
+                cell_start, cell_end = rng.choice(legal)
+                moves.append((geometry.cell_index[cell_start], geometry.cell_index[cell_end]))
+                game.make_square_move(*moves[-1])
+                if len(moves) % 10 == 0:
+                    positions.append(game.clone())
+            games.append(moves)
+
+        num_moves = sum(len(moves) for moves in games)
+        start = time.perf_counter()
+        for moves in games:
+            game = HasamiShogiGame(geometry)
+            for move in moves:
+                game.make_square_move(*move)
+            while game.unmake_move():
+                pass
+        # Each move is made and taken back
+        moves_per_sec = 2 * num_moves / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for game in positions:
+            for _ in game.legal_moves():
+                pass
+        movegen = (time.perf_counter() - start) / len(positions)
+        start = time.perf_counter()
+        for game in positions:
+            game.count_legal_moves()
+        count = (time.perf_counter() - start) / len(positions)
+        legal = sum(game.count_legal_moves() for game in positions) / len(positions)
+
+        # Captures of a piece landing on every empty square of each position
+        checks = []
+        for game in positions:
+            boards = game.get_bitboards()
+            player = PLAYER_INDEX[game.get_active_player()]
+            empty = geometry.full_mask & ~(boards[0] | boards[1])
+            checks.extend((boards[player] | 1 << square, boards[1 - player], square)
+                          for square in range(geometry.squares) if empty >> square & 1)
+        capture_mask = geometry.capture_mask
+        start = time.perf_counter()
+        for own, opponent, square in checks:
+            capture_mask(own, opponent, square)
+        capture = (time.perf_counter() - start) / len(checks)
+        print('%-7s %7.3f s %12.0f %7.0f %9.1f us %9.1f us %9.2f us' % (
+            '%dx%d' % (rows, columns), tables, moves_per_sec, legal, movegen * 1e6, count * 1e6, capture * 1e6))
+
+
+BENCHMARKS = {
+    'moves': bench_moves,
+    'movegen': bench_movegen,
+    'batch': bench_batch,
+    'validate': bench_validate,
+    'memory': bench_memory,
+    'features': bench_features,
+    'clone': bench_clone,
+    'delta': bench_delta,
+    'scaling': bench_scaling,
+}
+
+
+def main():
+    """
+    Runs the benchmarks named on the command line, or all of them.
+    :return: Doesn't return anything
+    """
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print('--- ' + name + ' ---')
+        BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+    main()
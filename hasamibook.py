@@ -0,0 +1,306 @@
+# Opening book for the Hasami Shogi Game. Every game starts from the same board, so the first moves of a game are
+# searched again and again. The book is built once from a set of games, archived game records or games the engine plays
+# against itself, and stores for each position of the first plies the moves that were played there, how often and how
+# well they scored. The engine looks the position up before searching and plays the book move if there is one.
+#
+# A book file is a short header followed by fixed size entries sorted by position key, one per (position, move). The
+# file is memory mapped and searched with a binary search, so only the pages a lookup touches are ever read. Positions
+# are stored in their canonical form (see HasamiShogiGame.canonical_key), so symmetric positions share their entries.
+#
+# Example: python hasamibook.py selfplay games.hsgr --games 2000 --depth 2
+#          python hasamibook.py build book.hsob games.hsgr archive.hsgr --plies 12 --min-count 2
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from hasamishogigame import HasamiShogiGame, CELL_NAMES, SQUARE_TRANSFORMS, STANDARD_GEOMETRY, reachable_mask
+from hasamirecord import GameRecordReader, GameRecordWriter
+from hasamisearch import SearchEngine
+
+FILE_MAGIC = b'HSOB\x02'
+# Plies the book covers and number of games it was built from
+BOOK_HEADER = struct.Struct('<BI')
+# Canonical position key, start and end square in the canonical form, times played and score: the sum over the games
+# of +1 for a win and -1 for a loss of the player who made the move
+BOOK_ENTRY = struct.Struct('<QBBIi')
+
+# Score of a result for each player
+RESULT_SCORES = {'BLACK_WON': {'BLACK': 1, 'RED': -1}, 'RED_WON': {'BLACK': -1, 'RED': 1}}
+
+
+def count_moves(games, max_plies):
+    """
+    Counts the moves played in each position of the first plies of a set of games.
+    :param games: iterable of (moves, result), the moves as (start square, end square) and the result as 'UNFINISHED',
+    'BLACK_WON' or 'RED_WON'
+    :param max_plies: Number of plies from the start to count
+    :return: (dict mapping (canonical position key, start square, end square) to [times played, score], number of
+    games)
+    """
+    counts = {}
+    num_games = 0
+    game = HasamiShogiGame()
+    for moves, result in games:
+        num_games += 1
+        game.reset()
+        scores = RESULT_SCORES.get(result)
+        for start, end in moves[:max_plies]:
+            key, transform = game.canonical_key()
+            player = game.get_active_player()
+            if not game.make_square_move(start, end):
+                break
+            squares = SQUARE_TRANSFORMS[transform]
+            entry_key = (key, squares[start], squares[end])
+            entry = counts.get(entry_key)
+            if entry is None:
+                entry = counts[entry_key] = [0, 0]
+            entry[0] += 1
+            if scores is not None:
+                entry[1] += scores[player]
+    return counts, num_games
+
+
+def record_games(paths):
+    """
+    Reads the games of record files, see hasamirecord.py.
+    :param paths: Paths of the record files
+    :return: yields (moves as square pairs, result)
+    """
+    for path in paths:
+        with GameRecordReader(path) as reader:
+            for record in reader:
+                yield record.squares(), record.result
+
+
+def write_book(path, counts, max_plies, num_games, min_count=1):
+    """
+    Writes a book file.
+    :param path: Path of the book file
+    :param counts: dict from count_moves
+    :param max_plies: Plies the book covers
+    :param num_games: Number of games the book was built from
+    :param min_count: Moves played fewer times than this are left out
+    :return: Number of entries written
+    """
+    entries = sorted((key, start, end, played, score) for (key, start, end), (played, score) in counts.items()
+                     if played >= min_count)
+    with open(path, 'wb') as book:
+        book.write(FILE_MAGIC)
+        book.write(BOOK_HEADER.pack(max_plies, num_games))
+        data = bytearray(BOOK_ENTRY.size * len(entries))
+        for index, entry in enumerate(entries):
+            BOOK_ENTRY.pack_into(data, index * BOOK_ENTRY.size, *entry)
+        book.write(data)
+    return len(entries)
+
+
+def build_book(record_paths, path, max_plies=12, min_count=1):
+    """
+    Builds a book file from record files.
+    :param record_paths: Paths of the record files
+    :param path: Path of the book file
+    :param max_plies: Number of plies from the start the book covers
+    :param min_count: Moves played fewer times than this are left out
+    :return: (number of games, number of entries)
+    """
+    counts, num_games = count_moves(record_games(record_paths), max_plies)
+    return num_games, write_book(path, counts, max_plies, num_games, min_count)
+
+
+class OpeningBook:
+    """
+    Memory mapped book file. Use as a context manager, or call close when done.
+    """
+
+    def __init__(self, path):
+        """
+        Opens and maps the book file and reads its header.
+        :param path: Path of the book file
+        """
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ValueError('%s is not a Hasami Shogi opening book file' % path)
+        self.max_plies, self.num_games = BOOK_HEADER.unpack_from(self._map, len(FILE_MAGIC))
+        self._start = len(FILE_MAGIC) + BOOK_HEADER.size
+        self.num_entries = (len(self._map) - self._start) // BOOK_ENTRY.size
+
+    def _key_at(self, index):
+        """
+        Reads the position key of an entry.
+        :param index: Entry number
+        :return: 64 bit key
+        """
+        return struct.unpack_from('<Q', self._map, self._start + index * BOOK_ENTRY.size)[0]
+
+    def probe_key(self, key):
+        """
+        Looks up the moves of a position by its canonical key.
+        :param key: Canonical position key, from HasamiShogiGame.canonical_key
+        :return: list of (start square, end square, times played, score) in the canonical form, empty if the position
+        is not in the book
+        """
+        low = 0
+        high = self.num_entries
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        moves = []
+        offset = self._start + low * BOOK_ENTRY.size
+        while low < self.num_entries:
+            entry_key, start, end, played, score = BOOK_ENTRY.unpack_from(self._map, offset)
+            if entry_key != key:
+                break
+            moves.append((start, end, played, score))
+            low += 1
+            offset += BOOK_ENTRY.size
+        return moves
+
+    def probe(self, game):
+        """
+        Looks up the moves of a game's position. Moves that are not legal in the position, which can only come from two
+        positions sharing a key, are left out. The book is for the standard board, games on other boards have no moves.
+        :param game: HasamiShogiGame
+        :return: list of (start cell, end cell, times played, score), most played first
+        """
+        if game.get_game_state() != 'UNFINISHED' or game.get_geometry() is not STANDARD_GEOMETRY:
+            return []
+        boards = game.get_bitboards()
+        own = boards[0] if game.get_active_player() == 'BLACK' else boards[1]
+        occupied = boards[0] | boards[1]
+        key, transform = game.canonical_key()
+        squares = SQUARE_TRANSFORMS[transform]
+        moves = [(squares[start], squares[end], played, score) for start, end, played, score in self.probe_key(key)]
+        moves = [(CELL_NAMES[start], CELL_NAMES[end], played, score) for start, end, played, score in moves
+                 if own >> start & 1 and reachable_mask(start, occupied) >> end & 1]
+        moves.sort(key=lambda move: move[2], reverse=True)
+        return moves
+
+    def best_move(self, game, min_count=1):
+        """
+        Picks the book move of a game's position: the move with the best average score, most played first when two
+        score the same.
+        :param game: HasamiShogiGame
+        :param min_count: Moves played fewer times than this are not picked
+        :return: (start cell, end cell, times played, score) of the move, None if the book has no move
+        """
+        best = None
+        for move in self.probe(game):
+            if move[2] >= min_count and (best is None or move[3] * best[2] > best[3] * move[2]):
+                best = move
+        return best
+
+    def close(self):
+        """
+        Unmaps and closes the book file.
+        :return: Does not return anything
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _self_play_chunk(depth, seeds, opening_plies, max_plies):
+    """
+    Worker task, plays a chunk of self-play games.
+    :param depth: Search depth in plies
+    :param seeds: Seeds of the games
+    :param opening_plies: Number of random moves at the start of each game, so games differ
+    :param max_plies: The game is a draw after this many moves
+    :return: list of (moves as cell pairs, result), one per game
+    """
+    engine = SearchEngine(table_bits=16)
+    games = []
+    for seed in seeds:
+        rng = random.Random(seed)
+        game = HasamiShogiGame()
+        engine.clear()
+        moves = []
+        while game.get_game_state() == 'UNFINISHED' and len(moves) < max_plies:
+            if len(moves) < opening_plies:
+                legal = list(game.legal_moves())
+                move = rng.choice(legal) if legal else None
+            else:
+                move = engine.best_move(game, depth)
+            if move is None:
+                break
+            game.make_move(*move)
+            moves.append(move)
+        games.append((moves, game.get_game_state()))
+    return games
+
+
+def self_play(path, num_games, depth=2, workers=None, chunk_size=8, seed=0, opening_plies=2,
+              max_plies=300):
+    """
+    Plays games of the search engine against itself over a pool of worker processes and appends them to a record file.
+    :param path: Path of the record file
+    :param num_games: Number of games
+    :param depth: Search depth in plies
+    :param workers: Number of worker processes, the number of CPUs if None
+    :param chunk_size: Number of games given to a worker at a time
+    :param seed: Seed, each game gets its own seed from it
+    :param opening_plies: Number of random moves at the start of each game, so games differ
+    :param max_plies: The game is a draw after this many moves
+    :return: games/sec
+    """
+    seeds = ['%d-%d' % (seed, game_id) for game_id in range(num_games)]
+    chunks = [seeds[index:index + chunk_size] for index in range(0, len(seeds), chunk_size)]
+    start = time.perf_counter()
+    with GameRecordWriter(path) as writer, ProcessPoolExecutor(max_workers=workers) as pool:
+        for games in pool.map(_self_play_chunk, *zip(*[(depth, chunk, opening_plies, max_plies)
+                                                       for chunk in chunks])):
+            for moves, result in games:
+                writer.write_game(moves, result)
+    elapsed = time.perf_counter() - start
+    return num_games / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    """
+    Plays self-play games into a record file, or builds a book file from record files, from the command line.
+    :return: Doesn't return anything
+    """
+    parser = argparse.ArgumentParser(description='Hasami Shogi opening book')
+    commands = parser.add_subparsers(dest='command', required=True)
+    play = commands.add_parser('selfplay', help='play games of the engine against itself into a record file')
+    play.add_argument('records', help='record file, appended to')
+    play.add_argument('--games', type=int, default=1000, help='number of games')
+    play.add_argument('--depth', type=int, default=2, help='search depth in plies')
+    play.add_argument('--workers', type=int, default=None, help='worker processes, default one per CPU')
+    play.add_argument('--seed', type=int, default=0, help='seed')
+    play.add_argument('--opening-plies', type=int, default=2, help='random moves at the start of each game')
+    build = commands.add_parser('build', help='build a book file from record files')
+    build.add_argument('book', help='book file to write')
+    build.add_argument('records', nargs='+', help='record files')
+    build.add_argument('--plies', type=int, default=12, help='plies from the start the book covers')
+    build.add_argument('--min-count', type=int, default=1, help='leave out moves played fewer times')
+    args = parser.parse_args()
+
+    if args.command == 'selfplay':
+        games_per_sec = self_play(args.records, args.games, args.depth, args.workers, seed=args.seed,
+                                  opening_plies=args.opening_plies)
+        print('%d games, %.1f games/sec' % (args.games, games_per_sec))
+    else:
+        num_games, num_entries = build_book(args.records, args.book, args.plies, args.min_count)
+        print('%d games, %d book entries written to %s' % (num_games, num_entries, args.book))
+
+
+if __name__ == '__main__':
+    main()
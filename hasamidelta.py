@@ -0,0 +1,183 @@
+# Move deltas for Hasami Shogi Game clients. Instead of sending the whole board after every move, a server sends what
+# the move changed (see MoveDelta and HasamiShogiGame.last_delta): 3 bytes plus one byte per captured piece, however
+# many clients follow the game. A client holds a DeltaBoard, loaded once from a CompactGameState, and applies each
+# delta to it with a few bit operations, without checking any rules, the server has already done that.
+#
+# A delta is packed as the start square, the end square, a flags byte and then the captured squares, one byte each.
+# The flags byte holds the number of captured pieces in bits 0 to 3, bit 4 set when Red is to move after the move and
+# the game state after the move, as an index into GAME_STATES, in bits 5 and 6.
+#
+# The format is for the standard 9x9 board only: a square takes one byte and the captured count four bits, too small for
+# the larger boards of board_geometry. Deltas and DeltaBoard raise ValueError for any other board.
+
+from hasamishogigame import (BOARD_ROWS, BOARD_COLUMNS, BOARD_SQUARES, CELL_INDEX, PIECES, PLAYERS, PLAYER_INDEX,
+                             ROW_NAMES, STANDARD_GEOMETRY, CompactGameState, HasamiShogiGame, MoveDelta)
+
+# Game states, in the order they are packed
+GAME_STATES = ('UNFINISHED', 'BLACK_WON', 'RED_WON')
+
+DELTA_HEADER_SIZE = 3
+CAPTURED_BITS = 0x0F
+RED_TO_MOVE = 0x10
+STATE_SHIFT = 5
+
+
+def _check_geometry(geometry):
+    """
+    Checks that deltas can be packed for a board.
+    :param geometry: BoardGeometry of the game
+    :return: Does not return anything, raises ValueError for any board but the standard one
+    """
+    if geometry is not STANDARD_GEOMETRY:
+        raise ValueError('move deltas are for the %dx%d board, not %dx%d' %
+                         (BOARD_ROWS, BOARD_COLUMNS, geometry.rows, geometry.columns))
+
+
+def encode_delta(delta, geometry=STANDARD_GEOMETRY):
+    """
+    Packs a delta.
+    :param delta: MoveDelta
+    :param geometry: BoardGeometry of the game the delta comes from, only the standard board can be packed
+    :return: bytes, DELTA_HEADER_SIZE plus one per captured piece
+    """
+    _check_geometry(geometry)
+    flags = len(delta.captured) | GAME_STATES.index(delta.game_state) << STATE_SHIFT
+    if delta.player_turn == 'RED':
+        flags |= RED_TO_MOVE
+    return bytes((delta.start, delta.end, flags)) + bytes(delta.captured)
+
+
+def decode_delta(data, offset=0):
+    """
+    Unpacks a delta, from the start of data or from an offset into a stream of deltas.
+    :param data: bytes-like holding packed deltas
+    :param offset: Offset of the delta in data
+    :return: (MoveDelta, offset of the next delta)
+    """
+    if len(data) < offset + DELTA_HEADER_SIZE:
+        raise ValueError('truncated move delta')
+    start, end, flags = data[offset:offset + DELTA_HEADER_SIZE]
+    offset += DELTA_HEADER_SIZE
+    end_offset = offset + (flags & CAPTURED_BITS)
+    if len(data) < end_offset:
+        raise ValueError('truncated move delta')
+    state = flags >> STATE_SHIFT
+    if state >= len(GAME_STATES):
+        raise ValueError('bad game state in move delta')
+    captured = tuple(data[offset:end_offset])
+    if max((start, end) + captured) >= BOARD_SQUARES:
+        raise ValueError('square off the board in move delta')
+    delta = MoveDelta(start, end, captured, PLAYERS[bool(flags & RED_TO_MOVE)], GAME_STATES[state])
+    return delta, end_offset
+
+
+def iter_deltas(data):
+    """
+    Unpacks a stream of deltas written one after the other.
+    :param data: bytes-like of packed deltas
+    :return: yields MoveDelta
+    """
+    offset = 0
+    while offset < len(data):
+        delta, offset = decode_delta(data, offset)
+        yield delta
+
+
+class DeltaBoard:
+    """
+    A client's copy of a game's position, kept up to date from move deltas. It holds the same bitboards as
+    HasamiShogiGame but knows none of the rules, applying a delta costs the same whatever the board size.
+    """
+    __slots__ = ('_boards', '_captured', 'player_turn', 'game_state')
+
+    def __init__(self, state=None, geometry=STANDARD_GEOMETRY):
+        """
+        Initializes the board, to the starting position or to a given one.
+        :param state: CompactGameState or its bytes, the starting position if None
+        :param geometry: BoardGeometry of the game followed, only the standard board is supported
+        """
+        _check_geometry(geometry)
+        self.load_state(HasamiShogiGame().save_state() if state is None else state)
+
+    def load_state(self, state):
+        """
+        Replaces the position, to join a game in progress or to resynchronise.
+        :param state: CompactGameState or its bytes
+        :return: Does not return anything
+        """
+        if not isinstance(state, CompactGameState):
+            state = CompactGameState(state)
+        self._boards, self.player_turn, black_captured, red_captured = state.unpack()
+        self._captured = [black_captured, red_captured]
+        game = HasamiShogiGame()
+        game.load_state(state)
+        self.game_state = game.get_game_state()
+
+    def apply(self, delta):
+        """
+        Follows one move.
+        :param delta: MoveDelta, or the packed bytes of one
+        :return: Does not return anything
+        """
+        if not isinstance(delta, MoveDelta):
+            delta, _ = decode_delta(delta)
+        boards = self._boards
+        player = 1 if boards[1] >> delta.start & 1 else 0
+        boards[player] ^= 1 << delta.start | 1 << delta.end
+        for square in delta.captured:
+            boards[1 - player] &= ~(1 << square)
+        self._captured[1 - player] += len(delta.captured)
+        self.player_turn = delta.player_turn
+        self.game_state = delta.game_state
+
+    def get_bitboards(self):
+        """
+        Takes no parameters and returns the board as bitboards.
+        :return: (black, red) integers, bit n is set when that player has a piece on square n
+        """
+        return self._boards[0], self._boards[1]
+
+    def get_num_captured_pieces(self, player):
+        """
+        Returns the number of pieces of a player that have been captured.
+        :param player: Either 'RED' or 'BLACK'
+        :return: the number of pieces
+        """
+        return self._captured[PLAYER_INDEX[player]]
+
+    def get_square_occupant(self, cell):
+        """
+        Returns the player with a piece on a cell.
+        :param cell: Cell name, for example 'a1'
+        :return: 'BLACK', 'RED' or 'NONE'
+        """
+        square = CELL_INDEX[cell]
+        for player, board in zip(PLAYERS, self._boards):
+            if board >> square & 1:
+                return player
+        return 'NONE'
+
+    def save_state(self):
+        """
+        Takes no parameters and packs the position, for comparing it with the server's.
+        :return: CompactGameState
+        """
+        return CompactGameState.pack(self._boards, self.player_turn, *self._captured)
+
+    def rows(self):
+        """
+        Takes no parameters and draws the board as text, one string per row as HasamiShogiGame.print_board does.
+        :return: list of strings
+        """
+        lines = []
+        for row in range(BOARD_ROWS):
+            line = ROW_NAMES[row]
+            for square in range(row * BOARD_COLUMNS, (row + 1) * BOARD_COLUMNS):
+                piece = '.'
+                for player, board in enumerate(self._boards):
+                    if board >> square & 1:
+                        piece = PIECES[player]
+                line += ' ' + piece
+            lines.append(line)
+        return lines
+
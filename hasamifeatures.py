@@ -0,0 +1,220 @@
+# Batch evaluation features for the Hasami Shogi Game, for tuning the evaluation weights over many positions at once.
+# Positions come in as an (N, 81) int8 array, one row per position in square order with BLACK, RED or EMPTY from
+# hasamibatch.py. Each position is turned into row masks, one 9 bit integer per row and player with bit c set for a
+# piece in column c, and every feature is computed for all positions together with NumPy shifts and masks: a step
+# left or right is a bit shift of the row masks, a step up or down is a slice of the rows. Needs NumPy.
+#
+# Features are Black's count less Red's:
+#     material    pieces on the board, so the pieces the opponent has lost less the pieces lost
+#     mobility    legal moves, 0 once the game is over, as counted by HasamiShogiGame.count_legal_moves
+#     threatened  pieces the opponent could capture with one move
+#     edge        pieces on the edge of the board, not counting the corners
+#     corner      pieces on a corner square, the only squares open to a corner capture
+# The default weights give the same score as SearchEngine.evaluate for Black.
+
+import numpy as np
+
+from hasamibatch import BLACK, RED, DIRECTIONS, MAX_DISTANCE, PAD
+from hasamishogigame import BOARD_ROWS, BOARD_COLUMNS, BOARD_SQUARES, CAPTURES_TO_WIN, CORNER_GUARDS, PLAYERS
+from hasamisearch import PIECE_SCORE, MOBILITY_SCORE
+
+FEATURE_NAMES = ('material', 'mobility', 'threatened', 'edge', 'corner')
+DEFAULT_WEIGHTS = np.array([PIECE_SCORE, MOBILITY_SCORE, 0, 0, 0], dtype=np.float64)
+
+# Pieces each player starts with, a player with fewer than PIECES - CAPTURES_TO_WIN + 1 left has lost
+PIECES = BOARD_COLUMNS
+
+ROW_MASK = (1 << BOARD_COLUMNS) - 1
+COLUMN_BITS = (1 << np.arange(BOARD_COLUMNS)).astype(np.uint16)
+# POPCOUNT[bits] is the number of pieces in a row mask
+POPCOUNT = np.array([bin(bits).count('1') for bits in range(1 << BOARD_COLUMNS)], dtype=np.int32)
+
+# Row masks of the corner squares and of the other edge squares
+SIDE_COLUMNS = 1 | 1 << (BOARD_COLUMNS - 1)
+CORNER_ROWS = np.zeros((BOARD_ROWS, 1), dtype=np.uint16)
+CORNER_ROWS[[0, -1]] = SIDE_COLUMNS
+EDGE_ROWS = np.full((BOARD_ROWS, 1), SIDE_COLUMNS, dtype=np.uint16)
+EDGE_ROWS[[0, -1]] = ROW_MASK ^ SIDE_COLUMNS
+
+# The two guard squares of each corner, as (row, column) pairs
+CORNER_SQUARES = {}
+for _guard, (_corner, _other) in CORNER_GUARDS.items():
+    CORNER_SQUARES.setdefault(divmod(_corner, BOARD_COLUMNS), []).append(divmod(_guard, BOARD_COLUMNS))
+
+# Positions are processed this many at a time, to bound the memory of the working arrays
+CHUNK_SIZE = 1 << 16
+
+
+def _pad(rows):
+    """
+    Copies the row masks of a batch into the middle of a larger array of empty rows, so the rows seen from any row any
+    distance away are a slice of it. The batch is the last axis, so each slice is a run of whole rows of the batch.
+    :param rows: (9, N) uint16 array of row masks
+    :return: (9 + 2 * PAD, N) uint16 array
+    """
+    padded = np.zeros((BOARD_ROWS + 2 * PAD, rows.shape[1]), dtype=np.uint16)
+    padded[PAD:PAD + BOARD_ROWS] = rows
+    return padded
+
+
+def _look(padded, row_step, column_step, distance):
+    """
+    Reads padded row masks at the square distance steps away in a direction from every square.
+    :param padded: array from _pad
+    :param row_step: -1, 0 or 1
+    :param column_step: -1, 0 or 1
+    :param distance: Number of steps
+    :return: (9, N) uint16 array, bits off the board are clear
+    """
+    row = PAD + distance * row_step
+    rows = padded[row:row + BOARD_ROWS]
+    if column_step > 0:
+        return rows >> distance
+    elif column_step < 0:
+        return (rows << distance) & ROW_MASK
+    return rows
+
+
+def _count(rows):
+    """
+    Counts the set bits of each position.
+    :param rows: (9, N) uint16 array of row masks
+    :return: (N,) int32 array
+    """
+    return POPCOUNT[rows].sum(axis=0)
+
+
+def _moves_to(pieces, empty):
+    """
+    Finds, for each direction, the empty squares a piece of a player can move to coming from that direction. Every
+    legal move of the player ends on one of these squares, so their counts add up to the player's legal moves.
+    :param pieces: padded row masks of the player's pieces
+    :param empty: padded row masks of the empty squares
+    :return: list of (9, N) row masks, one per direction
+    """
+    inside = _look(empty, 0, 0, 0)
+    targets = []
+    for row_step, column_step in DIRECTIONS:
+        # From each empty square, the squares closer than distance are empty and a piece is at distance
+        clear = inside
+        found = np.zeros_like(inside)
+        for distance in range(1, MAX_DISTANCE + 1):
+            found |= clear & _look(pieces, row_step, column_step, distance)
+            clear = clear & _look(empty, row_step, column_step, distance)
+        targets.append(found)
+    return targets
+
+
+def _threatened(pieces, opponent, targets):
+    """
+    Counts the pieces of a player that the opponent could capture with one move: each line of the player's pieces with
+    an opponent piece at one end and, at the other end, an empty square an opponent piece can move to, and each corner
+    piece with an opponent piece on one guard square and the other guard square open to an opponent piece.
+    :param pieces: padded row masks of the player's pieces
+    :param opponent: padded row masks of the opponent's pieces
+    :param targets: row masks of the empty squares an opponent piece can move to
+    :return: (N,) int32 array
+    """
+    captured = np.zeros_like(targets)
+    marks = np.zeros_like(pieces)
+    for row_step, column_step in DIRECTIONS:
+        line = targets
+        closed = []
+        for distance in range(1, MAX_DISTANCE):
+            line = line & _look(pieces, row_step, column_step, distance)
+            if not line.any():
+                break
+            closed.append(line & _look(opponent, row_step, column_step, distance + 1))
+        # marks holds the squares an opponent could move to and capture a line of at least distance pieces from. A
+        # line of k pieces is captured from k squares away, so walk back from the longest lines.
+        marks[:] = 0
+        for distance in range(len(closed), 0, -1):
+            marks[PAD:PAD + BOARD_ROWS] |= closed[distance - 1]
+            captured |= _look(marks, -row_step, -column_step, distance)
+    inside = _look(opponent, 0, 0, 0)
+    corners = _look(pieces, 0, 0, 0)
+    for (row, column), ((row_a, column_a), (row_b, column_b)) in CORNER_SQUARES.items():
+        open_a = (targets[row_a] >> column_a) & (inside[row_b] >> column_b)
+        open_b = (targets[row_b] >> column_b) & (inside[row_a] >> column_a)
+        captured[row] |= corners[row] & ((open_a | open_b) & 1) << column
+    return _count(captured)
+
+
+def _chunk_features(positions):
+    """
+    Computes the features of one chunk of positions.
+    :param positions: (N, 81) int8 array, BLACK, RED or EMPTY for each square
+    :return: (N, F) int32 array
+    """
+    squares = positions.reshape(-1, BOARD_ROWS, BOARD_COLUMNS)
+    black = ((squares == BLACK) * COLUMN_BITS).sum(axis=2, dtype=np.uint16).T
+    red = ((squares == RED) * COLUMN_BITS).sum(axis=2, dtype=np.uint16).T
+    empty = _pad(ROW_MASK ^ (black | red))
+    padded_black = _pad(black)
+    padded_red = _pad(red)
+    black_pieces = _count(black)
+    red_pieces = _count(red)
+    unfinished = np.minimum(black_pieces, red_pieces) > PIECES - CAPTURES_TO_WIN
+    black_moves = _moves_to(padded_black, empty)
+    red_moves = _moves_to(padded_red, empty)
+
+    features = np.empty((len(positions), len(FEATURE_NAMES)), dtype=np.int32)
+    features[:, 0] = black_pieces - red_pieces
+    features[:, 1] = (sum(_count(moves) for moves in black_moves) - sum(_count(moves) for moves in red_moves)) * \
+        unfinished
+    features[:, 2] = (_threatened(padded_black, padded_red, np.bitwise_or.reduce(red_moves)) -
+                      _threatened(padded_red, padded_black, np.bitwise_or.reduce(black_moves)))
+    features[:, 3] = _count(black & EDGE_ROWS) - _count(red & EDGE_ROWS)
+    features[:, 4] = _count(black & CORNER_ROWS) - _count(red & CORNER_ROWS)
+    return features
+
+
+def batch_features(positions):
+    """
+    Computes the features of a batch of positions, see FEATURE_NAMES.
+    :param positions: (N, 81) int8 array, BLACK, RED or EMPTY for each square
+    :return: (N, F) int32 array, one column per feature
+    """
+    positions = np.asarray(positions, dtype=np.int8).reshape(-1, BOARD_SQUARES)
+    features = np.empty((len(positions), len(FEATURE_NAMES)), dtype=np.int32)
+    for start in range(0, len(positions), CHUNK_SIZE):
+        features[start:start + CHUNK_SIZE] = _chunk_features(positions[start:start + CHUNK_SIZE])
+    return features
+
+
+def batch_evaluate(positions, weights=DEFAULT_WEIGHTS, turn=None):
+    """
+    Scores a batch of positions.
+    :param positions: (N, 81) int8 array, BLACK, RED or EMPTY for each square
+    :param weights: (F,) array of feature weights
+    :param turn: (N,) array of BLACK or RED, the player each score is for, Black if None
+    :return: ((N, F) int32 features, (N,) float64 scores)
+    """
+    features = batch_features(positions)
+    scores = features @ np.asarray(weights, dtype=np.float64)
+    if turn is not None:
+        scores *= np.asarray(turn)
+    return features, scores
+
+
+def positions_from_games(games):
+    """
+    Builds the position array of a list of games from their bitboards.
+    :param games: list of HasamiShogiGame
+    :return: (N, 81) int8 array, BLACK, RED or EMPTY for each square
+    """
+    boards = np.zeros((len(games), 2, 16), dtype=np.uint8)
+    for index, game in enumerate(games):
+        for player, board in enumerate(game.get_bitboards()):
+            boards[index, player] = np.frombuffer(board.to_bytes(16, 'little'), dtype=np.uint8)
+    bits = np.unpackbits(boards, axis=2, bitorder='little')[:, :, :BOARD_SQUARES].astype(np.int8)
+    return bits[:, 0] * BLACK + bits[:, 1] * RED
+
+
+def turns_from_games(games):
+    """
+    Lists the player to move of each game.
+    :param games: list of HasamiShogiGame
+    :return: (N,) int8 array of BLACK or RED
+    """
+    return np.array([(BLACK, RED)[PLAYERS.index(game.get_active_player())] for game in games], dtype=np.int8)
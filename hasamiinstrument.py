@@ -0,0 +1,196 @@
+# Opt-in instrumentation of the Hasami Shogi Game. enable() replaces the main methods of HasamiShogiGame with versions
+# that count their calls and time them, and records how many pieces each move captured. disable() puts the original
+# methods back, so the game runs at full speed whenever instrumentation is off. The counters are read with snapshot()
+# or dump(), which writes them in the Prometheus text format so they can be scraped.
+#
+# Example:
+#     hasamiinstrument.enable()
+#     ... play games ...
+#     print(hasamiinstrument.dump())
+
+import time
+from collections import Counter
+
+from hasamishogigame import HasamiShogiGame, PLAYERS
+
+# Methods of HasamiShogiGame that are counted and timed. Times are cumulative and include the methods called inside,
+# for example make_move includes make_square_move.
+INSTRUMENTED_METHODS = ('make_move', 'make_square_move', 'unmake_move', 'move_check', 'capture_check', 'search_board',
+                        'get_square_occupant', 'count_legal_moves', 'legal_moves', 'position_key')
+
+# Original methods while instrumentation is on, None while it is off
+_originals = None
+
+_calls = Counter()
+_seconds = Counter()
+# Number of moves by the number of pieces they captured
+_captures = Counter()
+_started = time.perf_counter()
+
+
+def enabled():
+    """
+    Tells if instrumentation is on.
+    :return: True or False
+    """
+    return _originals is not None
+
+
+def enable():
+    """
+    Swaps the instrumented methods into HasamiShogiGame. Does nothing if instrumentation is already on.
+    :return: Does not return anything
+    """
+    global _originals
+    if _originals is not None:
+        return
+    _originals = {name: getattr(HasamiShogiGame, name) for name in INSTRUMENTED_METHODS}
+    for name, method in _originals.items():
+        if name == 'make_square_move':
+            wrapper = _instrument_move(method)
+        elif name == 'legal_moves':
+            wrapper = _instrument_generator(name, method)
+        else:
+            wrapper = _instrument(name, method)
+        setattr(HasamiShogiGame, name, wrapper)
+
+
+def disable():
+    """
+    Puts the original methods back into HasamiShogiGame. The counters are kept until reset.
+    :return: Does not return anything
+    """
+    global _originals
+    if _originals is None:
+        return
+    for name, method in _originals.items():
+        setattr(HasamiShogiGame, name, method)
+    _originals = None
+
+
+def reset():
+    """
+    Sets every counter back to zero and restarts the clock of moves/sec.
+    :return: Does not return anything
+    """
+    global _started
+    _calls.clear()
+    _seconds.clear()
+    _captures.clear()
+    _started = time.perf_counter()
+
+
+def _instrument(name, method):
+    """
+    Wraps a method to count its calls and time them.
+    :param name: Name of the method
+    :param method: Original function
+    :return: wrapper function
+    """
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _seconds[name] += perf_counter() - start
+            _calls[name] += 1
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def _instrument_generator(name, method):
+    """
+    Wraps a generator method to count its calls and time the iteration over it.
+    :param name: Name of the method
+    :param method: Original generator function
+    :return: wrapper generator function
+    """
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        _calls[name] += 1
+        generator = method(*args, **kwargs)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            finally:
+                _seconds[name] += perf_counter() - start
+            yield item
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+def _instrument_move(method):
+    """
+    Wraps make_square_move to count and time it, and to record the number of pieces captured by each move made.
+    :param method: Original make_square_move
+    :return: wrapper function
+    """
+    perf_counter = time.perf_counter
+
+    def make_square_move(self, start, end):
+        captured_before = self.get_num_captured_pieces(PLAYERS[0]) + self.get_num_captured_pieces(PLAYERS[1])
+        started = perf_counter()
+        try:
+            result = method(self, start, end)
+        finally:
+            _seconds['make_square_move'] += perf_counter() - started
+            _calls['make_square_move'] += 1
+        if result:
+            captured = self.get_num_captured_pieces(PLAYERS[0]) + self.get_num_captured_pieces(PLAYERS[1])
+            _captures[captured - captured_before] += 1
+        return result
+
+    make_square_move.__doc__ = method.__doc__
+    return make_square_move
+
+
+def snapshot():
+    """
+    Returns a copy of the counters.
+    :return: dict with 'calls' and 'seconds' by method name, 'captures' (moves by pieces captured), 'moves' (moves
+    made), 'elapsed' (seconds since the last reset) and 'moves_per_sec' (moves made per second of elapsed time)
+    """
+    elapsed = time.perf_counter() - _started
+    moves = sum(_captures.values())
+    return {
+        'calls': dict(_calls),
+        'seconds': dict(_seconds),
+        'captures': dict(sorted(_captures.items())),
+        'moves': moves,
+        'elapsed': elapsed,
+        'moves_per_sec': moves / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def dump(stats=None):
+    """
+    Formats the counters in the Prometheus text exposition format.
+    :param stats: dict from snapshot, a new snapshot if None
+    :return: string, one metric per line
+    """
+    if stats is None:
+        stats = snapshot()
+    lines = ['# TYPE hasami_method_calls_total counter']
+    lines += ['hasami_method_calls_total{method="%s"} %d' % (name, count) for name, count in
+              sorted(stats['calls'].items())]
+    lines.append('# TYPE hasami_method_seconds_total counter')
+    lines += ['hasami_method_seconds_total{method="%s"} %.9f' % (name, seconds) for name, seconds in
+              sorted(stats['seconds'].items())]
+    lines.append('# TYPE hasami_moves_captured_total counter')
+    lines += ['hasami_moves_captured_total{pieces="%d"} %d' % (pieces, count) for pieces, count in
+              stats['captures'].items()]
+    lines.append('# TYPE hasami_moves_total counter')
+    lines.append('hasami_moves_total %d' % stats['moves'])
+    lines.append('# TYPE hasami_moves_per_second gauge')
+    lines.append('hasami_moves_per_second %.3f' % stats['moves_per_sec'])
+    return '\n'.join(lines) + '\n'
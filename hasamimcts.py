@@ -0,0 +1,349 @@
+# Monte Carlo Tree Search player for the Hasami Shogi Game. Grows a search tree with UCT selection, and plays the
+# leaves out with random moves to the end of the game. Rollouts can run in a pool of worker processes, using virtual
+# loss so the leaves sent out together are spread over the tree. The tree is kept between moves, and the part below
+# the moves that were played is reused.
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from hasamishogigame import HasamiShogiGame
+
+# Exploration constant of the UCT formula
+EXPLORATION = 1.4
+
+# Rollouts stop after this many moves, the player with more captures is then the winner.
+ROLLOUT_PLIES = 200
+
+
+class Node:
+    """
+    Node of the search tree, the position after move. Wins are counted for the player who made the move.
+    """
+    __slots__ = ('move', 'parent', 'player', 'key', 'children', 'untried', 'visits', 'wins', 'winner')
+
+    def __init__(self, move, parent, player, key):
+        """
+        Initializes an unvisited node.
+        :param move: (start cell, end cell) leading to the node, None for the root
+        :param parent: Node above, None for the root
+        :param player: 'RED' or 'BLACK', the player who made the move, None for the root
+        :param key: position_key of the position
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.key = key
+        self.children = []
+        # Moves not expanded yet, None until the node is first reached
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+        # Set for finished games: 'BLACK', 'RED' or 'DRAW'
+        self.winner = None
+
+
+def rollout(game, rng, max_plies=ROLLOUT_PLIES):
+    """
+    Plays random moves to the end of the game, then takes them all back so the game is unchanged.
+    :param game: HasamiShogiGame to play out
+    :param rng: random.Random for the moves
+    :param max_plies: Most moves to play
+    :return: 'BLACK', 'RED' or 'DRAW'
+    """
+    plies = 0
+    while game.get_game_state() == 'UNFINISHED' and plies < max_plies:
+        moves = list(game.legal_moves())
+        if not moves:
+            break
+        game.make_move(*rng.choice(moves))
+        plies += 1
+    winner = _winner(game)
+    for _ in range(plies):
+        game.unmake_move()
+    return winner
+
+
+def _winner(game):
+    """
+    Decides the winner of a game, finished or not. Unfinished games go to the player who captured more pieces.
+    :param game: HasamiShogiGame
+    :return: 'BLACK', 'RED' or 'DRAW'
+    """
+    state = game.get_game_state()
+    if state == 'BLACK_WON':
+        return 'BLACK'
+    elif state == 'RED_WON':
+        return 'RED'
+    black_lost = game.get_num_captured_pieces('BLACK')
+    red_lost = game.get_num_captured_pieces('RED')
+    if black_lost == red_lost:
+        return 'DRAW'
+    return 'BLACK' if red_lost > black_lost else 'RED'
+
+
+def _rollout_paths(game, paths, seed, max_plies):
+    """
+    Rollout task for a worker. Plays out the position at the end of each move path from the given game.
+    :param game: HasamiShogiGame at the root of the tree
+    :param paths: list of move lists from the root to a leaf
+    :param seed: Seed for the random moves
+    :param max_plies: Most moves in each rollout
+    :return: list of winners, one per path
+    """
+    rng = random.Random(seed)
+    winners = []
+    for path in paths:
+        for move in path:
+            game.make_move(*move)
+        winners.append(rollout(game, rng, max_plies))
+        for _ in path:
+            game.unmake_move()
+    return winners
+
+
+class MCTSPlayer:
+    """
+    Monte Carlo Tree Search player. Works with the tournament runner through new_game and choose_move.
+    """
+
+    def __init__(self, playouts=1000, time=None, workers=0, batch=8, exploration=EXPLORATION,
+                 rollout_plies=ROLLOUT_PLIES):
+        """
+        Initializes the player. Options may be given as text from a tournament player spec.
+        :param playouts: Playouts per move, or None to only use the time limit
+        :param time: Seconds per move, or None to only use the playout count
+        :param workers: Worker processes for the rollouts, 0 to run them in this process
+        :param batch: Leaves sent to each worker at a time
+        :param exploration: Exploration constant of the UCT formula
+        :param rollout_plies: Most moves in each rollout
+        """
+        self._playouts = None if playouts in (None, 'None') else int(playouts)
+        self._time = None if time in (None, 'None') else float(time)
+        self._workers = int(workers)
+        self._batch = int(batch)
+        self._exploration = float(exploration)
+        self._rollout_plies = int(rollout_plies)
+        self._pool = None
+        self._root = None
+        self.stats = {}
+
+    def new_game(self):
+        """
+        Called before each game, drops the search tree.
+        :return: Does not return anything
+        """
+        self._root = None
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        :return: Does not return anything
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def choose_move(self, game, rng):
+        """
+        Searches the game until the playout count or time limit is reached and picks the most visited move.
+        :param game: HasamiShogiGame to move in, it is left in the same position
+        :param rng: random.Random for the rollouts
+        :return: (start cell, end cell), None if the game is finished or there is no legal move
+        """
+        start = time.perf_counter()
+        deadline = None if self._time is None else start + self._time
+        root = self._reuse_root(game)
+        reused = root.visits
+        if self._workers and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self._workers)
+
+        playouts = 0
+        while True:
+            if self._playouts is not None and playouts >= self._playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self._playouts is None and deadline is None:
+                break
+            size = max(1, self._workers) * self._batch
+            if self._playouts is not None:
+                size = min(size, self._playouts - playouts)
+            playouts += self._run_batch(game, root, size, rng)
+
+        seconds = time.perf_counter() - start
+        self.stats = {
+            'playouts': playouts,
+            'seconds': seconds,
+            'playouts_per_sec': playouts / seconds if seconds > 0 else 0.0,
+            'reused_visits': reused,
+            'root_visits': root.visits,
+        }
+
+        if not root.children:
+            self._root = None
+            return None
+        best = max(root.children, key=lambda child: child.visits)
+        # Keep the subtree of the chosen move for the next call
+        self._root = best
+        return best.move
+
+    def report(self):
+        """
+        Describes the statistics of the last move.
+        :return: string with the playouts and playouts/sec
+        """
+        return 'playouts %d  %.0f playouts/sec  reused %d visits' % (
+            self.stats['playouts'], self.stats['playouts_per_sec'], self.stats['reused_visits'])
+
+    def _reuse_root(self, game):
+        """
+        Finds the node of the current position in the kept tree, looking at the kept root and the replies to it.
+        :param game: HasamiShogiGame at the position to search
+        :return: root Node for the search
+        """
+        key = game.position_key()
+        candidates = []
+        if self._root is not None:
+            candidates = [self._root] + self._root.children
+        for node in candidates:
+            if node.key == key and node.winner is None:
+                node.parent = None
+                node.move = None
+                return node
+        return Node(None, None, None, key)
+
+    def _run_batch(self, game, root, size, rng):
+        """
+        Selects up to size leaves with virtual loss, plays them out and backs up the results.
+        :param game: HasamiShogiGame at the root position
+        :param root: root Node
+        :param size: Number of leaves to select
+        :param rng: random.Random for expansion order and rollout seeds
+        :return: the number of playouts done
+        """
+        leaves = []
+        paths = []
+        done = 0
+        for _ in range(size):
+            node, path = self._select(game, root, rng)
+            if node is None:
+                break
+            if node.winner is not None:
+                self._backup(node, node.winner)
+                done += 1
+            else:
+                leaves.append(node)
+                paths.append(path)
+
+        if not leaves:
+            return done
+        if self._pool is None:
+            winners = _rollout_paths(game, paths, rng.getrandbits(64), self._rollout_plies)
+        else:
+            chunks = [paths[index:index + self._batch] for index in range(0, len(paths), self._batch)]
+            futures = [self._pool.submit(_rollout_paths, game, chunk, rng.getrandbits(64), self._rollout_plies)
+                       for chunk in chunks]
+            winners = [winner for future in futures for winner in future.result()]
+        for node, winner in zip(leaves, winners):
+            self._backup(node, winner)
+        return done + len(leaves)
+
+    def _select(self, game, root, rng):
+        """
+        Walks down the tree by UCT, expands one new child, and adds a virtual loss (a visit with no win yet) to every
+        node on the way, so the next selection of the batch prefers other leaves.
+        :param game: HasamiShogiGame at the root position, it is left unchanged
+        :param root: root Node
+        :param rng: random.Random for the expansion order
+        :return: (leaf Node, list of moves from the root), (None, None) if the root has no moves
+        """
+        node = root
+        path = []
+        while True:
+            if node.untried is None:
+                node.untried = list(game.legal_moves()) if node.winner is None else []
+                rng.shuffle(node.untried)
+                if not node.untried and node.winner is None:
+                    # No legal moves, the game can't go on
+                    node.winner = _winner(game)
+            if node.winner is not None or node.untried:
+                break
+            node = self._best_child(node)
+            game.make_move(*node.move)
+            path.append(node.move)
+
+        if node.untried:
+            move = node.untried.pop()
+            player = game.get_active_player()
+            game.make_move(*move)
+            path.append(move)
+            child = Node(move, node, player, game.position_key())
+            if game.get_game_state() != 'UNFINISHED':
+                child.winner = _winner(game)
+            node.children.append(child)
+            node = child
+
+        for _ in path:
+            game.unmake_move()
+        if node is root and node.winner is None:
+            return None, None
+
+        visited = node
+        while visited is not None:
+            visited.visits += 1
+            visited = visited.parent
+        return node, path
+
+    def _best_child(self, node):
+        """
+        Picks the child with the highest UCT value.
+        :param node: Node with every child expanded
+        :return: child Node
+        """
+        log_visits = math.log(node.visits)
+        exploration = self._exploration
+        return max(node.children, key=lambda child: child.wins / child.visits +
+                   exploration * math.sqrt(log_visits / child.visits))
+
+    def _backup(self, node, winner):
+        """
+        Adds the result of a playout to the node and the nodes above it. The visits were already added when the node
+        was selected.
+        :param node: leaf Node of the playout
+        :param winner: 'BLACK', 'RED' or 'DRAW'
+        :return: Does not return anything
+        """
+        while node is not None:
+            if winner == 'DRAW':
+                node.wins += 0.5
+            elif winner == node.player:
+                node.wins += 1.0
+            node = node.parent
+
+
+def main():
+    """
+    Plays an MCTS player against itself for a few moves and prints the playouts/sec of each move.
+    :return: Doesn't return anything
+    """
+    import sys
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    game = HasamiShogiGame()
+    player = MCTSPlayer(playouts=None, time=1.0, workers=workers)
+    rng = random.Random(0)
+    try:
+        for _ in range(6):
+            move = player.choose_move(game, rng)
+            if move is None:
+                break
+            game.make_move(*move)
+            print(move, player.report())
+    finally:
+        player.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# Perft for the Hasami Shogi Game. Counts every move sequence to a fixed depth from a position, making and taking back
+# each move, with a count per ply of the moves made, the moves that captured, the pieces captured and the games won.
+# The counts of the stored test positions are compared with reference counts, so any change to move generation, move
+# making or capturing can be checked for speed and correctness at the same time.
+#
+# Example: python hasamiperft.py 3            all stored positions to depth 3
+#          python hasamiperft.py 2 start corner
+
+import sys
+import time
+from collections import namedtuple
+
+from hasamishogigame import HasamiShogiGame, CompactGameState, PIECES, PLAYER_INDEX, reachable_mask
+
+# Counts of one ply. nodes is the number of moves made at that ply, captures the number of those moves that captured
+# at least one piece, pieces the number of pieces they captured and wins the number of moves that won the game.
+PerftCounts = namedtuple('PerftCounts', ['nodes', 'captures', 'pieces', 'wins'])
+
+# Test positions. Each is the board, one string per row from 'a' to 'i' with 'R', 'B' or '.' for each square, the
+# player to move, the captured pieces of Black and Red, and the reference counts of plies 1, 2 and 3. The counts of
+# plies 1 and 2 were checked against the original list board of hasamilegacy.py.
+PERFT_POSITIONS = {
+    'start': (['RRRRRRRRR', '.........', '.........', '.........', '.........', '.........', '.........',
+               '.........', 'BBBBBBBBB'], 'BLACK', 0, 0, [
+        PerftCounts(63, 0, 0, 0),
+        PerftCounts(3717, 0, 0, 0),
+        PerftCounts(254219, 170, 170, 0),
+    ]),
+    'midgame': (['..R..B.RR', '.........', '....B.R..', 'B...R.B.R', '...B.....', '.......R.', 'B..B.....',
+                 '.......R.', 'RB...B...'], 'BLACK', 0, 0, [
+        PerftCounts(84, 2, 2, 0),
+        PerftCounts(5490, 85, 92, 0),
+        PerftCounts(456838, 12369, 12372, 0),
+    ]),
+    'corner': (['RB......R', '........B', '.........', '....B....', '.BRRR...B', '.........', '..R......',
+                '.........', 'BBB...RR.'], 'BLACK', 1, 1, [
+        PerftCounts(60, 4, 6, 0),
+        PerftCounts(3773, 145, 145, 0),
+        PerftCounts(232571, 10522, 15134, 0),
+    ]),
+    'endgame': (['..R......', '.........', '...R.....', '.........', '....RB...', '...R..R..', '.B....R..',
+                 '.........', 'R.......R'], 'RED', 7, 1, [
+        PerftCounts(97, 1, 1, 1),
+        PerftCounts(2308, 2, 2, 0),
+        PerftCounts(217353, 1856, 1856, 1856),
+    ]),
+}
+
+
+def setup_position(board, player_turn, black_captured, red_captured):
+    """
+    Creates a game in a given position.
+    :param board: list of the rows from 'a' to 'i', each a string with 'R', 'B' or '.' for each square
+    :param player_turn: 'RED' or 'BLACK', the player to move
+    :param black_captured: Number of Black pieces captured
+    :param red_captured: Number of Red pieces captured
+    :return: HasamiShogiGame in the position
+    """
+    boards = [0, 0]
+    for square, piece in enumerate(''.join(board)):
+        if piece in PIECES:
+            boards[PIECES.index(piece)] |= 1 << square
+    game = HasamiShogiGame()
+    game.load_state(CompactGameState.pack(boards, player_turn, black_captured, red_captured))
+    return game
+
+
+def perft(game, depth):
+    """
+    Makes every move sequence of depth moves from the game's position and counts them ply by ply. The game is left
+    in the same position.
+    :param game: HasamiShogiGame
+    :param depth: Number of plies
+    :return: list of depth PerftCounts, for plies 1 to depth
+    """
+    counts = [[0, 0, 0, 0] for _ in range(depth)]
+    _perft(game, 0, depth, counts)
+    return [PerftCounts(*ply) for ply in counts]
+
+
+def _perft(game, ply, depth, counts):
+    """
+    Counts the moves of one ply and searches below each of them.
+    :param game: HasamiShogiGame
+    :param ply: Ply being counted, 0 for the first
+    :param depth: Number of plies
+    :param counts: list of [nodes, captures, pieces, wins] per ply, added to
+    :return: Does not return anything
+    """
+    if game.get_game_state() != 'UNFINISHED':
+        return
+    player = game.get_active_player()
+    opponent = 'RED' if player == 'BLACK' else 'BLACK'
+    boards = game.get_bitboards()
+    pieces = boards[PLAYER_INDEX[player]]
+    occupied = boards[0] | boards[1]
+    captured_before = game.get_num_captured_pieces(opponent)
+    ply_counts = counts[ply]
+    make_square_move = game.make_square_move
+    last_ply = ply + 1 == depth
+
+    while pieces:
+        low_bit = pieces & -pieces
+        pieces ^= low_bit
+        start = low_bit.bit_length() - 1
+        ends = reachable_mask(start, occupied)
+        while ends:
+            end_bit = ends & -ends
+            ends ^= end_bit
+            make_square_move(start, end_bit.bit_length() - 1)
+            ply_counts[0] += 1
+            taken = game.get_num_captured_pieces(opponent) - captured_before
+            if taken:
+                ply_counts[1] += 1
+                ply_counts[2] += taken
+                if game.get_game_state() != 'UNFINISHED':
+                    ply_counts[3] += 1
+            if not last_ply:
+                _perft(game, ply + 1, depth, counts)
+            game.unmake_move()
+
+
+def check_position(name, depth):
+    """
+    Runs perft on a stored test position and compares the counts with the reference counts.
+    :param name: Key of PERFT_POSITIONS
+    :param depth: Number of plies, plies past the reference counts are not compared
+    :return: (list of PerftCounts, seconds, True if every ply matches the reference)
+    """
+    board, player_turn, black_captured, red_captured, reference = PERFT_POSITIONS[name]
+    game = setup_position(board, player_turn, black_captured, red_captured)
+    start = time.perf_counter()
+    counts = perft(game, depth)
+    seconds = time.perf_counter() - start
+    return counts, seconds, counts[:len(reference)] == reference[:depth]
+
+
+def main():
+    """
+    Runs perft on the stored positions named on the command line, or all of them, and prints the counts per ply,
+    the nodes/sec and whether the counts match the reference.
+    :return: Doesn't return anything, exits with status 1 if any count differs from the reference
+    """
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    names = sys.argv[2:] or list(PERFT_POSITIONS)
+    failed = False
+    for name in names:
+        counts, seconds, matches = check_position(name, depth)
+        nodes = sum(ply.nodes for ply in counts)
+        print('%-12s %s  %10.0f nodes/sec' % (name, 'OK' if matches else 'MISMATCH', nodes / seconds))
+        reference = PERFT_POSITIONS[name][-1]
+        for ply, ply_counts in enumerate(counts):
+            line = '  ply %d  nodes %9d  captures %7d  pieces %7d  wins %6d' % ((ply + 1,) + tuple(ply_counts))
+            if ply < len(reference) and ply_counts != reference[ply]:
+                line += '  expected %s' % (tuple(reference[ply]),)
+            print(line)
+        failed = failed or not matches
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# Compact binary game records for archiving Hasami Shogi games. A record file starts with a short file header, followed
+# by one record per game: a 3 byte game header holding the result and the number of moves, then 2 bytes per move
+# holding the start and end square indexes (0 to 80, see CELL_NAMES). Files are only ever appended to, and are read
+# through a memory map, one game at a time, so an archive never has to fit in memory.
+
+import mmap
+import os
+import struct
+
+from hasamishogigame import HasamiShogiGame, CELL_NAMES, CELL_INDEX
+
+FILE_MAGIC = b'HSGR\x01'
+GAME_HEADER = struct.Struct('<BH')
+MOVE_SIZE = 2
+
+# Results, in the order they are stored
+RESULTS = ('UNFINISHED', 'BLACK_WON', 'RED_WON')
+
+
+def _complete_end(data):
+    """
+    Finds where the complete games of a record file end, before any game cut off by a writer that was stopped while
+    appending.
+    :param data: bytes-like contents of the record file
+    :return: byte offset just after the last complete game
+    """
+    offset = len(FILE_MAGIC)
+    end = len(data)
+    while offset + GAME_HEADER.size <= end:
+        _, plies = GAME_HEADER.unpack_from(data, offset)
+        moves_end = offset + GAME_HEADER.size + plies * MOVE_SIZE
+        if moves_end > end:
+            break
+        offset = moves_end
+    return offset
+
+
+class GameRecordWriter:
+    """
+    Appends games to a record file. Use as a context manager, or call close when done.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the record file for appending, writing the file header if the file is new. A game cut off at the end of
+        the file is removed first, so the games appended after it can be read.
+        :param path: Path of the record file
+        """
+        self._file = open(path, 'ab')
+        size = self._file.tell()
+        if size == 0:
+            self._file.write(FILE_MAGIC)
+        else:
+            with open(path, 'rb') as existing, mmap.mmap(existing.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = _complete_end(data)
+            if end < size:
+                self._file.truncate(end)
+
+    def write_game(self, moves, result):
+        """
+        Appends one game.
+        :param moves: list of (start cell, end cell) moves, for example [('i1', 'c1'), ('a1', 'b1')]
+        :param result: 'UNFINISHED', 'BLACK_WON' or 'RED_WON'
+        :return: Does not return anything
+        """
+        data = bytearray(GAME_HEADER.pack(RESULTS.index(result), len(moves)))
+        for cell_start, cell_end in moves:
+            data.append(CELL_INDEX[cell_start])
+            data.append(CELL_INDEX[cell_end])
+        self._file.write(data)
+
+    def close(self):
+        """
+        Closes the record file.
+        :return: Does not return anything
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameRecord:
+    """
+    One game of a record file. Points into the memory map, the moves are only read when asked for.
+    """
+    __slots__ = ('offset', 'result', 'plies', '_map')
+
+    def __init__(self, data, offset, result, plies):
+        """
+        Initializes the record.
+        :param data: Memory map of the record file
+        :param offset: Byte offset of the game in the file
+        :param result: 'UNFINISHED', 'BLACK_WON' or 'RED_WON'
+        :param plies: Number of moves
+        """
+        self._map = data
+        self.offset = offset
+        self.result = result
+        self.plies = plies
+
+    def squares(self):
+        """
+        Returns the moves as square indexes.
+        :return: list of (start square, end square) tuples
+        """
+        start = self.offset + GAME_HEADER.size
+        moves = self._map[start:start + self.plies * MOVE_SIZE]
+        return [(moves[index], moves[index + 1]) for index in range(0, len(moves), MOVE_SIZE)]
+
+    def moves(self):
+        """
+        Returns the moves as cells.
+        :return: list of (start cell, end cell) tuples, as taken by make_move
+        """
+        return [(CELL_NAMES[start], CELL_NAMES[end]) for start, end in self.squares()]
+
+    def replay(self, plies=None):
+        """
+        Plays the game into a new HasamiShogiGame.
+        :param plies: Number of moves to play, all of them if None
+        :return: HasamiShogiGame after the moves
+        """
+        game = HasamiShogiGame()
+        for cell_start, cell_end in self.moves()[:plies]:
+            game.make_move(cell_start, cell_end)
+        return game
+
+
+class GameRecordReader:
+    """
+    Reads a record file through a memory map. Use as a context manager, or call close when done.
+    """
+
+    def __init__(self, path):
+        """
+        Opens and maps the record file.
+        :param path: Path of the record file
+        """
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ValueError('%s is not a Hasami Shogi game record file' % path)
+
+    def __iter__(self):
+        """
+        Iterates over the games in file order. A game cut off at the end of the file, by a writer that was stopped
+        while appending, is left out.
+        :return: yields GameRecord
+        """
+        data = self._map
+        offset = len(FILE_MAGIC)
+        end = len(data)
+        while offset + GAME_HEADER.size <= end:
+            result, plies = GAME_HEADER.unpack_from(data, offset)
+            moves_end = offset + GAME_HEADER.size + plies * MOVE_SIZE
+            if moves_end > end:
+                return
+            yield GameRecord(data, offset, RESULTS[result], plies)
+            offset = moves_end
+
+    def game_at(self, offset):
+        """
+        Reads the game at a byte offset, as found in GameRecord.offset, without reading the games before it.
+        :param offset: Byte offset of the game in the file
+        :return: GameRecord
+        """
+        result, plies = GAME_HEADER.unpack_from(self._map, offset)
+        return GameRecord(self._map, offset, RESULTS[result], plies)
+
+    def close(self):
+        """
+        Unmaps and closes the record file. GameRecord objects read from it can no longer be used.
+        :return: Does not return anything
+        """
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,468 @@
+# Computer opponent for the Hasami Shogi Game. Searches the moves of a HasamiShogiGame with negamax alpha-beta and
+# iterative deepening, using a transposition table and killer/history move ordering. Positions in an opening book (see
+# hasamibook.py) or an endgame tablebase (see hasamitablebase.py) are looked up instead of searched. Run the file as a
+# script to search the starting board and print the search statistics.
+
+import sys
+import time
+
+from hasamishogigame import HasamiShogiGame, PLAYERS, IDENTITY, transform_move
+
+# Scores are in hundredths of a piece. A win is worth WIN_SCORE less the number of plies it takes, so faster wins score
+# higher, and any score above WIN_BOUND is a forced win.
+PIECE_SCORE = 100
+MOBILITY_SCORE = 1
+WIN_SCORE = 1000000
+WIN_BOUND = WIN_SCORE - 1000
+INFINITY = WIN_SCORE + 1
+
+# Transposition table entry flags, telling if the stored score is exact or only a bound.
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# With capture ordering on, captures are ordered first at nodes with at least this many plies left to search. Closer to
+# the leaves the threat map costs more to keep up to date than the ordering saves.
+CAPTURE_ORDER_DEPTH = 2
+
+# The clock is checked once every this many nodes, so a time limit costs almost nothing.
+CLOCK_CHECK_NODES = 256
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time limit has run out, to unwind back to the root.
+    """
+
+
+class SearchEngine:
+    """
+    Alpha-beta search engine. Keeps its transposition table and move ordering tables between searches, so one engine
+    should be reused for all the moves of a game.
+    """
+
+    def __init__(self, table_bits=20, piece_score=PIECE_SCORE, mobility_score=MOBILITY_SCORE, tablebase=None,
+                 book=None, book_min_count=1, symmetry=False, capture_order=False):
+        """
+        Initializes the search tables.
+        :param table_bits: The transposition table holds 2 ** table_bits entries
+        :param piece_score: Evaluation weight of each captured piece
+        :param mobility_score: Evaluation weight of each legal move
+        :param tablebase: hasamitablebase.Tablebase to look endgame positions up in, or None
+        :param book: hasamibook.OpeningBook to look opening positions up in, or None
+        :param book_min_count: Book moves played fewer times than this are not played
+        :param symmetry: If True, positions that are the same up to a symmetry of the board share their transposition
+        table entry, see HasamiShogiGame.canonical_key
+        :param capture_order: If True, captures are searched before the other moves, found in the game's capture threat
+        map, see HasamiShogiGame.capture_threats
+        """
+        self.piece_score = piece_score
+        self.mobility_score = mobility_score
+        self.tablebase = tablebase
+        self.book = book
+        self.book_min_count = book_min_count
+        self.symmetry = symmetry
+        self.capture_order = capture_order
+        self._table_mask = (1 << table_bits) - 1
+        self._table = [None] * (1 << table_bits)
+        self._generation = 0
+        self._killers = []
+        self._history = {}
+        self._deadline = None
+        self._nodes = 0
+        self._table_probes = 0
+        self._table_hits = 0
+        self._tablebase_hits = 0
+        self.stats = {}
+
+    def clear(self):
+        """
+        Empties the transposition table and the move ordering tables, for example before a new game.
+        :return: Does not return anything
+        """
+        self._table = [None] * (self._table_mask + 1)
+        self._generation = 0
+        self._killers = []
+        self._history = {}
+
+    def best_move(self, game, max_depth=6, time_limit=None):
+        """
+        Searches the position with iterative deepening, one ply deeper each time until max_depth or the time limit.
+        :param game: HasamiShogiGame to search, it is left in the same position when the search returns
+        :param max_depth: Deepest search in plies
+        :param time_limit: Seconds the search may take, or None for no limit. The search of the depth running when
+        the time runs out is thrown away.
+        :return: (start cell, end cell) of the best move, None if the game is finished or there are no moves
+        """
+        start_time = time.perf_counter()
+        self._deadline = None if time_limit is None else start_time + time_limit
+        self._generation += 1
+        self._nodes = 0
+        self._table_probes = 0
+        self._table_hits = 0
+        self._tablebase_hits = 0
+        self.stats = {'depth': 0, 'score': 0, 'book': False}
+
+        # In the opening book, play the book move without searching
+        if self.book is not None:
+            found = self.book.best_move(game, self.book_min_count)
+            if found is not None:
+                self.stats['book'] = True
+                self._finish_stats(start_time)
+                return found[0], found[1]
+
+        root_moves = list(game.legal_moves())
+        if not root_moves:
+            self._finish_stats(start_time)
+            return None
+        best = root_moves[0]
+        side = game.get_active_player()
+
+        # In the tablebase, play the move that wins fastest or loses slowest without searching
+        if self.tablebase is not None and self.tablebase.probe(game) is not None:
+            found = self._tablebase_move(game, root_moves)
+            if found is not None:
+                self.stats['score'], best = found
+                self._finish_stats(start_time)
+                return best
+
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._search_root(game, side, depth, root_moves)
+            except SearchTimeout:
+                break
+            best = move
+            self.stats['depth'] = depth
+            self.stats['score'] = score
+            # Search the best move first at the next depth
+            root_moves.remove(move)
+            root_moves.insert(0, move)
+            if abs(score) > WIN_BOUND:
+                break
+
+        self._finish_stats(start_time)
+        return best
+
+    def _finish_stats(self, start_time):
+        """
+        Fills in self.stats at the end of a search.
+        :param start_time: perf_counter value when the search started
+        :return: Does not return anything
+        """
+        seconds = time.perf_counter() - start_time
+        self.stats['nodes'] = self._nodes
+        self.stats['seconds'] = seconds
+        self.stats['nodes_per_sec'] = self._nodes / seconds if seconds > 0 else 0.0
+        self.stats['table_probes'] = self._table_probes
+        self.stats['table_hits'] = self._table_hits
+        self.stats['table_hit_rate'] = self._table_hits / self._table_probes if self._table_probes else 0.0
+        self.stats['tablebase_hits'] = self._tablebase_hits
+
+    def _tablebase_move(self, game, root_moves):
+        """
+        Picks the best root move from the tablebase results of the positions after each move.
+        :param game: HasamiShogiGame at the root, in the tablebase
+        :param root_moves: Legal moves of the root
+        :return: (score, move) of the best move, None if a move leads to a position the tablebase doesn't hold
+        """
+        best = None
+        for move in root_moves:
+            game.make_move(*move)
+            try:
+                if game.get_game_state() != 'UNFINISHED':
+                    score = WIN_SCORE - 1
+                else:
+                    value = self.tablebase.probe(game)
+                    if value is None:
+                        return None
+                    self._tablebase_hits += 1
+                    score = -_tablebase_score(value, 1)
+            finally:
+                game.unmake_move()
+            if best is None or score > best[0]:
+                best = (score, move)
+        return best
+
+    def _search_root(self, game, side, depth, root_moves):
+        """
+        Searches every root move to the given depth.
+        :param game: HasamiShogiGame to search
+        :param side: 'RED' or 'BLACK', the player to move at the root
+        :param depth: Depth in plies
+        :param root_moves: Moves to search, in the order to search them
+        :return: (score, move) of the best move
+        """
+        alpha = -INFINITY
+        best = root_moves[0]
+        for move in root_moves:
+            game.make_move(*move)
+            try:
+                score = -self._negamax(game, PLAYERS[1 - PLAYERS.index(side)], depth - 1, -INFINITY, -alpha, 1)
+            finally:
+                game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best = move
+        key, transform = self._table_key(game)
+        self._store(key, depth, alpha, EXACT, transform_move(best, transform) if transform else best, 0)
+        return alpha, best
+
+    def _negamax(self, game, side, depth, alpha, beta, ply):
+        """
+        Negamax alpha-beta search of the position.
+        :param game: HasamiShogiGame to search
+        :param side: 'RED' or 'BLACK', the player to move. The game keeps the winner as active player once the game
+        is over, so the side is tracked here instead.
+        :param depth: Plies left to search
+        :param alpha: Score the side to move is already sure of
+        :param beta: Score the opponent is already sure of
+        :param ply: Plies from the root
+        :return: score of the position for the side to move
+        """
+        self._nodes += 1
+        if self._deadline is not None and self._nodes % CLOCK_CHECK_NODES == 0 \
+                and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        state = game.get_game_state()
+        if state != 'UNFINISHED':
+            # The player who just moved has won
+            return -(WIN_SCORE - ply)
+
+        # Endgames in the tablebase are known exactly
+        if self.tablebase is not None:
+            value = self.tablebase.probe(game)
+            if value is not None:
+                self._tablebase_hits += 1
+                return _tablebase_score(value, ply)
+
+        if depth <= 0:
+            return self.evaluate(game, side)
+
+        # Probe the transposition table. Moves are stored as played in the canonical form of the position.
+        key, transform = self._table_key(game)
+        table_move = None
+        self._table_probes += 1
+        entry = self._table[key & self._table_mask]
+        if entry is not None and entry[0] == key:
+            self._table_hits += 1
+            table_move = transform_move(entry[4], transform) if transform else entry[4]
+            if entry[1] >= depth:
+                score = _score_from_table(entry[2], ply)
+                if entry[3] == EXACT:
+                    return score
+                elif entry[3] == LOWER_BOUND and score >= beta:
+                    return score
+                elif entry[3] == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = self._ordered_moves(game, side, table_move, ply, depth)
+        if not moves:
+            return self.evaluate(game, side)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best = moves[0]
+        opponent = PLAYERS[1 - PLAYERS.index(side)]
+        for move in moves:
+            game.make_move(*move)
+            try:
+                score = -self._negamax(game, opponent, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.unmake_move()
+            if score > best_score:
+                best_score = score
+                best = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self._record_cutoff(move, side, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self._store(key, depth, best_score, flag, transform_move(best, transform) if transform else best, ply)
+        return best_score
+
+    def _table_key(self, game):
+        """
+        Returns the transposition table key of a position.
+        :param game: HasamiShogiGame
+        :return: (64 bit key, symmetry taking the position to the form its moves are stored in)
+        """
+        if self.symmetry:
+            return game.canonical_key()
+        return game.position_key(), IDENTITY
+
+    def _ordered_moves(self, game, side, table_move, ply, depth):
+        """
+        Lists the legal moves, with the transposition table move first, then the killer moves of this ply, then the
+        captures, the most pieces first, when capture ordering is on, then the rest by their history score.
+        :param game: HasamiShogiGame to list the moves of
+        :param side: 'RED' or 'BLACK', the player to move
+        :param table_move: Best move stored in the transposition table, or None
+        :param ply: Plies from the root
+        :param depth: Plies left to search
+        :return: list of (start cell, end cell) moves
+        """
+        moves = list(game.legal_moves(side))
+        history = self._history
+        threats = game.capture_threats(side) if self.capture_order and depth >= CAPTURE_ORDER_DEPTH else None
+        if threats:
+            cell_index = game.get_geometry().cell_index
+            moves.sort(key=lambda move: (threats.get(cell_index[move[1]], 0).bit_count(), history.get((side, move), 0)),
+                       reverse=True)
+        else:
+            moves.sort(key=lambda move: history.get((side, move), 0), reverse=True)
+        if ply < len(self._killers):
+            for killer in reversed(self._killers[ply]):
+                if killer in moves:
+                    moves.remove(killer)
+                    moves.insert(0, killer)
+        if table_move is not None and table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+        return moves
+
+    def _record_cutoff(self, move, side, depth, ply):
+        """
+        Remembers a move that caused a beta cutoff as a killer move of its ply and raises its history score.
+        :param move: (start cell, end cell) move that caused the cutoff
+        :param side: 'RED' or 'BLACK', the player who made the move
+        :param depth: Plies left to search when the cutoff happened
+        :param ply: Plies from the root
+        :return: Does not return anything
+        """
+        while len(self._killers) <= ply:
+            self._killers.append([])
+        killers = self._killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self._history[(side, move)] = self._history.get((side, move), 0) + depth * depth
+
+    def _store(self, key, depth, score, flag, move, ply):
+        """
+        Stores a search result in the transposition table. An entry is replaced by a search at least as deep, or by
+        anything once the entry is left over from an earlier search.
+        :param key: Position key
+        :param depth: Depth the position was searched to
+        :param score: Score found
+        :param flag: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: Best move found
+        :param ply: Plies from the root, used to store win scores relative to the position
+        :return: Does not return anything
+        """
+        index = key & self._table_mask
+        entry = self._table[index]
+        if entry is None or entry[5] != self._generation or depth >= entry[1]:
+            self._table[index] = (key, depth, _score_to_table(score, ply), flag, move, self._generation)
+
+    def evaluate(self, game, side):
+        """
+        Static evaluation of a position: captured pieces first, then the number of legal moves.
+        :param game: HasamiShogiGame to evaluate
+        :param side: 'RED' or 'BLACK', the player the score is for
+        :return: score for the side
+        """
+        opponent = PLAYERS[1 - PLAYERS.index(side)]
+        material = game.get_num_captured_pieces(opponent) - game.get_num_captured_pieces(side)
+        mobility = game.count_legal_moves(side) - game.count_legal_moves(opponent)
+        return material * self.piece_score + mobility * self.mobility_score
+
+    def report(self):
+        """
+        Describes the statistics of the last search.
+        :return: string with the depth, nodes, nodes/sec and transposition table hit rate
+        """
+        return 'depth %d  score %d  nodes %d  %.0f nodes/sec  %.1f%% table hits' % (
+            self.stats['depth'], self.stats['score'], self.stats['nodes'], self.stats['nodes_per_sec'],
+            self.stats['table_hit_rate'] * 100)
+
+
+def _tablebase_score(value, ply):
+    """
+    Turns a tablebase byte into a search score, counting the plies to the end of the game from the root.
+    :param value: Byte from Tablebase.probe, 0 for a draw, odd plies to a win or even plies to a loss
+    :param ply: Plies from the root to the position
+    :return: score for the player to move
+    """
+    if value == 0:
+        return 0
+    elif value % 2:
+        return WIN_SCORE - (ply + value)
+    return -(WIN_SCORE - (ply + value))
+
+
+def _score_to_table(score, ply):
+    """
+    Turns win scores, which count plies from the root, into plies from the stored position.
+    :param score: Score from the search
+    :param ply: Plies from the root to the stored position
+    :return: score to store
+    """
+    if score > WIN_BOUND:
+        return score + ply
+    elif score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    """
+    Turns a stored win score back into plies from the root.
+    :param score: Stored score
+    :param ply: Plies from the root to the position
+    :return: score for the search
+    """
+    if score > WIN_BOUND:
+        return score - ply
+    elif score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+# Engine used by best_move when no engine is given, so its tables are kept between calls.
+_default_engine = None
+
+
+def best_move(game, max_depth=6, time_limit=None, engine=None):
+    """
+    Finds the best move for the active player of a game.
+    :param game: HasamiShogiGame to search, it is left in the same position
+    :param max_depth: Deepest search in plies
+    :param time_limit: Seconds the search may take, or None for no limit
+    :param engine: SearchEngine to use, the search statistics are in engine.stats afterwards. A shared engine is used
+    if None.
+    :return: (start cell, end cell) of the best move, None if there is no move
+    """
+    global _default_engine
+    if engine is None:
+        if _default_engine is None:
+            _default_engine = SearchEngine()
+        engine = _default_engine
+    return engine.best_move(game, max_depth, time_limit)
+
+
+def main():
+    """
+    Searches the starting board, or the board after the moves given on the command line as start and end cells,
+    and prints the best move and the search statistics.
+    :return: Doesn't return anything
+    """
+    game = HasamiShogiGame()
+    cells = sys.argv[1:]
+    for index in range(0, len(cells) - 1, 2):
+        game.make_move(cells[index], cells[index + 1])
+    engine = SearchEngine()
+    move = engine.best_move(game, max_depth=4, time_limit=5.0)
+    print(move)
+    print(engine.report())
+
+
+if __name__ == '__main__':
+    main()
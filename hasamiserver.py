@@ -0,0 +1,515 @@
+# Asyncio game server for the Hasami Shogi Game. Holds many games in memory, one HasamiShogiGame per game, and talks
+# to the players over TCP with one JSON object per line. A connection can play any number of games, on either side.
+# Every move is pushed to both players of the game, and games nobody moved in for a while are closed.
+#
+# Requests, each with the game name in "game":
+#   {"op": "join", "game": "g1", "player": "BLACK"}      player is optional, the free side is taken if left out
+#   {"op": "move", "game": "g1", "start": "i1", "end": "c1"}
+#   {"op": "leave", "game": "g1"}
+# Messages sent by the server:
+#   {"type": "joined", "game": "g1", "player": "BLACK"}
+#   {"type": "state", "game": "g1", "move": ["i1", "c1"], "captured_cells": [], "active_player": "RED",
+#    "game_state": "UNFINISHED", "captured": {"BLACK": 0, "RED": 0}}
+#                                                        first sent without a move when both players have joined, and
+#                                                        then one per move, only what the move changed (a delta, see
+#                                                        hasamidelta.py), never the whole board
+#   {"type": "closed", "game": "g1", "reason": "finished"}   reason is 'finished', 'left', 'disconnected' or 'timeout'
+#   {"type": "error", "game": "g1", "error": "not your turn"}
+#
+# Example: python hasamiserver.py serve --port 8765
+#          python hasamiserver.py load --games 10000 --local
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from hasamishogigame import HasamiShogiGame, CELL_NAMES, PLAYERS
+
+DEFAULT_PORT = 8765
+
+# Games with no move for this many seconds are closed
+IDLE_TIMEOUT = 300.0
+
+
+def encode(message):
+    """
+    Turns a message into one line of the protocol.
+    :param message: dict
+    :return: bytes ending with a newline
+    """
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+class GameSession:
+    """
+    One game hosted by the server and the connections playing it.
+    """
+    __slots__ = ('name', 'game', 'players', 'last_active')
+
+    def __init__(self, name):
+        """
+        Initializes a new game with no players.
+        :param name: Name of the game, chosen by the players
+        """
+        self.name = name
+        self.game = HasamiShogiGame()
+        # Connection (asyncio.StreamWriter) of each player that joined, by 'BLACK' or 'RED'
+        self.players = {}
+        self.last_active = time.monotonic()
+
+    def writers(self):
+        """
+        Returns the connections of the game, once each even if one connection plays both sides.
+        :return: list of asyncio.StreamWriter
+        """
+        return list(dict.fromkeys(self.players.values()))
+
+    def state(self, move=None):
+        """
+        Builds the state message of the game.
+        :param move: (start cell, end cell) just made, None for the starting message
+        :return: dict
+        """
+        game = self.game
+        message = {
+            'type': 'state',
+            'game': self.name,
+            'active_player': game.get_active_player(),
+            'game_state': game.get_game_state(),
+            'captured': {player: game.get_num_captured_pieces(player) for player in PLAYERS},
+        }
+        if move is not None:
+            message['move'] = list(move)
+            message['captured_cells'] = [CELL_NAMES[square] for square in game.last_delta().captured]
+        return message
+
+
+class HasamiServer:
+    """
+    Hosts games for clients connected over TCP.
+    """
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT):
+        """
+        Initializes a server with no games.
+        :param idle_timeout: Seconds without a move before a game is closed
+        """
+        self._idle_timeout = idle_timeout
+        self._sessions = {}
+        # Names of the games each connection plays
+        self._joined = {}
+        self._server = None
+        self._sweeper = None
+        self.stats = {'games': 0, 'moves': 0, 'timeouts': 0}
+
+    def num_games(self):
+        """
+        Returns the number of open games.
+        :return: int
+        """
+        return len(self._sessions)
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """
+        Starts listening and starts the idle game sweeper.
+        :param host: Address to listen on
+        :param port: Port to listen on, 0 for any free port
+        :return: the port listened on
+        """
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._sweeper = asyncio.create_task(self._sweep())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops listening and stops the sweeper. Open connections are left to close on their own.
+        :return: Does not return anything
+        """
+        self._sweeper.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self):
+        """
+        Serves until cancelled.
+        :return: Does not return anything
+        """
+        await self._server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        """
+        Reads the requests of one connection until it closes, then closes the games it was playing.
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        :return: Does not return anything
+        """
+        joined = self._joined[writer] = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError as error:
+                    # The line is longer than the stream limit and can't be skipped, so the connection is closed
+                    await self._send([(writer, {'type': 'error', 'game': None, 'error': 'bad request: %s' % error})])
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    pushes = self._dispatch(request, writer, joined)
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    pushes = [(writer, {'type': 'error', 'game': None, 'error': 'bad request: %s' % error})]
+                await self._send(pushes)
+        except ConnectionError:
+            pass
+        finally:
+            pushes = []
+            for name in list(joined):
+                pushes.extend(self._close_session(self._sessions[name], 'disconnected', exclude=writer))
+            del self._joined[writer]
+            await self._send(pushes)
+            writer.close()
+
+    def _dispatch(self, request, writer, joined):
+        """
+        Carries out one request.
+        :param request: dict read from the connection
+        :param writer: asyncio.StreamWriter of the connection
+        :param joined: set of the games played on the connection
+        :return: list of (writer, message) to send
+        """
+        op = request['op']
+        name = str(request['game'])
+        if op == 'join':
+            return self._join(name, request.get('player'), writer, joined)
+
+        session = self._sessions.get(name)
+        if session is None or writer not in session.players.values():
+            return [(writer, {'type': 'error', 'game': name, 'error': 'not playing this game'})]
+        if op == 'move':
+            return self._move(session, request['start'], request['end'], writer)
+        if op == 'leave':
+            return self._close_session(session, 'left')
+        return [(writer, {'type': 'error', 'game': name, 'error': 'unknown op %r' % op})]
+
+    def _join(self, name, player, writer, joined):
+        """
+        Adds the connection to a game as one of the players, creating the game if it does not exist.
+        :param name: Name of the game
+        :param player: 'BLACK', 'RED' or None for the side that is free
+        :param writer: asyncio.StreamWriter of the connection
+        :param joined: set of the games joined on the connection
+        :return: list of (writer, message) to send
+        """
+        session = self._sessions.get(name)
+        if session is None:
+            session = self._sessions[name] = GameSession(name)
+            self.stats['games'] += 1
+        free = [side for side in PLAYERS if side not in session.players]
+        if player is None and free:
+            player = free[0]
+        if player not in free:
+            return [(writer, {'type': 'error', 'game': name, 'error': 'side is taken'})]
+        session.players[player] = writer
+        session.last_active = time.monotonic()
+        joined.add(name)
+        pushes = [(writer, {'type': 'joined', 'game': name, 'player': player})]
+        if len(session.players) == len(PLAYERS):
+            state = session.state()
+            pushes.extend((player_writer, state) for player_writer in session.writers())
+        return pushes
+
+    def _move(self, session, cell_start, cell_end, writer):
+        """
+        Makes a move for the player on the connection, and sends the new state to both players.
+        :param session: GameSession of the move
+        :param cell_start: Start cell
+        :param cell_end: End cell
+        :param writer: asyncio.StreamWriter of the connection
+        :return: list of (writer, message) to send
+        """
+        game = session.game
+        if len(session.players) < len(PLAYERS):
+            return [(writer, {'type': 'error', 'game': session.name, 'error': 'waiting for opponent'})]
+        if session.players[game.get_active_player()] is not writer:
+            return [(writer, {'type': 'error', 'game': session.name, 'error': 'not your turn'})]
+        if not game.make_move(cell_start, cell_end):
+            return [(writer, {'type': 'error', 'game': session.name, 'error': 'illegal move'})]
+        self.stats['moves'] += 1
+        session.last_active = time.monotonic()
+        state = session.state((cell_start, cell_end))
+        pushes = [(player_writer, state) for player_writer in session.writers()]
+        if state['game_state'] != 'UNFINISHED':
+            pushes.extend(self._close_session(session, 'finished'))
+        return pushes
+
+    def _close_session(self, session, reason, exclude=None):
+        """
+        Removes a game and tells its players.
+        :param session: GameSession to close
+        :param reason: 'finished', 'left', 'disconnected' or 'timeout'
+        :param exclude: Connection not to tell, the one that went away
+        :return: list of (writer, message) to send
+        """
+        del self._sessions[session.name]
+        for writer in session.writers():
+            self._joined[writer].discard(session.name)
+        message = {'type': 'closed', 'game': session.name, 'reason': reason}
+        return [(writer, message) for writer in session.writers() if writer is not exclude]
+
+    async def _send(self, pushes):
+        """
+        Writes messages to their connections and waits for the buffers to drain. Connections that went away are
+        skipped, their games are closed by their own connection handler.
+        :param pushes: list of (writer, message)
+        :return: Does not return anything
+        """
+        writers = {}
+        # A message sent to both players is encoded once
+        lines = {}
+        for writer, message in pushes:
+            if not writer.is_closing():
+                line = lines.get(id(message))
+                if line is None:
+                    line = lines[id(message)] = encode(message)
+                writer.write(line)
+                writers[writer] = True
+        for writer in writers:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _sweep(self):
+        """
+        Closes the games nobody moved in for idle_timeout seconds, checking a few times per timeout.
+        :return: Does not return anything
+        """
+        while True:
+            await asyncio.sleep(self._idle_timeout / 4)
+            cutoff = time.monotonic() - self._idle_timeout
+            pushes = []
+            for session in [session for session in self._sessions.values() if session.last_active < cutoff]:
+                self.stats['timeouts'] += 1
+                pushes.extend(self._close_session(session, 'timeout'))
+            await self._send(pushes)
+
+
+def percentile(values, fraction):
+    """
+    Returns a percentile of a sorted list, by the nearest rank.
+    :param values: sorted list of numbers
+    :param fraction: 0.5 for the median, 0.99 for the 99th percentile
+    :return: the value, 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class _LoadClient:
+    """
+    One connection of the load generator. Plays random moves in its games and times each move from sending it to
+    receiving the state pushed back by the server.
+    """
+
+    def __init__(self, reader, writer, rng, plies, think, latencies):
+        """
+        Initializes the client.
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        :param rng: random.Random for the moves
+        :param plies: Moves to play in each game before leaving it
+        :param think: Seconds to wait before each move
+        :param latencies: list the move latencies are added to, in seconds
+        """
+        self._reader = reader
+        self._writer = writer
+        self._rng = rng
+        self._plies = plies
+        self._think = think
+        self._latencies = latencies
+        # Own copy of each game played, the sides played in it and the moves made in it, by game name
+        self._games = {}
+        self._sides = {}
+        self._moves = {}
+        # Time each move was sent, by game name
+        self._sent = {}
+        self.errors = 0
+
+    def join(self, name, player):
+        """
+        Joins one side of a game.
+        :param name: Name of the game
+        :param player: 'BLACK' or 'RED'
+        :return: Does not return anything
+        """
+        if name not in self._games:
+            self._games[name] = HasamiShogiGame()
+            self._sides[name] = set()
+            self._moves[name] = 0
+        self._sides[name].add(player)
+        self._writer.write(encode({'op': 'join', 'game': name, 'player': player}))
+
+    async def run(self):
+        """
+        Plays until every game of the client is closed.
+        :return: Does not return anything
+        """
+        await self._writer.drain()
+        while self._games:
+            line = await self._reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            name = message['game']
+            kind = message['type']
+            if kind == 'state':
+                self._on_state(name, message)
+            elif kind == 'closed':
+                self._games.pop(name, None)
+                self._sent.pop(name, None)
+            elif kind == 'error':
+                self.errors += 1
+            await self._writer.drain()
+        self._writer.close()
+
+    def _on_state(self, name, message):
+        """
+        Follows a state push in the own copy of the game and makes the next move if it is ours.
+        :param name: Name of the game
+        :param message: state message
+        :return: Does not return anything
+        """
+        game = self._games[name]
+        if 'move' in message:
+            game.make_move(*message['move'])
+            self._moves[name] += 1
+            sent = self._sent.pop(name, None)
+            if sent is not None:
+                self._latencies.append(time.perf_counter() - sent)
+        if message['game_state'] != 'UNFINISHED' or message['active_player'] not in self._sides[name]:
+            return
+        if game.count_legal_moves() == 0 or self._moves[name] >= self._plies:
+            self._writer.write(encode({'op': 'leave', 'game': name}))
+            return
+        move = self._rng.choice(list(game.legal_moves()))
+        if self._think:
+            asyncio.get_running_loop().call_later(self._think, self._send_move, name, move)
+        else:
+            self._send_move(name, move)
+
+    def _send_move(self, name, move):
+        """
+        Sends a move and notes the time it was sent.
+        :param name: Name of the game
+        :param move: (start cell, end cell)
+        :return: Does not return anything
+        """
+        if name in self._games and not self._writer.is_closing():
+            self._sent[name] = time.perf_counter()
+            self._writer.write(encode({'op': 'move', 'game': name, 'start': move[0], 'end': move[1]}))
+
+
+async def run_load(host='127.0.0.1', port=DEFAULT_PORT, num_games=10000, connections=100, plies=40, think=0.0,
+                   seed=0):
+    """
+    Plays many games at once against a server and measures the move latency. Game g is played by connection
+    g % connections as Black and by the next connection as Red.
+    :param host: Address of the server
+    :param port: Port of the server
+    :param num_games: Number of games played at the same time
+    :param connections: Number of client connections the games are spread over
+    :param plies: Moves in each game before it is left
+    :param think: Seconds each player waits before moving, 0 to move as soon as the state arrives
+    :param seed: Seed of the random moves
+    :return: dict with the moves made, moves/sec, p50 and p99 latency in milliseconds and the errors received
+    """
+    latencies = []
+    clients = []
+    for index in range(connections):
+        reader, writer = await asyncio.open_connection(host, port)
+        clients.append(_LoadClient(reader, writer, random.Random('%d-%d' % (seed, index)), plies, think,
+                                   latencies))
+    for game_id in range(num_games):
+        name = 'load-%d-%d' % (seed, game_id)
+        clients[game_id % connections].join(name, 'BLACK')
+        clients[(game_id + 1) % connections].join(name, 'RED')
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client.run() for client in clients))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'moves': len(latencies),
+        'moves_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': sum(client.errors for client in clients),
+    }
+
+
+async def _serve(args):
+    """
+    Runs the server until interrupted.
+    :param args: parsed command line arguments
+    :return: Does not return anything
+    """
+    server = HasamiServer(args.idle_timeout)
+    port = await server.start(args.host, args.port)
+    print('serving on %s:%d' % (args.host, port))
+    await server.serve_forever()
+
+
+async def _load(args):
+    """
+    Runs the load generator, against a server started in the same process if --local is given.
+    :param args: parsed command line arguments
+    :return: dict summary of run_load
+    """
+    server = None
+    port = args.port
+    if args.local:
+        server = HasamiServer(args.idle_timeout)
+        port = await server.start(args.host, 0)
+    try:
+        return await run_load(args.host, port, args.games, args.connections, args.plies, args.think,
+                              args.seed)
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main():
+    """
+    Runs the server or the load generator from the command line.
+    :return: Doesn't return anything
+    """
+    parser = argparse.ArgumentParser(description='Hasami Shogi game server')
+    parser.add_argument('command', choices=('serve', 'load'), help='run the server or the load generator')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on or connect to')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on or connect to')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help='seconds before an idle game closes')
+    parser.add_argument('--games', type=int, default=10000, help='load: games played at the same time')
+    parser.add_argument('--connections', type=int, default=100, help='load: client connections')
+    parser.add_argument('--plies', type=int, default=40, help='load: moves per game')
+    parser.add_argument('--think', type=float, default=0.0, help='load: seconds each player waits before moving')
+    parser.add_argument('--seed', type=int, default=0, help='load: seed of the random moves')
+    parser.add_argument('--local', action='store_true', help='load: start a server in this process')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(_serve(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    summary = asyncio.run(_load(args))
+    print('%d moves, %.0f moves/sec, p50 %.2f ms, p99 %.2f ms, %d errors' % (
+        summary['moves'], summary['moves_per_sec'], summary['p50_ms'], summary['p99_ms'], summary['errors']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,64 +1,882 @@
 # Simulator for the Hasami Shogi Game also known as Intercepting Chess. This is a 2 player game, where players take turns making their moves.
 # The rules of the game follow variant 1 from https://en.wikipedia.org/wiki/Hasami_shogi. Run the game and have fun!
 
+import argparse
+import os
+import random
+import sys
+from collections import namedtuple
+
+# Board geometry. The standard board has BOARD_ROWS rows of BOARD_COLUMNS squares, and a board of any other size is
+# played by passing a BoardGeometry to HasamiShogiGame. Squares are numbered from 0, row by row, so on the standard
+# board 'a1' is 0, 'a9' is 8, 'b1' is 9 and 'i9' is 80. This is the same order the original list board used, so square
+# indexes returned by search_board are unchanged. Rows are named by letters and columns numbered from 1, so cells of
+# larger boards read 'a10' or 'm13'.
+BOARD_ROWS = 9
+BOARD_COLUMNS = 9
+ROW_LETTERS = 'abcdefghijklmnopqrstuvwxyz'
+
+# Players are indexed the same way as self._player_cap_pieces, 0 for 'BLACK' and 1 for 'RED'.
+PLAYERS = ('BLACK', 'RED')
+PLAYER_INDEX = {'BLACK': 0, 'RED': 1}
+PIECES = ('B', 'R')
+
+# A player wins once the opponent has one piece left or none. WIN_STATES holds the game state when each player wins.
+WIN_STATES = ('BLACK_WON', 'RED_WON')
+
+# Rows and columns up to this long get capture tables indexed by every set of opponent pieces on the line, 2 ** length
+# entries per square and line. Longer lines are scanned with the ray masks instead, which costs about the same per move
+# whatever the board size.
+CAPTURE_TABLE_MAX_LINE = 10
+
+# Seed of the Zobrist numbers, fixed so keys are the same in every process.
+ZOBRIST_SEED = 20211207
+
+
+def _ray(geometry, square, line):
+    """
+    Lists the squares from a square to the edge of the board in one direction.
+    :param geometry: BoardGeometry of the board
+    :param square: Square index the ray starts from, not included in the ray
+    :param line: Direction of the ray, one of the LINE_STEPS keys
+    :return: tuple of square indexes, nearest square first
+    """
+    ray = []
+    while not geometry.edge_masks[line] >> square & 1:
+        square += geometry.line_steps[line]
+        ray.append(square)
+    return tuple(ray)
+
+
+def _corner_guards(rows, columns):
+    """
+    Finds the squares of the corner captures. Each corner is guarded by the two squares next to it.
+    :param rows: Number of rows
+    :param columns: Number of columns
+    :return: dict mapping each square next to a corner to the corner square and the other square that guards it
+    """
+    guards = {}
+    for row, column in ((0, 0), (0, columns - 1), (rows - 1, 0), (rows - 1, columns - 1)):
+        corner = row * columns + column
+        along_row = corner + (1 if column == 0 else -1)
+        along_column = corner + (columns if row == 0 else -columns)
+        for guard, other in sorted(((along_row, along_column), (along_column, along_row))):
+            guards[guard] = (corner, other)
+    return guards
+
+
+def _between_function(square_row, square_column, column_masks):
+    """
+    Builds between_mask for one board size.
+    :param square_row: Row of each square
+    :param square_column: Column of each square
+    :param column_masks: Bitboard of each column
+    :return: function between_mask(start, end)
+    """
+
+    def between_mask(start, end):
+        """
+        Returns the mask of the squares strictly between two squares on the same row or column.
+        :param start: Square index of one end of the line
+        :param end: Square index of the other end of the line
+        :return: Bitboard of the squares in between, 0 if the squares are next to each other or the same
+        """
+        low, high = (start, end) if start < end else (end, start)
+        if high - low < 2:
+            return 0
+        # All the bits between the two squares. On a row this is already the answer, on a column only keep that column.
+        mask = (1 << high) - (1 << (low + 1))
+        if square_row[low] != square_row[high]:
+            mask &= column_masks[square_column[low]]
+        return mask
+
+    return between_mask
+
+
+def _reachable_function(ray_masks):
+    """
+    Builds reachable_mask for one board size.
+    :param ray_masks: The four ray bitboards of each square
+    :return: function reachable_mask(square, occupied)
+    """
+
+    def reachable_mask(square, occupied):
+        """
+        Returns the squares a piece on the given square can slide to, stopping each ray before the first blocker.
+        :param square: Square index of the piece
+        :param occupied: Bitboard of all the pieces on the board
+        :return: Bitboard of the reachable squares
+        """
+        top, bottom, left, right = ray_masks[square]
+        # Rays going down or right run towards higher squares, so they stop below the lowest blocker. When there is no
+        # blocker, (0 & -0) - 1 is -1 and the whole ray is kept.
+        blockers = bottom & occupied
+        reachable = bottom & ((blockers & -blockers) - 1)
+        blockers = right & occupied
+        reachable |= right & ((blockers & -blockers) - 1)
+        # Rays going up or left run towards lower squares, so they stop above the highest blocker.
+        reachable |= top & ~((1 << (top & occupied).bit_length()) - 1)
+        reachable |= left & ~((1 << (left & occupied).bit_length()) - 1)
+        return reachable
+
+    return reachable_mask
+
+
+def _line_captures(position, length, opponent):
+    """
+    Finds the custodian captures along one line for a piece landing on it.
+    :param position: Position of the landing square in the line
+    :param length: Number of squares in the line
+    :param opponent: Bits of the line holding opponent pieces
+    :return: list of (captured line bits, position of the square that must hold the mover's piece)
+    """
+    captures = []
+    for step in (-1, 1):
+        run = 0
+        position_next = position + step
+        while 0 <= position_next < length and opponent >> position_next & 1:
+            run |= 1 << position_next
+            position_next += step
+        if run and 0 <= position_next < length:
+            captures.append((run, position_next))
+    return captures
+
+
+# Line captures by line length, landing position and opponent bits, shared by every row or column of that length on
+# every board, built the first time a board with lines of that length is made
+_LINE_CAPTURES = {}
+
+
+def _line_capture_table(length):
+    """
+    Returns the line captures of every landing position and set of opponent pieces of a line.
+    :param length: Number of squares in the line
+    :return: list indexed by position of lists indexed by opponent bits, see _line_captures
+    """
+    table = _LINE_CAPTURES.get(length)
+    if table is None:
+        table = _LINE_CAPTURES[length] = [[_line_captures(position, length, opponent) for opponent in
+                                           range(1 << length)] for position in range(length)]
+    return table
+
+
+def _capture_table(geometry, square, along_row, column_spread):
+    """
+    Builds the capture table of one square for its row or its column, including the corner capture of a corner on
+    that line.
+    :param geometry: BoardGeometry of the board
+    :param square: Landing square index
+    :param along_row: True for the row of the square, False for its column
+    :param column_spread: list mapping column line bits to the same bits spread out over the squares of column 0
+    :return: list indexed by the opponent bits of the line, of tuples of (captured squares bitboard, bitboard of the
+    square that must hold the mover's piece)
+    """
+    rows, columns = geometry.rows, geometry.columns
+    row, column = geometry.square_row[square], geometry.square_column[square]
+    if along_row:
+        length, position = columns, column
+        line_squares = [row * columns + index for index in range(columns)]
+    else:
+        length, position = rows, row
+        line_squares = [index * columns + column for index in range(rows)]
+
+    # A corner next to the landing square on this line is captured when the other square next to it is the mover's
+    corner_bit = 0
+    corner_guards = geometry.corner_guards
+    if square in corner_guards and corner_guards[square][0] in line_squares:
+        corner, guard = corner_guards[square]
+        corner_bit = 1 << line_squares.index(corner)
+        corner_entry = (1 << corner, 1 << guard)
+
+    table = []
+    for opponent, captures in enumerate(_line_capture_table(length)[position]):
+        if not captures and not opponent & corner_bit:
+            table.append(())
+            continue
+        # Turn the line bits into board squares. Row bits are already in order, column bits are spread out.
+        if along_row:
+            entries = [(run << line_squares[0], 1 << line_squares[closing]) for run, closing in captures]
+        else:
+            entries = [(column_spread[run] << column, 1 << line_squares[closing]) for run, closing in captures]
+        if opponent & corner_bit:
+            entries.append(corner_entry)
+        table.append(tuple(entries))
+    return table
+
+
+def _table_capture_function(geometry):
+    """
+    Builds capture_mask for a board whose rows and columns are short enough for capture tables. A row of the board is
+    geometry.columns contiguous bits of a bitboard, so its contents are read with a shift and a mask. A column is spread
+    out one bit per row, so it is gathered into contiguous bits by multiplying with a magic number, which moves the bit
+    of row k to bit magic_shift + k without any two products overlapping as long as there are no more rows than
+    columns.
+    :param geometry: BoardGeometry of the board
+    :return: function capture_mask(own, opponent, square)
+    """
+    rows, columns = geometry.rows, geometry.columns
+    column_spread = [sum(1 << (row * columns) for row in range(rows) if bits >> row & 1) for bits in range(1 << rows)]
+    row_captures = [_capture_table(geometry, square, True, column_spread) for square in range(geometry.squares)]
+    column_captures = [_capture_table(geometry, square, False, column_spread) for square in range(geometry.squares)]
+    row_shifts = [row * columns for row in geometry.square_row]
+    square_column = geometry.square_column
+    column_mask = geometry.column_masks[0]
+    row_line_mask = (1 << columns) - 1
+    column_line_mask = (1 << rows) - 1
+    magic_shift = (rows - 1) * columns
+    magic = sum(1 << (magic_shift - row * (columns - 1)) for row in range(rows))
+
+    def capture_mask(own, opponent, square):
+        """
+        Looks up the pieces captured by a piece landing on a square, custodian captures on its row and column and
+        corner captures.
+        :param own: Bitboard of the moving player's pieces, including the piece on the landing square
+        :param opponent: Bitboard of the opponent's pieces
+        :param square: Landing square index
+        :return: Bitboard of the captured opponent pieces
+        """
+        captured = 0
+        for mask, required in row_captures[square][opponent >> row_shifts[square] & row_line_mask]:
+            if own & required:
+                captured |= mask
+        column = (opponent >> square_column[square] & column_mask) * magic >> magic_shift
+        for mask, required in column_captures[square][column & column_line_mask]:
+            if own & required:
+                captured |= mask
+        return captured
+
+    return capture_mask
+
+
+def _scan_capture_function(ray_masks, corner_guards):
+    """
+    Builds capture_mask for a board of any size. Each of the four rays from the landing square is cut at its first
+    square that does not hold an opponent piece, and the opponent pieces before the cut are captured when the mover has
+    a piece on it, the same blocker search as reachable_mask.
+    :param ray_masks: The four ray bitboards of each square
+    :param corner_guards: dict of the corner captures, see _corner_guards
+    :return: function capture_mask(own, opponent, square)
+    """
+
+    def capture_mask(own, opponent, square):
+        """
+        Finds the pieces captured by a piece landing on a square, custodian captures on its row and column and corner
+        captures.
+        :param own: Bitboard of the moving player's pieces, including the piece on the landing square
+        :param opponent: Bitboard of the opponent's pieces
+        :param square: Landing square index
+        :return: Bitboard of the captured opponent pieces
+        """
+        top, bottom, left, right = ray_masks[square]
+        captured = 0
+        # Down and right the cut is the lowest square of the ray without an opponent piece
+        stop = bottom & ~opponent
+        stop &= -stop
+        if stop & own:
+            captured = bottom & (stop - 1)
+        stop = right & ~opponent
+        stop &= -stop
+        if stop & own:
+            captured |= right & (stop - 1)
+        # Up and left it is the highest
+        stop = top & ~opponent
+        if stop:
+            stop = 1 << (stop.bit_length() - 1)
+            if stop & own:
+                captured |= top & -(stop << 1)
+        stop = left & ~opponent
+        if stop:
+            stop = 1 << (stop.bit_length() - 1)
+            if stop & own:
+                captured |= left & -(stop << 1)
+        guards = corner_guards.get(square)
+        if guards is not None and opponent >> guards[0] & 1 and own >> guards[1] & 1:
+            captured |= 1 << guards[0]
+        return captured
+
+    return capture_mask
+
+
+def _zobrist_function(zobrist_pieces):
+    """
+    Builds zobrist_mask for one board size.
+    :param zobrist_pieces: Zobrist number of each player's piece on each square
+    :return: function zobrist_mask(player, mask)
+    """
+
+    def zobrist_mask(player, mask):
+        """
+        Returns the XOR of the Zobrist numbers of a player's pieces on the given squares.
+        :param player: 0 for 'BLACK' or 1 for 'RED'
+        :param mask: Bitboard of the squares
+        :return: 64 bit key
+        """
+        numbers = zobrist_pieces[player]
+        key = 0
+        while mask:
+            low_bit = mask & -mask
+            mask ^= low_bit
+            key ^= numbers[low_bit.bit_length() - 1]
+        return key
+
+    return zobrist_mask
+
+
+class BoardGeometry:
+    """
+    The squares of one board size and every table the game looks up, built once when the geometry is made and shared by
+    all the games on that board. Bitboards are Python integers, which grow to as many bits as the board has squares, so
+    the same game code plays any size. between_mask, reachable_mask, capture_mask and zobrist_mask are closures over the
+    tables, so calling them costs no more than calling a module function. Get one with board_geometry, which builds
+    each size once.
+    """
+
+    def __init__(self, rows=BOARD_ROWS, columns=BOARD_COLUMNS):
+        """
+        Builds the tables of a board.
+        :param rows: Number of rows, 4 to 26, named by the letters from 'a'
+        :param columns: Number of columns, 4 or more, numbered from 1
+        """
+        if not 4 <= rows <= len(ROW_LETTERS) or columns < 4:
+            raise ValueError('a board has 4 to %d rows and 4 or more columns, not %dx%d' %
+                             (len(ROW_LETTERS), rows, columns))
+        self.rows = rows
+        self.columns = columns
+        self.squares = squares = rows * columns
+
+        # Cell names by square index, and the reverse lookup from a cell name ('b1') to its square index.
+        self.row_names = ROW_LETTERS[:rows]
+        self.cell_names = [row + str(column) for row in self.row_names for column in range(1, columns + 1)]
+        self.cell_index = {cell: square for square, cell in enumerate(self.cell_names)}
+        self.square_row = [square // columns for square in range(squares)]
+        self.square_column = [square % columns for square in range(squares)]
+
+        # Bitboard masks. Each colour is kept as one integer, where bit n is set if the colour has a piece on square n.
+        self.full_mask = (1 << squares) - 1
+        self.row_masks = [((1 << columns) - 1) << (row * columns) for row in range(rows)]
+        self.column_masks = [sum(1 << (row * columns + column) for row in range(rows)) for column in range(columns)]
+
+        # Edge masks for each capture line. A capture check walking in that direction stops on a square in the edge mask.
+        self.edge_masks = {'top': self.row_masks[0], 'bottom': self.row_masks[-1], 'left': self.column_masks[0],
+                           'right': self.column_masks[-1]}
+        self.line_steps = {'top': -columns, 'bottom': columns, 'left': -1, 'right': 1}
+        self.corner_guards = _corner_guards(rows, columns)
+
+        # Each player starts with a full row, Red on row 'a' and Black on the last row.
+        self.captures_to_win = columns - 1
+        self.start_boards = (self.row_masks[-1], self.row_masks[0])
+
+        # Sliding rays for move generation. rays[square] holds the four rays leaving the square in line_steps order
+        # (top, bottom, left, right), and ray_masks[square] holds the same rays as bitboards.
+        self.rays = [tuple(_ray(self, square, line) for line in self.line_steps) for square in range(squares)]
+        self.ray_masks = [tuple(sum(1 << end for end in ray) for ray in rays) for rays in self.rays]
+
+        # Threat masks for the capture threat map. The pieces a move landing on a square captures depend only on the
+        # square's row and column and, for a square next to a corner, the other square guarding the corner, so
+        # threat_masks[square] holds the squares whose threats can change when that square changes.
+        self.threat_masks = [self.row_masks[self.square_row[square]] | self.column_masks[self.square_column[square]]
+                             for square in range(squares)]
+        for guard, (_, other) in self.corner_guards.items():
+            self.threat_masks[guard] |= 1 << other
+
+        # Zobrist keys. Each player has a random 64 bit number per square, and RED to move has one more. The position
+        # key is the XOR of the numbers of every piece on the board, so a move only needs to XOR the squares it changes.
+        zobrist_random = random.Random(ZOBRIST_SEED)
+        self.zobrist_pieces = [[zobrist_random.getrandbits(64) for _ in range(squares)] for _ in PLAYERS]
+        self.zobrist_turn = zobrist_random.getrandbits(64)
+
+        # Packed game state, see CompactGameState
+        self.turn_bit = 1 << (2 * squares)
+        self.board_bytes = (2 * squares + 1 + 7) // 8
+        self.state_size = self.board_bytes + len(PLAYERS)
+
+        self.between_mask = _between_function(self.square_row, self.square_column, self.column_masks)
+        self.reachable_mask = _reachable_function(self.ray_masks)
+        if rows <= columns <= CAPTURE_TABLE_MAX_LINE:
+            self.capture_mask = _table_capture_function(self)
+        else:
+            self.capture_mask = _scan_capture_function(self.ray_masks, self.corner_guards)
+        self.zobrist_mask = _zobrist_function(self.zobrist_pieces)
+        self.start_key = self.compute_position_key(self.start_boards, 'BLACK')
+
+    def compute_position_key(self, boards, player_turn):
+        """
+        Computes the Zobrist key of a position from scratch.
+        :param boards: The two bitboards, in PLAYERS order
+        :param player_turn: 'RED' or 'BLACK', the player to move
+        :return: 64 bit key
+        """
+        key = self.zobrist_mask(0, boards[0]) ^ self.zobrist_mask(1, boards[1])
+        if player_turn == 'RED':
+            key ^= self.zobrist_turn
+        return key
+
+    def canonical_position_key(self, boards, player_turn):
+        """
+        Finds the canonical form of a position square by square, for boards without the row tables of
+        canonical_position_key. See canonical_position_key.
+        :param boards: The two bitboards, in PLAYERS order
+        :param player_turn: 'RED' or 'BLACK', the player to move
+        :return: (64 bit key, one of SYMMETRIES taking the position to its canonical form)
+        """
+        best = None
+        for transform in SYMMETRIES:
+            result = [0, 0]
+            for player in range(len(PLAYERS)):
+                board = boards[player]
+                while board:
+                    low_bit = board & -board
+                    board ^= low_bit
+                    square = low_bit.bit_length() - 1
+                    row, column = self.square_row[square], self.square_column[square]
+                    if transform & MIRROR:
+                        column = self.columns - 1 - column
+                    if transform & FLIP:
+                        row = self.rows - 1 - row
+                    result[player ^ (transform & FLIP) >> 1] |= 1 << (row * self.columns + column)
+            turn = PLAYER_INDEX[player_turn] ^ (transform & FLIP) >> 1
+            key = self.compute_position_key(result, PLAYERS[turn])
+            if best is None or key < best[0]:
+                best = (key, transform)
+        return best
+
+    def __reduce__(self):
+        # Pickled as its size, so a game sent to a worker process uses the worker's own tables of that size
+        return board_geometry, (self.rows, self.columns)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return 'BoardGeometry(%d, %d)' % (self.rows, self.columns)
+
+
+# Geometries made by board_geometry, by (rows, columns)
+_GEOMETRIES = {}
+
+
+def board_geometry(rows=BOARD_ROWS, columns=BOARD_COLUMNS):
+    """
+    Returns the geometry of a board size, building its tables the first time the size is asked for.
+    :param rows: Number of rows
+    :param columns: Number of columns
+    :return: BoardGeometry, the same object for every call with the same size
+    """
+    geometry = _GEOMETRIES.get((rows, columns))
+    if geometry is None:
+        geometry = _GEOMETRIES[(rows, columns)] = BoardGeometry(rows, columns)
+    return geometry
+
+
+# The standard board, and its tables under the names the rest of the package uses
+STANDARD_GEOMETRY = board_geometry()
+BOARD_SQUARES = STANDARD_GEOMETRY.squares
+ROW_NAMES = STANDARD_GEOMETRY.row_names
+CELL_NAMES = STANDARD_GEOMETRY.cell_names
+CELL_INDEX = STANDARD_GEOMETRY.cell_index
+SQUARE_ROW = STANDARD_GEOMETRY.square_row
+SQUARE_COLUMN = STANDARD_GEOMETRY.square_column
+FULL_MASK = STANDARD_GEOMETRY.full_mask
+ROW_MASKS = STANDARD_GEOMETRY.row_masks
+COLUMN_MASKS = STANDARD_GEOMETRY.column_masks
+EDGE_MASKS = STANDARD_GEOMETRY.edge_masks
+LINE_STEPS = STANDARD_GEOMETRY.line_steps
+CORNER_GUARDS = STANDARD_GEOMETRY.corner_guards
+CAPTURES_TO_WIN = STANDARD_GEOMETRY.captures_to_win
+RAYS = STANDARD_GEOMETRY.rays
+RAY_MASKS = STANDARD_GEOMETRY.ray_masks
+ZOBRIST_PIECES = STANDARD_GEOMETRY.zobrist_pieces
+ZOBRIST_TURN = STANDARD_GEOMETRY.zobrist_turn
+START_POSITION_KEY = STANDARD_GEOMETRY.start_key
+between_mask = STANDARD_GEOMETRY.between_mask
+reachable_mask = STANDARD_GEOMETRY.reachable_mask
+capture_mask = STANDARD_GEOMETRY.capture_mask
+zobrist_mask = STANDARD_GEOMETRY.zobrist_mask
+compute_position_key = STANDARD_GEOMETRY.compute_position_key
+ROW_LINE_MASK = (1 << BOARD_COLUMNS) - 1
+
+# When True, every move and take back checks the incremental position key against one computed from scratch.
+DEBUG_POSITION_KEY = False
+
+# Symmetries of the game. The board plays the same mirrored left to right, and flipped top to bottom with the colours
+# and the player to move swapped, so up to four positions share one canonical form. Each transform is its own inverse.
+IDENTITY = 0
+MIRROR = 1
+FLIP = 2
+MIRROR_FLIP = MIRROR | FLIP
+SYMMETRIES = (IDENTITY, MIRROR, FLIP, MIRROR_FLIP)
+
+
+def _transform_square(square, transform):
+    """
+    Returns the square a square goes to under a symmetry.
+    :param square: Square index
+    :param transform: One of SYMMETRIES
+    :return: Square index
+    """
+    row = SQUARE_ROW[square]
+    column = SQUARE_COLUMN[square]
+    if transform & MIRROR:
+        column = BOARD_COLUMNS - 1 - column
+    if transform & FLIP:
+        row = BOARD_ROWS - 1 - row
+    return row * BOARD_COLUMNS + column
+
+
+SQUARE_TRANSFORMS = [[_transform_square(square, transform) for square in range(BOARD_SQUARES)]
+                     for transform in SYMMETRIES]
+# MIRRORED_ROWS[bits] is one row of a bitboard mirrored left to right
+MIRRORED_ROWS = [sum(1 << (BOARD_COLUMNS - 1 - column) for column in range(BOARD_COLUMNS) if bits >> column & 1)
+                 for bits in range(1 << BOARD_COLUMNS)]
+
+
+def _row_zobrist(player, row, transform):
+    """
+    Lists the Zobrist key of every set of a player's pieces on one row, after a symmetry is applied to the pieces.
+    :param player: 0 for 'BLACK' or 1 for 'RED'
+    :param row: Row number, 0 for 'a'
+    :param transform: One of SYMMETRIES
+    :return: list of 64 bit keys indexed by the row's bits
+    """
+    if transform & FLIP:
+        player = 1 - player
+    numbers = [ZOBRIST_PIECES[player][SQUARE_TRANSFORMS[transform][row * BOARD_COLUMNS + column]]
+               for column in range(BOARD_COLUMNS)]
+    keys = [0] * (1 << BOARD_COLUMNS)
+    for bits in range(1, 1 << BOARD_COLUMNS):
+        low_bit = bits & -bits
+        keys[bits] = keys[bits ^ low_bit] ^ numbers[low_bit.bit_length() - 1]
+    return keys
+
+
+# For each row, the row keys of Black and of Red under each of the SYMMETRIES in turn. The keys of a position under all
+# four symmetries are then found with two lookups per row and symmetry, and the IDENTITY key equals the position key.
+SYMMETRY_ZOBRIST = [tuple(_row_zobrist(player, row, transform) for transform in SYMMETRIES for player in range(2))
+                    for row in range(BOARD_ROWS)]
+
+
+def canonical_position_key(boards, player_turn):
+    """
+    Finds the canonical form of a position: the smallest of the Zobrist keys of its symmetric positions.
+    :param boards: The two bitboards, in PLAYERS order
+    :param player_turn: 'RED' or 'BLACK', the player to move
+    :return: (64 bit key, one of SYMMETRIES taking the position to its canonical form)
+    """
+    black, red = boards
+    key0 = key1 = key2 = key3 = 0
+    shift = 0
+    for black0, red0, black1, red1, black2, red2, black3, red3 in SYMMETRY_ZOBRIST:
+        black_row = black >> shift & ROW_LINE_MASK
+        red_row = red >> shift & ROW_LINE_MASK
+        shift += BOARD_COLUMNS
+        if black_row | red_row:
+            key0 ^= black0[black_row] ^ red0[red_row]
+            key1 ^= black1[black_row] ^ red1[red_row]
+            key2 ^= black2[black_row] ^ red2[red_row]
+            key3 ^= black3[black_row] ^ red3[red_row]
+    # Flipping swaps the player to move
+    if player_turn == 'RED':
+        key0 ^= ZOBRIST_TURN
+        key1 ^= ZOBRIST_TURN
+    else:
+        key2 ^= ZOBRIST_TURN
+        key3 ^= ZOBRIST_TURN
+
+    key, transform = key0, IDENTITY
+    if key1 < key:
+        key, transform = key1, MIRROR
+    if key2 < key:
+        key, transform = key2, FLIP
+    if key3 < key:
+        key, transform = key3, MIRROR_FLIP
+    return key, transform
+
+
+def transform_boards(boards, player_turn, transform):
+    """
+    Applies a symmetry to a position.
+    :param boards: The two bitboards, in PLAYERS order
+    :param player_turn: 'RED' or 'BLACK', the player to move
+    :param transform: One of SYMMETRIES
+    :return: ([black, red] bitboards, player to move) of the symmetric position
+    """
+    result = [0, 0]
+    for player in range(2):
+        board = boards[player]
+        for row in range(BOARD_ROWS):
+            bits = board >> (row * BOARD_COLUMNS) & ROW_LINE_MASK
+            if transform & MIRROR:
+                bits = MIRRORED_ROWS[bits]
+            if transform & FLIP:
+                result[1 - player] |= bits << ((BOARD_ROWS - 1 - row) * BOARD_COLUMNS)
+            else:
+                result[player] |= bits << (row * BOARD_COLUMNS)
+    if transform & FLIP:
+        player_turn = PLAYERS[1 - PLAYER_INDEX[player_turn]]
+    return result, player_turn
+
+
+def transform_move(move, transform):
+    """
+    Applies a symmetry to a move. As every transform is its own inverse, the same call maps a move of the canonical
+    form back to the position it came from.
+    :param move: (start cell, end cell)
+    :param transform: One of SYMMETRIES
+    :return: (start cell, end cell) of the move in the symmetric position
+    """
+    squares = SQUARE_TRANSFORMS[transform]
+    return CELL_NAMES[squares[CELL_INDEX[move[0]]]], CELL_NAMES[squares[CELL_INDEX[move[1]]]]
+
+# Packed game state: the two bitboards side by side in BOARD_BYTES little endian bytes (Black in bits 0 to 80, Red in
+# bits 81 to 161, bit 162 set when Red is to move), then one byte for the captured pieces of each player. Other boards
+# are packed the same way, in geometry.state_size bytes.
+TURN_BIT = STANDARD_GEOMETRY.turn_bit
+BOARD_BYTES = STANDARD_GEOMETRY.board_bytes
+STATE_SIZE = STANDARD_GEOMETRY.state_size
+
+
+class CompactGameState:
+    """
+    A game position packed into STATE_SIZE bytes, for keeping many idle games in memory. Holds only the bytes, which
+    are used as given and returned as they are, without being copied. The board size is not stored, states of other
+    boards are packed and unpacked with their BoardGeometry.
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data, geometry=STANDARD_GEOMETRY):
+        """
+        Wraps a packed state.
+        :param data: bytes of length geometry.state_size, as returned by bytes() of a CompactGameState
+        :param geometry: BoardGeometry of the board
+        """
+        if len(data) != geometry.state_size:
+            raise ValueError('game state must be %d bytes, not %d' % (geometry.state_size, len(data)))
+        self._data = data
+
+    @classmethod
+    def pack(cls, boards, player_turn, black_captured, red_captured, geometry=STANDARD_GEOMETRY):
+        """
+        Packs a position.
+        :param boards: The two bitboards, in PLAYERS order
+        :param player_turn: 'RED' or 'BLACK', the player to move
+        :param black_captured: Number of Black pieces captured
+        :param red_captured: Number of Red pieces captured
+        :param geometry: BoardGeometry of the board
+        :return: CompactGameState
+        """
+        packed = boards[0] | boards[1] << geometry.squares
+        if player_turn == 'RED':
+            packed |= geometry.turn_bit
+        return cls(packed.to_bytes(geometry.board_bytes, 'little') + bytes((black_captured, red_captured)), geometry)
+
+    def unpack(self, geometry=STANDARD_GEOMETRY):
+        """
+        Unpacks the position.
+        :param geometry: BoardGeometry of the board the state was packed for
+        :return: ([black, red] bitboards, player to move, Black pieces captured, Red pieces captured)
+        """
+        data = self._data
+        board_bytes = geometry.board_bytes
+        if len(data) != geometry.state_size:
+            raise ValueError('game state must be %d bytes, not %d' % (geometry.state_size, len(data)))
+        packed = int.from_bytes(data[:board_bytes], 'little')
+        boards = [packed & geometry.full_mask, packed >> geometry.squares & geometry.full_mask]
+        return boards, PLAYERS[packed >= geometry.turn_bit], data[board_bytes], data[board_bytes + 1]
+
+    def __bytes__(self):
+        return self._data
+
+    def __eq__(self, other):
+        return isinstance(other, CompactGameState) and self._data == other._data
+
+    def __hash__(self):
+        return hash(self._data)
+
+
+# What one move changed, everything a client holding the position before the move needs to follow it: the start and
+# end square, the squares of the pieces it captured, the player to move after it and the game state after it.
+MoveDelta = namedtuple('MoveDelta', ['start', 'end', 'captured', 'player_turn', 'game_state'])
+
+
 class HasamiShogiGame:
     """
     Hasami Shogi Game Simulator, including all methods to play the game. This is the only class for the game.
     """
+    __slots__ = ('_player_cap_pieces', '_player_turn', '_game_state', '_undo_stack', '_boards', '_position_key',
+                 '_shared', '_geometry', '_threats', '_threat_dirty')
 
-    def __init__(self):
+    def __init__(self, geometry=STANDARD_GEOMETRY):
         """
         Initializes all data members for the Hasami Shogi Game. Includes board, player piece info, and game state.
+        :param geometry: BoardGeometry of the board to play on, the standard 9x9 board by default
         """
+        # Size of the board and the tables of that size, shared with every game on the same board
+        self._geometry = geometry
+
         # Self._players will be a list to keep track  the player pieces. Both players will start with 9 pieces each.
         # self._player_turn  will alternate from 'BLACK'/'RED' after each player's turn.
         self._player_cap_pieces = [['BLACK', 0], ['RED', 0]]
         self._player_turn = 'BLACK'
         self._game_state = 'UNFINISHED'
-        self._print = "  "
-        self._sequence_check = []
-        self._captured_cells = []
-        self._cell_id = None
-        self._cell_search = None
-
-        # Initialize Hasami Shogi Board stored in a list. The board/list will keep all the squares/coordinates of the
-        # board and keep track of occupancy of each square. For example, ['a', '1', 'R'] will represent the column 1,
-        # row 'a' and has 'RED' player on there.
-        self._hasami_board = []
-
-        # Creates first row with Red pieces
-        for column in range(1, 10):
-            cell = 'a' + str(column)
-            self._hasami_board.append([cell, 'R'])
-
-        # Creates an empty board
-        for row in range(98, 105):
-            for column in range(1, 10):
-                cell = chr(row) + str(column)
-                self._hasami_board.append([cell, '.'])
-
-        # Creates last row, with Black pieces
-        for column in range(1, 10):
-            cell = 'i' + str(column)
-            self._hasami_board.append([cell, 'B'])
+
+        # Undo records for unmake_move, one (start square, end square, captured squares bitboard, player) tuple per
+        # move made, most recent last.
+        self._undo_stack = []
+
+        # Initialize Hasami Shogi Board stored as two bitboards, one per player in the same order as PLAYERS. Bit n of
+        # a bitboard is set when that player has a piece on square n. Red starts on row 'a' and Black on the last row.
+        self._boards = list(geometry.start_boards)
+
+        # Zobrist key of the position, updated by every move instead of being recomputed.
+        self._position_key = geometry.start_key
+
+        # True while the lists above are shared with a snapshot, they are copied before the first change.
+        self._shared = False
+
+        # Capture threat map, see capture_threats. None until it is first asked for, then one dict per player mapping
+        # each empty square a move of the player would capture from to the captured pieces, and one bitboard per player
+        # of the squares whose entries moves have changed since.
+        self._threats = None
+        self._threat_dirty = None
+
+    def clone(self):
+        """
+        Takes no parameters and copies the position into a new game, in O(1): only the two bitboards and the captured
+        pieces are copied. The moves made are not, so unmake_move of the clone can't go back past the position cloned.
+        :return: HasamiShogiGame
+        """
+        game = HasamiShogiGame.__new__(HasamiShogiGame)
+        game._player_cap_pieces = [['BLACK', self._player_cap_pieces[0][1]], ['RED', self._player_cap_pieces[1][1]]]
+        game._player_turn = self._player_turn
+        game._game_state = self._game_state
+        game._undo_stack = []
+        game._boards = [self._boards[0], self._boards[1]]
+        game._position_key = self._position_key
+        game._shared = False
+        game._geometry = self._geometry
+        game._threats = None
+        game._threat_dirty = None
+        return game
+
+    def snapshot(self):
+        """
+        Takes no parameters and returns a copy-on-write copy of the game, made in O(1) whatever the number of moves
+        made. The copy shares its board and moves with this game until either of them changes, and the one that
+        changes first copies them then. Unlike clone, the moves are kept, so unmake_move works on the snapshot too.
+        :return: HasamiShogiGame
+        """
+        game = HasamiShogiGame.__new__(HasamiShogiGame)
+        game._player_cap_pieces = self._player_cap_pieces
+        game._player_turn = self._player_turn
+        game._game_state = self._game_state
+        game._undo_stack = self._undo_stack
+        game._boards = self._boards
+        game._position_key = self._position_key
+        game._shared = self._shared = True
+        game._geometry = self._geometry
+        game._threats = None
+        game._threat_dirty = None
+        return game
+
+    def _unshare(self):
+        """
+        Gives the game its own copy of the lists it shares with a snapshot, before they are changed.
+        :return: Does not return anything
+        """
+        self._player_cap_pieces = [self._player_cap_pieces[0][:], self._player_cap_pieces[1][:]]
+        self._undo_stack = self._undo_stack[:]
+        self._boards = self._boards[:]
+        self._shared = False
+
+    def reset(self):
+        """
+        Puts the game back to the starting board in place, without creating new objects, so one game object can be
+        reused for many games.
+        :return: Does not return anything
+        """
+        if self._shared:
+            self._unshare()
+        self._player_cap_pieces[0][1] = 0
+        self._player_cap_pieces[1][1] = 0
+        self._player_turn = 'BLACK'
+        self._game_state = 'UNFINISHED'
+        self._undo_stack.clear()
+        self._boards[0], self._boards[1] = self._geometry.start_boards
+        self._position_key = self._geometry.start_key
+        self._threats = None
+
+    def save_state(self):
+        """
+        Takes no parameters and packs the position into a CompactGameState. The moves made are not kept, so
+        unmake_move can't go back past a saved state once it is loaded.
+        :return: CompactGameState
+        """
+        return CompactGameState.pack(self._boards, self._player_turn, self._player_cap_pieces[0][1],
+                                     self._player_cap_pieces[1][1], self._geometry)
+
+    def load_state(self, state):
+        """
+        Puts the game in the position of a CompactGameState, in place.
+        :param state: CompactGameState, or the bytes of one
+        :return: Does not return anything
+        """
+        if not isinstance(state, CompactGameState):
+            state = CompactGameState(state, self._geometry)
+        boards, player_turn, black_captured, red_captured = state.unpack(self._geometry)
+        if self._shared:
+            self._unshare()
+        self._boards[0], self._boards[1] = boards
+        self._player_turn = player_turn
+        self._player_cap_pieces[0][1] = black_captured
+        self._player_cap_pieces[1][1] = red_captured
+        self._undo_stack.clear()
+        self._position_key = self._geometry.compute_position_key(self._boards, player_turn)
+        self._update_game_state()
+        self._threats = None
+
+    def get_geometry(self):
+        """
+        Takes no parameters and returns the size of the board and its tables.
+        :return: BoardGeometry
+        """
+        return self._geometry
+
+    def get_bitboards(self):
+        """
+        Takes no parameters and returns the board as bitboards.
+        :return: (black, red) integers, bit n is set when that player has a piece on square n
+        """
+        return self._boards[0], self._boards[1]
 
     def get_game_state(self):
         """
-        Takes no parameters, and provides the state of the game.
+        Takes no parameters, and provides the state of the game. The state is kept up to date by every move, take back
+        and load, so this is a lookup.
         :return: 'UNFINISHED', 'RED_WON', 'BLACK_WON'
         """
+        return self._game_state
+
+    def _update_game_state(self):
+        """
+        Sets the state of the game from the captured pieces, after the position is replaced.
+        :return: Does not return anything
+        """
         # Check the number of pieces captured for each player, if each player has more than 1 piece left, then
         # set game as 'UNFINISHED'.
-        if self.get_num_captured_pieces('BLACK') < 8 and self.get_num_captured_pieces('RED') < 8:
+        captures_to_win = self._geometry.captures_to_win
+        black_captured = self._player_cap_pieces[0][1]
+        red_captured = self._player_cap_pieces[1][1]
+        if black_captured < captures_to_win and red_captured < captures_to_win:
             self._game_state = 'UNFINISHED'
             # Else if 'black' has less than 2 pieces left, either 1 or 0 pieces, Red wins
-        elif self.get_num_captured_pieces('BLACK') >= 8:
+        elif black_captured >= captures_to_win:
             self._game_state = 'RED_WON'
-        elif self.get_num_captured_pieces('RED') >= 8:
+        else:
             self._game_state = 'BLACK_WON'
 
-        return self._game_state
-
     def get_active_player(self):
         """
         Takes no parameters and returns who's turn it is.
@@ -71,11 +889,32 @@ class HasamiShogiGame:
         Method that takes given player ('RED' or 'BLACK') and returns the number of pieces of that color that have been
         captured.
         :param player: Either 'RED' or 'BLACK'
-        :return: the number of pieces of the player that have been captured
+        :return: the number of pieces of the player that have been captured, None for any other player
         """
-        for color in self._player_cap_pieces:
-            if player in color:
-                return color[1]
+        index = PLAYER_INDEX.get(player)
+        if index is None:
+            return None
+        return self._player_cap_pieces[index][1]
+
+    def get_num_pieces(self, player):
+        """
+        Returns the number of pieces a player has on the board, the population count of the player's bitboard.
+        :param player: Either 'RED' or 'BLACK'
+        :return: the number of pieces
+        """
+        return self._boards[PLAYER_INDEX[player]].bit_count()
+
+    def piece_squares(self, player=None):
+        """
+        Generator that yields the squares of a player's pieces, visiting only the set bits of the player's bitboard.
+        :param player: 'RED' or 'BLACK', the active player if None
+        :return: yields square indexes in increasing order
+        """
+        pieces = self._boards[PLAYER_INDEX[player or self._player_turn]]
+        while pieces:
+            low_bit = pieces & -pieces
+            pieces ^= low_bit
+            yield low_bit.bit_length() - 1
 
     def make_move(self, cell_start, cell_end):
         """
@@ -84,327 +923,444 @@ class HasamiShogiGame:
         :param cell_end: Ending square of the moved piece
         :return: True or False (depending if the move have been performed)
         """
+        cell_index = self._geometry.cell_index
+        start = cell_index.get(cell_start)
+        end = cell_index.get(cell_end)
+
         # Check if entered start and end cells are valid.
+        if start is None or end is None:
+            return False
+        return self.make_square_move(start, end)
+
+    def make_square_move(self, start, end):
+        """
+        Performs a move given as square indexes instead of cells, otherwise the same as make_move.
+        :param start: Square index of the piece to be moved
+        :param end: Square index the piece moves to
+        :return: True or False (depending if the move have been performed)
+        """
+        if self._shared:
+            self._unshare()
+        geometry = self._geometry
+        player = PLAYER_INDEX[self._player_turn]
+        own = self._boards[player]
+        occupied = own | self._boards[1 - player]
+        captured_pieces = self._player_cap_pieces
+
+        # Check if the start and end squares are on the board, square indexes can come from uploaded records
+        if not (0 <= start < geometry.squares and 0 <= end < geometry.squares):
+            return False
+
         # Check if the active player has a piece on the starting cell if not return False
-        if self.get_square_occupant(cell_start)[0] != self.get_active_player()[0]:
+        elif not own >> start & 1:
             return False
 
         # Check if the ending cell is empty
-        elif self.get_square_occupant(cell_end) != 'NONE':
+        elif occupied >> end & 1:
             return False
 
         # Check if the if move is legal.
         # Check if the move is a valid horizontal or vertical move. If the rows and columns are different, then
         # that is a diagonal move, which is not valid.
-        elif cell_start[0] != cell_end[0] and cell_start[1] != cell_end[1]:
+        elif geometry.square_row[start] != geometry.square_row[end] and \
+                geometry.square_column[start] != geometry.square_column[end]:
             return False
 
-        # Check if there are any pieces in between the start and end cell. Call the method move_check
-        elif self.move_check(cell_start, cell_end) is False:
+        # Check if there are any pieces in between the start and end cell.
+        elif geometry.between_mask(start, end) & occupied:
             return False
 
         # Check the status of the game, to make sure it is not finished already
-        elif self.get_game_state() != 'UNFINISHED':
+        elif self._game_state != 'UNFINISHED':
             return False
 
+        # If the move is valid, then let the player make the move. Clear the start square and set the end square
+        # on the active player's bitboard.
+        zobrist_pieces = geometry.zobrist_pieces
+        self._boards[player] = own ^ (1 << start) ^ (1 << end)
+        self._position_key ^= zobrist_pieces[player][start] ^ zobrist_pieces[player][end]
+
+        # After the move is done, look up the pieces taken in the capture tables. Then reduce the opponents pieces,
+        # and clear the captured squares
+        captured = geometry.capture_mask(self._boards[player], self._boards[1 - player], end)
+        if captured:
+            captured_pieces[1 - player][1] += captured.bit_count()
+            self._boards[1 - player] ^= captured
+            self._position_key ^= geometry.zobrist_mask(1 - player, captured)
+
+        # Remember the move so it can be taken back with unmake_move
+        self._undo_stack.append((start, end, captured, player))
+        if self._threats is not None:
+            self._mark_threats(start, end, captured)
+
+        # Update game state, only the opponent can have lost pieces. Then change the active player
+        if captured_pieces[1 - player][1] >= geometry.captures_to_win:
+            self._game_state = WIN_STATES[player]
         else:
-            # If the move is valid, then let the player make the move. Change the start cell as 'NONE' and the
-            # end cell as the active player
-
-            # Set the start cell as none
-            # Use square_occupant to get the index of the start cell
-            self.set_board(self.search_board(cell_start, 'yes'), cell_start, '.')
-
-            # Set the end cell as the active player, using the index of the ending cell
-            self.set_board(self.search_board(cell_end, 'yes'), cell_end, self.get_active_player()[0])
-
-            # After the move is done, then need to check if pieces can be taken. Call the capture method.
-            # Check to the right of the ending cell
-            self.capture_check(cell_end, 'right')
-            # Check to the left of the ending cell
-            self.capture_check(cell_end, 'left')
-            # Check to the bottom of the ending cell
-            self.capture_check(cell_end, 'bottom')
-            # Check to the top of the ending cell
-            self.capture_check(cell_end, 'top')
-            # Check corner capture
-            self.corner_check(cell_end)
-
-            # If the captured list is not empty, then start reducing the opponents pieces, and set the cells to empty
-            if self._captured_cells is not None:
-                # Update the number of opponent pieces captured
-                if self.get_active_player() == 'BLACK':
-                    # Update the red pieces
-                    self._player_cap_pieces[1][1] += len(self._captured_cells)
-                elif self.get_active_player() == 'RED':
-                    # Update the black pieces
-                    self._player_cap_pieces[0][1] += len(self._captured_cells)
-                # Then set the captured cells to None
-                # Loop through the captured cell list then set the cells to None.
-                for index in self._captured_cells:
-                    self._hasami_board[index][1] = '.'
-                # Set the captured cell list to empty:
-                self._captured_cells = []
-
-            # Check and update game state
-            self.get_game_state()
-
-            # Change the active player
-            if self.get_game_state() == 'UNFINISHED':
-                if self.get_active_player() == 'BLACK':
-                    self._player_turn = 'RED'
-                else:
-                    self._player_turn = 'BLACK'
-
-            return True
+            self._player_turn = PLAYERS[1 - player]
+            self._position_key ^= geometry.zobrist_turn
+
+        if DEBUG_POSITION_KEY:
+            self._check_position_key()
+        return True
+
+    def unmake_move(self):
+        """
+        Takes back the last move made, putting back the moved piece, the captured pieces and the player's turn.
+        :return: True or False (depending if there was a move to take back)
+        """
+        if not self._undo_stack:
+            return False
+        if self._shared:
+            self._unshare()
+        geometry = self._geometry
+        start, end, captured, player = self._undo_stack.pop()
+        self._boards[player] ^= (1 << start) | (1 << end)
+        self._position_key ^= geometry.zobrist_pieces[player][start] ^ geometry.zobrist_pieces[player][end]
+        if captured:
+            self._boards[1 - player] |= captured
+            self._player_cap_pieces[1 - player][1] -= captured.bit_count()
+            self._position_key ^= geometry.zobrist_mask(1 - player, captured)
+        if self._threats is not None:
+            self._mark_threats(start, end, captured)
+        if self._player_turn != PLAYERS[player]:
+            self._player_turn = PLAYERS[player]
+            self._position_key ^= geometry.zobrist_turn
+        # Moves are only made in unfinished games, so taking one back always leaves an unfinished game
+        self._game_state = 'UNFINISHED'
+
+        if DEBUG_POSITION_KEY:
+            self._check_position_key()
+        return True
+
+    def _mark_threats(self, start, end, captured):
+        """
+        Marks the threat map entries a move, its take back or a set_board may have changed, those on the rows and
+        columns of the squares it changed. They are looked up again the next time capture_threats is called.
+        :param start: Square index the piece moved from
+        :param end: Square index the piece moved to
+        :param captured: Bitboard of the captured pieces
+        :return: Does not return anything
+        """
+        threat_masks = self._geometry.threat_masks
+        changed = threat_masks[start] | threat_masks[end]
+        while captured:
+            low_bit = captured & -captured
+            captured ^= low_bit
+            changed |= threat_masks[low_bit.bit_length() - 1]
+        dirty = self._threat_dirty
+        dirty[0] |= changed
+        dirty[1] |= changed
+
+    def capture_threats(self, player=None):
+        """
+        Returns the capture threat map of a player: every empty square where a move of the player would capture, with
+        the pieces it would capture. Which piece moves there does not matter, the square it leaves is never part of a
+        capture. The map is built on the first call and then kept up to date, each move only marks the squares on the
+        rows and columns it changed, and only those are looked up again on the next call.
+        :param player: 'RED' or 'BLACK', the active player if None
+        :return: dict mapping square index to the bitboard of the opponent pieces captured, owned by the game and
+        changed by later calls, so copy it to keep it
+        """
+        geometry = self._geometry
+        index = PLAYER_INDEX[player or self._player_turn]
+        if self._threats is None:
+            self._threats = [{}, {}]
+            self._threat_dirty = [geometry.full_mask, geometry.full_mask]
+        threats = self._threats[index]
+        dirty = self._threat_dirty[index]
+        if not dirty:
+            return threats
+        self._threat_dirty[index] = 0
+        own = self._boards[index]
+        opponent = self._boards[1 - index]
+        for square in [square for square in threats if dirty >> square & 1]:
+            del threats[square]
+
+        # A capture always takes a piece next to the landing square, so only empty squares next to an opponent piece
+        # are looked up
+        columns = geometry.columns
+        edge_masks = geometry.edge_masks
+        near = (opponent << columns | opponent >> columns | (opponent & ~edge_masks['right']) << 1 |
+                (opponent & ~edge_masks['left']) >> 1)
+        candidates = dirty & near & ~(own | opponent) & geometry.full_mask
+        capture_mask = geometry.capture_mask
+        while candidates:
+            low_bit = candidates & -candidates
+            candidates ^= low_bit
+            square = low_bit.bit_length() - 1
+            captured = capture_mask(own | low_bit, opponent, square)
+            if captured:
+                threats[square] = captured
+        return threats
+
+    def capture_hints(self, player=None):
+        """
+        Lists the legal moves of a player that capture, from the capture threat map, for showing threats without a
+        search.
+        :param player: 'RED' or 'BLACK', the active player if None
+        :return: list of (start cell, end cell, list of captured cells), the moves capturing the most first, empty once
+        the game is finished
+        """
+        if self._game_state != 'UNFINISHED':
+            return []
+        geometry = self._geometry
+        cell_names = geometry.cell_names
+        index = PLAYER_INDEX[player or self._player_turn]
+        own = self._boards[index]
+        occupied = own | self._boards[1 - index]
+        hints = []
+        for end, captured in self.capture_threats(player).items():
+            # The player's pieces on the square's row and column with nothing in between can move there
+            movers = own & (geometry.row_masks[geometry.square_row[end]] |
+                            geometry.column_masks[geometry.square_column[end]])
+            captured_cells = []
+            while captured:
+                low_bit = captured & -captured
+                captured ^= low_bit
+                captured_cells.append(cell_names[low_bit.bit_length() - 1])
+            while movers:
+                low_bit = movers & -movers
+                movers ^= low_bit
+                start = low_bit.bit_length() - 1
+                if not geometry.between_mask(start, end) & occupied:
+                    hints.append((cell_names[start], cell_names[end], captured_cells))
+        hints.sort(key=lambda hint: len(hint[2]), reverse=True)
+        return hints
+
+    def last_delta(self):
+        """
+        Takes no parameters and describes the last move made, see MoveDelta. Built from the undo stack, so it costs
+        nothing until it is asked for.
+        :return: MoveDelta, or None if there is no move to describe
+        """
+        if not self._undo_stack:
+            return None
+        start, end, captured, player = self._undo_stack[-1]
+        squares = []
+        while captured:
+            low_bit = captured & -captured
+            squares.append(low_bit.bit_length() - 1)
+            captured ^= low_bit
+        return MoveDelta(start, end, tuple(squares), self._player_turn, self._game_state)
+
+    def position_key(self):
+        """
+        Takes no parameters and returns the Zobrist key of the position, which includes the player to move.
+        :return: 64 bit integer, equal for equal positions
+        """
+        if DEBUG_POSITION_KEY:
+            self._check_position_key()
+        return self._position_key
+
+    def canonical_key(self):
+        """
+        Takes no parameters and returns the key of the position's canonical form, equal for positions that are the
+        same up to mirroring the board, or flipping it and swapping the colours. See canonical_position_key.
+        :return: (64 bit key, one of SYMMETRIES taking the position to its canonical form)
+        """
+        if self._geometry is not STANDARD_GEOMETRY:
+            return self._geometry.canonical_position_key(self._boards, self._player_turn)
+        return canonical_position_key(self._boards, self._player_turn)
+
+    def _check_position_key(self):
+        """
+        Checks the incremental position key against one computed from scratch, used when DEBUG_POSITION_KEY is on.
+        :return: Does not return anything, raises RuntimeError if the keys differ
+        """
+        expected = self._geometry.compute_position_key(self._boards, self._player_turn)
+        if self._position_key != expected:
+            raise RuntimeError('position key %016x does not match the board, expected %016x' %
+                               (self._position_key, expected))
+
+    def legal_moves(self, player=None):
+        """
+        Generator that yields every legal move of a player, walking each ray from each piece until the first blocker.
+        :param player: 'RED' or 'BLACK', the active player if None
+        :return: yields (start cell, end cell) tuples that make_move accepts, nothing once the game is finished
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return
+        player = PLAYER_INDEX[player or self._player_turn]
+        pieces = self._boards[player]
+        occupied = pieces | self._boards[1 - player]
+        cell_names = self._geometry.cell_names
+        rays = self._geometry.rays
+
+        # Loop over the player's pieces by taking the lowest set bit of the bitboard each time
+        while pieces:
+            low_bit = pieces & -pieces
+            pieces ^= low_bit
+            start = low_bit.bit_length() - 1
+            cell_start = cell_names[start]
+            for ray in rays[start]:
+                for end in ray:
+                    if occupied >> end & 1:
+                        break
+                    yield cell_start, cell_names[end]
+
+    def count_legal_moves(self, player=None):
+        """
+        Counts the legal moves of a player without building the moves.
+        :param player: 'RED' or 'BLACK', the active player if None
+        :return: the number of moves legal_moves would yield
+        """
+        if self.get_game_state() != 'UNFINISHED':
+            return 0
+        player = PLAYER_INDEX[player or self._player_turn]
+        pieces = self._boards[player]
+        occupied = pieces | self._boards[1 - player]
+        reachable = self._geometry.reachable_mask
+        count = 0
+        while pieces:
+            low_bit = pieces & -pieces
+            pieces ^= low_bit
+            count += reachable(low_bit.bit_length() - 1, occupied).bit_count()
+        return count
 
     def search_board(self, cell, index=None):
         """
-        Method that searches the board given using binary search
+        Method that looks up a cell on the board
         :param cell: The cell to be checked. Enter cell string, ex. 'b1'
         :param index: If None, then this method only returns the piece occupying the given cell. If not none,
         then this method returns the index of the given cell
-        :return: Either occupant of cell or cell index
-        """
-        # Perform binary search of the board information.
-        # Initialize first index number
-        first_index = 0
-        # Set final index number
-        last_index = len(self._hasami_board) - 1
-
-        # Do a while loop to search through the list, stopping when the first index reaches the last index number
-        while first_index <= last_index:
-            # Set the middle to floor division of first and last index number, gets the middle of the list
-            middle_index = (first_index + last_index) // 2
-            # Check if the middle number is the target
-            if self._hasami_board[middle_index][0] == cell and index is None:
-                return self._hasami_board[middle_index][1]
-            elif self._hasami_board[middle_index][0] == cell and index is not None:
-                # Rest index to None
-                index = None
-                return middle_index
-
-            # If not check if the middle number is greater than the target
-            if self._hasami_board[middle_index][0] > cell:
-                # Set the last as the middle number - 1
-                last_index = middle_index - 1
-            else:
-                # Else set the first as the middle number + 1
-                first_index = middle_index + 1
-        return
+        :return: Either occupant of cell ('R', 'B' or '.') or cell index, None if the cell is not on the board
+        """
+        square = self._geometry.cell_index.get(cell)
+        if square is None or index is not None:
+            return square
+        if self._boards[0] >> square & 1:
+            return 'B'
+        elif self._boards[1] >> square & 1:
+            return 'R'
+        return '.'
 
     def get_square_occupant(self, cell):
         """
         Method that returns the piece occupied given the cell.
         :param cell: The cell to be checked. Cell to be 'row & column' (for example 'b1')
-        :return: 'RED', 'BLACK', or 'NONE', or index of given cell
+        :return: 'RED', 'BLACK', or 'NONE', None if the cell is not on the board
         """
-
-        occupant = self.search_board(cell)
-
-        if occupant == '.':
-            return 'NONE'
-        elif occupant == 'R':
-            return 'RED'
-        elif occupant == 'B':
+        square = self._geometry.cell_index.get(cell)
+        if square is None:
+            return None
+        elif self._boards[0] >> square & 1:
             return 'BLACK'
+        elif self._boards[1] >> square & 1:
+            return 'RED'
+        return 'NONE'
 
     def move_check(self, cell_start, cell_end):
         """
         Takes two parameters and checks whether the move is valid. This checks if the move is either horizontal or
-        vertical, and also checks if there are any pieces between the start and ending cells by looping through the
-        board information.
+        vertical, and also checks if there are any pieces between the start and ending cells by masking the squares in
+        between against both bitboards.
         :param cell_start: Starting position of the piece to be moved
         :param cell_end: Ending position of th piece moved
-        :return: True if the move is valid, or false, the move is not valid.
+        :return: True if the move is valid, or false, the move is not valid or a cell is not on the board.
         """
-        # Check if there are any pieces in between the start and end cell.
-        # If move is vertical, columns are the same
-        if cell_start[1] == cell_end[1]:
-            # Check which direction this move is. Must be checked for the loop to work in the right direction.
-            if cell_start[0] > cell_end[0]:
-                limit1 = cell_end[0]
-                limit2 = cell_start[0]
-            else:
-                limit1 = cell_start[0]
-                limit2 = cell_end[0]
-            # Loop through the list.
-            for row in range(ord(limit1[0])+1, ord(limit2[0])):
-                # Concatenate to combine the row and the column
-                cell = chr(row) + str(cell_start[1])
-                # Check if the all the cells are empty, if not return False
-                if self.get_square_occupant(cell) != 'NONE':
-                    return False
-        # If move is horizontal, rows are the same.
-        else:
-            if cell_start[1] > cell_end[1]:
-                limit1 = cell_end[1]
-                limit2 = cell_start[1]
-            else:
-                limit1 = cell_start[1]
-                limit2 = cell_end[1]
-            for column in range(int(limit1)+1, int(limit2)):
-                cell = cell_start[0] + str(column)
-                if self.get_square_occupant(cell) != 'NONE':
-                    return False
-
-    def capture_check(self, cell, line, seq_check=None):
-        """
-        Recursive method that takes parameters, and returns the number of pieces that has been captured after a move.
-        :param cell: ending cell from the player's move
-        :param line: Directs the check whether right row, left row, top column, or bottom
-        :param seq_check: A list with the cell indexes that have been captured
-        :return: Does not return anything
-        """
-        # To capture pieces, it will follow the Custodian Capture. Where a player's pieces surround the opponent's
-        # piece. Given the ending cell, check the row and column to see if there are any pieces that can be taken.
-        # Right refers to the right of the cell, left to the left of the cell, top, refers to each row above the cell,
-        # and below refers to the rows below the cell.
-        if line == 'top':
-            # Check column to the top of the ending cell. Convert cell letter to ASCII using ord to get next row over
-            self._cell_id = ord(cell[0]) - 1
-            # Get the string of the cell to search for the index. Concatenate for the next cell.
-            self._cell_search = chr(self._cell_id) + cell[1]
-        elif line == 'bottom':
-            # Check column to the bottom of the ending cell. Convert cell letter to ASCII using ord to get next
-            # row
-            self._cell_id = ord(cell[0]) + 1
-            # Get the string of the cell to search for the index. Concatenate for the next cell.
-            self._cell_search = chr(self._cell_id) + cell[1]
-        elif line == 'left':
-            # Check row to the left of the ending cell
-            self._cell_id = int(cell[1]) - 1
-            # Get the string of the cell to search for the index. Concatenate for the next cell.
-            self._cell_search = cell[0] + str(self._cell_id)
-        elif line == 'right':
-            # Check row to the right
-            self._cell_id = int(cell[1]) + 1
-            # Get the string of the cell to search for the index. Concatenate for the next cell.
-            self._cell_search = cell[0] + str(self._cell_id)
-
-        # Base cases to end the recursion
-        # If the next cell is beyond the size of the board > i, then stop checking
-        if line == 'top' and self._cell_id < ord('a') or line == 'bottom' and self._cell_id > ord('i') or \
-                line == 'left' and self._cell_id < 1 or line == 'right' and self._cell_id > 9:
-            self._sequence_check = []
-            return
-        # Set a base case, where the cell to the next cell is the same as the active player, then end it.
-        elif self.get_square_occupant(self._cell_search)[0] == self.get_active_player()[0]:
-            if self._sequence_check is not None:
-                for captured_cell in self._sequence_check:
-                    self._captured_cells.append(captured_cell)
-                self._sequence_check = []
-            return
-        # If the next cell after that is empty, then that means no sequence, clear the sequence check list and return
-        elif self.get_square_occupant(self._cell_search) == 'NONE':
-            self._sequence_check = []
-            return
-
-        # Search for the index of that cell to search
-        board_index = self.search_board(self._cell_search, 'yes')
-        # Check the value of that cell if it is empty or if doesn't equal the active player
-        if self._hasami_board[board_index][1] != '.' or self._hasami_board[board_index][1] != \
-                self.get_active_player()[0]:
-            # Add the index to the list of checked cells
-            self._sequence_check.append(board_index)
-            # Call the check again to search the next cell
-            self.capture_check(self._cell_search, line, self._sequence_check)
-
-        return
+        geometry = self._geometry
+        start = geometry.cell_index.get(cell_start)
+        end = geometry.cell_index.get(cell_end)
+        if start is None or end is None:
+            return False
+        if geometry.square_row[start] != geometry.square_row[end] and \
+                geometry.square_column[start] != geometry.square_column[end]:
+            return False
+        return not geometry.between_mask(start, end) & (self._boards[0] | self._boards[1])
 
-    def corner_check(self, cell):
-        """
-        Method that takes 1 parameter, and checks a corner capture in the game.
-        :param cell: the ending cell from the player's move
-        :return: If the corner piece has been captured
-        """
-        # Check the top left corner
-        if cell == 'a2' or cell == 'b1':
-            if self.get_square_occupant('a1') != self.get_active_player()[0] and \
-                    self.get_square_occupant('a1') != 'NONE':
-                if self.get_square_occupant('b1')[0] == self.get_active_player()[0] and \
-                        self.get_square_occupant('a2')[0]\
-                        == self.get_active_player()[0]:
-                    self._captured_cells.append(self.search_board('a1', 'yes'))
-
-        # Check the top right corner of the board
-        elif cell == 'a8' or cell == 'b9':
-            if self.get_square_occupant('a9') != self.get_active_player()[0] and \
-                    self.get_square_occupant('a9') != 'NONE':
-                if self.get_square_occupant('b9')[0] == self.get_active_player()[0] and \
-                        self.get_square_occupant('a8')[0]\
-                        == self.get_active_player()[0]:
-                    self._captured_cells.append(self.search_board('a9', 'yes'))
-
-        # Check the bottom left corner of the board
-        elif cell == 'h1' or cell == 'i2':
-            if self.get_square_occupant('i1') != self.get_active_player()[0] and \
-                    self.get_square_occupant('i1') != 'NONE':
-                if self.get_square_occupant('h1')[0] == self.get_active_player()[0] and \
-                        self.get_square_occupant('i2')[0]\
-                        == self.get_active_player()[0]:
-                    self._captured_cells.append(self.search_board('i1', 'yes'))
-
-        # Check the bottom right corner of the board
-        elif cell == 'h9' or cell == 'i8':
-            if self.get_square_occupant('i9') != self.get_active_player()[0] and \
-                    self.get_square_occupant('i9') != 'NONE':
-                if self.get_square_occupant('h9')[0] == self.get_active_player()[0] and \
-                        self.get_square_occupant('i8')[0]\
-                        == self.get_active_player()[0]:
-                    self._captured_cells.append(self.search_board('i9', 'yes'))
+    def capture_check(self, cell):
+        """
+        Method that takes 1 parameter, and checks which pieces the active player captures by moving to the cell. This
+        covers the Custodian Capture along the row and column of the cell and the corner capture.
+        :param cell: the ending cell from the player's move, holding the active player's piece
+        :return: list of the captured square indexes, empty if nothing is captured
+        """
+        geometry = self._geometry
+        square = geometry.cell_index[cell]
+        player = PLAYER_INDEX[self._player_turn]
+        own = self._boards[player] | 1 << square
+        captured = geometry.capture_mask(own, self._boards[1 - player], square)
+        squares = []
+        while captured:
+            low_bit = captured & -captured
+            captured ^= low_bit
+            squares.append(low_bit.bit_length() - 1)
+        return squares
 
     def print_board(self):
         """
         Prints the board to see the moves
         :return: the board
         """
-        # Add a couple of spaces
-        self._print = '  '
-        # header row, loop through to print the column header numbers
-        for i in range(1, 10):
-            self._print += str(i) + ' '
-        print(self._print)
-        # Set the row as the ASCII Number letter a
-        row = 97
-        # Loop through the letters and the board information to print them.
-        for cell in range(0, len(self._hasami_board)):
-            # Print a new row
-            if cell == 0 or cell % 9 == 0:
-                self._print = chr(row)
-            # Get the information from the board and print
-            if self._hasami_board[cell][1] == 'R':
-                self._print += ' ' + 'R'
-            elif self._hasami_board[cell][1] == 'B':
-                self._print += ' ' + 'B'
-            else:
-                self._print += ' ' + self._hasami_board[cell][1]
-
-            # Checks if the cell ends with these specific numbers. If so, then prints the row.
-            if cell == 8 or cell == 17 or cell == 26 or cell == 35 or cell == 44 or cell == 53 or cell == 62 or \
-                    cell == 71 or cell == 80:
-                print(self._print)
-                row += 1
+        geometry = self._geometry
+        # Column numbers of two digits or more get as many characters on every row
+        width = len(str(geometry.columns))
+        # header row with the column numbers
+        print('  ' + ''.join(str(column).ljust(width) + ' ' for column in range(1, geometry.columns + 1)))
+        # Print each row, starting with the row letter followed by the piece on each square of the row
+        for row in range(geometry.rows):
+            line = geometry.row_names[row]
+            for square in range(row * geometry.columns, (row + 1) * geometry.columns):
+                line += ' ' + self.search_board(geometry.cell_names[square]).ljust(width)
+            print(line)
 
         print(' ')
 
     def set_board(self, index, cell, piece):
         """
-        Takes three parameters. This method updates the board list with the given information.
-        :param index: An integer, that is used to update the list within the board information list
+        Takes three parameters. This method updates the bitboards with the given information.
+        :param index: An integer, the square index of the cell being updated
         :param cell: A string, that represents the cell that is being replaced.
         :param piece: Either 'R', 'B', or '.', represents the pieces in the game
         :return: Does not return anything.
         """
-        self._hasami_board[index] = [cell, piece]
+        if self._shared:
+            self._unshare()
+        bit = 1 << index
+        zobrist_pieces = self._geometry.zobrist_pieces
+        for player in range(len(PLAYERS)):
+            if self._boards[player] & bit:
+                self._boards[player] &= ~bit
+                self._position_key ^= zobrist_pieces[player][index]
+        if piece in PIECES:
+            self._boards[PIECES.index(piece)] |= bit
+            self._position_key ^= zobrist_pieces[PIECES.index(piece)][index]
+        if self._threats is not None:
+            self._mark_threats(index, index, 0)
         return
 
 def main():
     """
     Main function to run the Hasami Shogi game. This lets the players take turn, and after each move is made, the
-    board is printed to see the move of the player
+    board is printed to see the move of the player. With --headless, games are read one per line from a file or
+    standard input instead, and one result line per game is written to standard output, see hasamivalidate.py.
     :return: Doesn't return anything
     """
+    parser = argparse.ArgumentParser(description='Hasami Shogi Game')
+    parser.add_argument('--headless', action='store_true',
+                        help='replay games, one per line, and write one result line per game without a board')
+    parser.add_argument('games', nargs='?', default='-', help='file of games for --headless, - for standard input')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for --headless')
+    parser.add_argument('--rows', type=int, default=BOARD_ROWS, help='rows of the board to play on')
+    parser.add_argument('--columns', type=int, default=BOARD_COLUMNS, help='columns of the board to play on')
+    parser.add_argument('--hints', action='store_true', help='show the capturing moves of the player to move')
+    args = parser.parse_args()
+    geometry = board_geometry(args.rows, args.columns)
+    if args.headless:
+        from hasamivalidate import stream_games
+        try:
+            if args.games == '-':
+                stream_games(sys.stdin, sys.stdout, args.workers, geometry=geometry)
+            else:
+                with open(args.games) as games:
+                    stream_games(games, sys.stdout, args.workers, geometry=geometry)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader of the pipe has stopped, as with head, which is not an error for a filter. Send what is left
+            # in the output buffer to devnull so it isn't flushed to the closed pipe at exit.
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
 
     print("--------------------------------------")
     print("---Welcome to the Hasami Shogi Game---")
@@ -422,12 +1378,15 @@ def main():
           "example, 'f1, f4'. \n")
 
     print("The Board")
-    game = HasamiShogiGame()
+    game = HasamiShogiGame(geometry)
     game.print_board()
 
 
     while game.get_game_state() == "UNFINISHED":
         print(game.get_active_player() + "'s" + " " + "turn")
+        if args.hints:
+            for cell_start, cell_end, captured_cells in game.capture_hints():
+                print("Hint: " + cell_start + ", " + cell_end + " captures " + ", ".join(captured_cells))
 
         start_move = str(input("Type in piece to move [ENTER]: "))
         end_move = str(input("Enter cell to move piece [ENTER]: "))
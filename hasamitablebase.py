@@ -0,0 +1,163 @@
+# Endgame tablebase lookup for the Hasami Shogi Game. A tablebase file holds the result of every position of some
+# material classes, a class being the number of pieces of the player to move and of the opponent, for example 2 against
+# 2. It is built by hasamitablegen.py and read here through a memory map, one byte per position, found in O(1) from the
+# two bitboards.
+#
+# A position's byte is 0 for a draw (including positions where the player to move has no legal move), an odd number p
+# when the player to move wins with the p-th ply from here, and an even number p when the player to move loses after p
+# plies, playing on as long as possible.
+
+import mmap
+import struct
+
+from hasamishogigame import BOARD_SQUARES, PLAYER_INDEX, STANDARD_GEOMETRY
+
+FILE_MAGIC = b'HSTB\x01'
+# Number of classes, then one entry per class: pieces of the player to move, pieces of the opponent and the byte
+# offset of the class's table in the file.
+FILE_HEADER = struct.Struct('<B')
+CLASS_ENTRY = struct.Struct('<BBQ')
+
+DRAW = 0
+
+# Most pieces per side in a tablebase class
+MAX_PIECES = 9
+
+# BINOMIAL[n][k] is n choose k, for the combination ranks
+BINOMIAL = [[1] + [0] * MAX_PIECES]
+for _n in range(1, BOARD_SQUARES + 1):
+    BINOMIAL.append([1] + [BINOMIAL[_n - 1][_k - 1] + BINOMIAL[_n - 1][_k] for _k in range(1, MAX_PIECES + 1)])
+
+
+def combination_rank(board):
+    """
+    Numbers the sets of k squares from 0 to (81 choose k) - 1, in the combinatorial number system: the set of squares
+    s1 < s2 < ... < sk is number C(s1, 1) + C(s2, 2) + ... + C(sk, k).
+    :param board: Bitboard of the squares
+    :return: rank of the set of squares
+    """
+    rank = 0
+    k = 1
+    while board:
+        low_bit = board & -board
+        board ^= low_bit
+        rank += BINOMIAL[low_bit.bit_length() - 1][k]
+        k += 1
+    return rank
+
+
+def class_size(mover_pieces, opponent_pieces):
+    """
+    Returns the number of bytes of a class table. Every pair of square sets has a byte, pairs that share a square are
+    never looked up.
+    :param mover_pieces: Pieces of the player to move
+    :param opponent_pieces: Pieces of the opponent
+    :return: number of positions in the table
+    """
+    return BINOMIAL[BOARD_SQUARES][mover_pieces] * BINOMIAL[BOARD_SQUARES][opponent_pieces]
+
+
+def position_index(mover, opponent):
+    """
+    Returns the place of a position in its class table.
+    :param mover: Bitboard of the player to move
+    :param opponent: Bitboard of the opponent
+    :return: index into the table of class (mover pieces, opponent pieces)
+    """
+    return combination_rank(mover) * BINOMIAL[BOARD_SQUARES][opponent.bit_count()] + combination_rank(opponent)
+
+
+def write_tablebase(path, tables):
+    """
+    Writes a tablebase file.
+    :param path: Path of the file
+    :param tables: dict mapping (mover pieces, opponent pieces) to the bytes-like table of the class
+    :return: Does not return anything
+    """
+    classes = sorted(tables)
+    for material in classes:
+        if len(tables[material]) != class_size(*material):
+            raise ValueError('table of class %d-%d has the wrong size' % material)
+    offset = len(FILE_MAGIC) + FILE_HEADER.size + CLASS_ENTRY.size * len(classes)
+    with open(path, 'wb') as tablebase:
+        tablebase.write(FILE_MAGIC)
+        tablebase.write(FILE_HEADER.pack(len(classes)))
+        for mover_pieces, opponent_pieces in classes:
+            tablebase.write(CLASS_ENTRY.pack(mover_pieces, opponent_pieces, offset))
+            offset += class_size(mover_pieces, opponent_pieces)
+        for material in classes:
+            tablebase.write(tables[material])
+
+
+class Tablebase:
+    """
+    Memory mapped tablebase file. Use as a context manager, or call close when done.
+    """
+
+    def __init__(self, path):
+        """
+        Opens and maps the tablebase file and reads its class directory.
+        :param path: Path of the file
+        """
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(FILE_MAGIC)] != FILE_MAGIC:
+            self.close()
+            raise ValueError('%s is not a Hasami Shogi tablebase file' % path)
+        count, = FILE_HEADER.unpack_from(self._map, len(FILE_MAGIC))
+        # Offset of each class table, by (mover pieces, opponent pieces)
+        self.classes = {}
+        for entry in range(count):
+            mover_pieces, opponent_pieces, offset = CLASS_ENTRY.unpack_from(
+                self._map, len(FILE_MAGIC) + FILE_HEADER.size + entry * CLASS_ENTRY.size)
+            self.classes[(mover_pieces, opponent_pieces)] = offset
+
+    def probe_boards(self, mover, opponent):
+        """
+        Looks up a position given as bitboards.
+        :param mover: Bitboard of the player to move
+        :param opponent: Bitboard of the opponent
+        :return: the position's byte, see the top of the file, or None if its class is not in the tablebase
+        """
+        offset = self.classes.get((mover.bit_count(), opponent.bit_count()))
+        if offset is None:
+            return None
+        return self._map[offset + position_index(mover, opponent)]
+
+    def probe(self, game):
+        """
+        Looks up the position of a game.
+        :param game: HasamiShogiGame
+        :return: the position's byte, see the top of the file, or None if the game is finished, is not on the standard
+        board or its class is not in the tablebase
+        """
+        if game.get_game_state() != 'UNFINISHED' or game.get_geometry() is not STANDARD_GEOMETRY:
+            return None
+        boards = game.get_bitboards()
+        player = PLAYER_INDEX[game.get_active_player()]
+        return self.probe_boards(boards[player], boards[1 - player])
+
+    def close(self):
+        """
+        Unmaps and closes the file.
+        :return: Does not return anything
+        """
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def describe(value):
+    """
+    Describes a tablebase byte.
+    :param value: byte from Tablebase.probe
+    :return: string such as 'win in 3', 'loss in 4' or 'draw'
+    """
+    if value == DRAW:
+        return 'draw'
+    return '%s in %d' % ('win' if value % 2 else 'loss', value)
@@ -0,0 +1,395 @@
+# Builds endgame tablebases for the Hasami Shogi Game by retrograde analysis. Every position of each material class is
+# solved at once with NumPy array operations, and the work is spread over a pool of worker processes. The result is
+# written in the format read by hasamitablebase.py. Needs NumPy.
+#
+# A class (m, n) holds the positions where the player to move has m pieces and the opponent n. Moves that capture lead
+# to a class with fewer pieces, solved before, or win outright when the opponent is left with one piece. Moves that
+# don't capture lead from class (m, n) to class (n, m), so the two are solved together: first every move of every
+# position is made once to count its moves and look up its captures, then positions are solved one ply at a time,
+# walking moves backwards from the positions solved at the ply before.
+#
+# Example: python hasamitablegen.py 2 tablebase.hstb      all classes with 2 pieces per side, 10 MB
+#
+# Every class with at most 2 pieces per side fits in memory. Classes with 3 pieces have 81 choose 3 = 85320 square sets
+# per side, and their tables and working arrays need far more memory than one machine has.
+
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from hasamishogigame import BOARD_SQUARES, CORNER_GUARDS, RAYS
+from hasamitablebase import BINOMIAL, DRAW, class_size, write_tablebase
+
+# Fewest pieces of a side in a class, a side with one piece has lost
+MIN_PIECES = 2
+
+# RAY_TABLE[square, direction, k] is the square k + 1 steps from square in a LINE_STEPS direction, or -1 off the
+# board. Row -1, an extra row of -1, is what a square of -1 reads, so rays can be followed past the edge.
+MAX_DISTANCE = max(len(ray) for rays in RAYS for ray in rays)
+RAY_TABLE = np.full((BOARD_SQUARES + 1, len(RAYS[0]), MAX_DISTANCE), -1, dtype=np.int16)
+for _square, _rays in enumerate(RAYS):
+    for _direction, _ray in enumerate(_rays):
+        RAY_TABLE[_square, _direction, :len(_ray)] = _ray
+
+# Corner captures, the corner square and other guard square of each square, -1 for squares not next to a corner
+CORNER_OF = np.full(BOARD_SQUARES + 1, -1, dtype=np.int16)
+GUARD_OF = np.full(BOARD_SQUARES + 1, -1, dtype=np.int16)
+for _square, (_corner, _guard) in CORNER_GUARDS.items():
+    CORNER_OF[_square] = _corner
+    GUARD_OF[_square] = _guard
+
+BINOMIAL_TABLE = np.array(BINOMIAL, dtype=np.int64)
+
+# No exit of that kind, in the exit_win array
+NO_WIN = 255
+
+
+def combination_table(pieces):
+    """
+    Lists every set of squares of a given size in rank order, see combination_rank.
+    :param pieces: Number of squares in each set
+    :return: (81 choose pieces, pieces) int16 array, each row sorted
+    """
+    table = np.array(list(combinations(range(BOARD_SQUARES), pieces)), dtype=np.int16)
+    order = np.argsort(ranks(table))
+    return table[order]
+
+
+def ranks(squares):
+    """
+    Ranks sets of squares, the same as combination_rank of hasamitablebase.
+    :param squares: (N, k) array, each row sorted
+    :return: (N,) int64 array of ranks
+    """
+    rank = np.zeros(len(squares), dtype=np.int64)
+    for column in range(squares.shape[1]):
+        rank += BINOMIAL_TABLE[squares[:, column], column + 1]
+    return rank
+
+
+def captured_pieces(end, own, opponent):
+    """
+    Finds the opponent pieces captured by a piece arriving on end, by custodian or corner capture.
+    :param end: (N,) array of the squares moved to
+    :param own: (N, m) array of the mover's squares, end included
+    :param opponent: (N, n) array of the opponent's squares
+    :return: (N, n) bool array, True for the captured opponent pieces
+    """
+    captured = np.zeros(opponent.shape, dtype=bool)
+    # Only moves that end next to an opponent piece can capture, the rest are left out
+    near = (opponent == CORNER_OF[end][:, None]).any(axis=1)
+    for direction in range(RAY_TABLE.shape[1]):
+        near |= (opponent == RAY_TABLE[end, direction, 0][:, None]).any(axis=1)
+    rows = np.flatnonzero(near)
+    if len(rows) < len(end):
+        captured[rows] = captured_pieces(end[rows], own[rows], opponent[rows]) if len(rows) else False
+        return captured
+
+    steps = min(opponent.shape[1] + 1, MAX_DISTANCE)
+    for direction in range(RAY_TABLE.shape[1]):
+        # Opponent pieces next to end in this direction, in an unbroken line
+        run = np.ones(len(end), dtype=bool)
+        line = np.zeros(opponent.shape, dtype=bool)
+        for k in range(steps):
+            square = RAY_TABLE[end, direction, k]
+            if k:
+                # An own piece right after the line closes it
+                closed = run & (own == square[:, None]).any(axis=1)
+                captured |= line & closed[:, None]
+            here = opponent == square[:, None]
+            run &= here.any(axis=1)
+            line |= here & run[:, None]
+    corner = CORNER_OF[end]
+    guarded = (own == GUARD_OF[end][:, None]).any(axis=1)
+    captured |= (opponent == corner[:, None]) & guarded[:, None]
+    return captured
+
+
+class _ClassData:
+    """
+    Positions of one class being solved.
+    """
+
+    def __init__(self, material, valid, remaining, exit_win, exit_loss, exit_draw):
+        """
+        Holds the results of the forward pass.
+        :param material: (mover pieces, opponent pieces)
+        :param valid: bool array, False where the two sides share a square
+        :param remaining: Moves without a capture not yet known to lose, per position
+        :param exit_win: Plies to win through the best capturing move, NO_WIN if none wins
+        :param exit_loss: Plies to lose through the longest losing capturing move, 0 if none
+        :param exit_draw: True where a capturing move leads to a draw
+        """
+        self.material = material
+        self.values = np.zeros(len(valid), dtype=np.uint8)
+        self.unsolved = valid
+        self.remaining = remaining
+        self.exit_win = exit_win
+        self.exit_loss = exit_loss
+        self.exit_draw = exit_draw
+        # Ply at which a position is lost, once every move is known to lose, 0 until then
+        self.loss_at = np.zeros(len(valid), dtype=np.int32)
+
+
+# Tables of the classes solved before, set in each worker by _init_worker
+_solved = {}
+_combinations = {}
+
+
+def _init_worker(solved):
+    """
+    Gives a worker process the tables of the smaller classes, looked up by capturing moves.
+    :param solved: dict of class tables, by material
+    :return: Does not return anything
+    """
+    _solved.clear()
+    _solved.update(solved)
+
+
+def _squares(pieces):
+    """
+    Returns the combination table of a size, built once per process.
+    :param pieces: Number of squares in each set
+    :return: combination_table(pieces)
+    """
+    if pieces not in _combinations:
+        _combinations[pieces] = combination_table(pieces)
+    return _combinations[pieces]
+
+
+def _decode(material, indexes):
+    """
+    Turns table indexes into square arrays.
+    :param material: (mover pieces, opponent pieces)
+    :param indexes: int64 array of indexes in the class table
+    :return: (mover squares (N, m), opponent squares (N, n))
+    """
+    opponent_sets = BINOMIAL[BOARD_SQUARES][material[1]]
+    return _squares(material[0])[indexes // opponent_sets], _squares(material[1])[indexes % opponent_sets]
+
+
+def _slides(pieces, occupied, piece, direction, rows):
+    """
+    Follows one piece's slides in one direction, one square further each time.
+    :param pieces: (N, k) squares of the side moving
+    :param occupied: (N, m + n) squares of every piece
+    :param piece: Column of the piece in pieces
+    :param direction: Direction, in LINE_STEPS order
+    :param rows: bool array of the positions to follow
+    :return: yields (positions, squares) for each distance, the positions whose piece can slide that far and the
+    square it reaches
+    """
+    positions = np.flatnonzero(rows)
+    start = pieces[positions, piece]
+    occupied = occupied[positions]
+    for k in range(MAX_DISTANCE):
+        square = RAY_TABLE[start, direction, k]
+        free = (square >= 0) & ~(occupied == square[:, None]).any(axis=1)
+        if not free.all():
+            positions = positions[free]
+            start = start[free]
+            occupied = occupied[free]
+            square = square[free]
+        if not len(positions):
+            return
+        yield positions, square
+
+
+def _forward_chunk(material, start, stop):
+    """
+    Worker task of the forward pass. Makes every move of the positions start to stop of a class, counts the moves that
+    don't capture, and looks up where the capturing moves lead.
+    :param material: (mover pieces, opponent pieces)
+    :param start: First table index
+    :param stop: Table index after the last
+    :return: (valid, remaining, exit_win, exit_loss, exit_draw) arrays for the positions
+    """
+    mover_pieces, opponent_pieces = material
+    mover, opponent = _decode(material, np.arange(start, stop, dtype=np.int64))
+    occupied = np.concatenate([mover, opponent], axis=1)
+    valid = ~(mover[:, :, None] == opponent[:, None, :]).any(axis=(1, 2))
+    size = stop - start
+    remaining = np.zeros(size, dtype=np.int16)
+    exit_win = np.full(size, NO_WIN, dtype=np.uint8)
+    exit_loss = np.zeros(size, dtype=np.uint8)
+    exit_draw = np.zeros(size, dtype=bool)
+
+    for piece in range(mover_pieces):
+        for direction in range(RAY_TABLE.shape[1]):
+            for positions, end in _slides(mover, occupied, piece, direction, valid):
+                own = mover[positions]
+                own[:, piece] = end
+                captured = captured_pieces(end, own, opponent[positions])
+                count = captured.sum(axis=1)
+                remaining[positions[count == 0]] += 1
+                left = opponent_pieces - count
+                won = positions[(count > 0) & (left < MIN_PIECES)]
+                exit_win[won] = 1
+                for pieces_left in range(MIN_PIECES, opponent_pieces):
+                    group = np.flatnonzero(left == pieces_left)
+                    if not len(group):
+                        continue
+                    # The opponent moves next in the smaller class, with the pieces that were not captured
+                    survivors = opponent[positions[group]][~captured[group]].reshape(len(group), pieces_left)
+                    own_sorted = np.sort(own[group], axis=1)
+                    index = ranks(survivors) * BINOMIAL[BOARD_SQUARES][mover_pieces] + ranks(own_sorted)
+                    value = _solved[(pieces_left, mover_pieces)][index].astype(np.int32)
+                    rows = positions[group]
+                    exit_draw[rows[value == DRAW]] = True
+                    losing = value % 2 == 1
+                    exit_loss[rows[losing]] = np.maximum(exit_loss[rows[losing]], value[losing] + 1)
+                    winning = (value != DRAW) & ~losing
+                    exit_win[rows[winning]] = np.minimum(exit_win[rows[winning]], value[winning] + 1)
+    return valid, remaining, exit_win, exit_loss, exit_draw
+
+
+def _predecessors_chunk(material, indexes):
+    """
+    Worker task of the backward pass. Finds the positions that reach the given positions with a move that doesn't
+    capture: the opponent, who just moved, slides the piece back to where it came from.
+    :param material: (mover pieces, opponent pieces) of the given positions
+    :param indexes: int64 array of table indexes
+    :return: int64 array of indexes in the table of class (opponent pieces, mover pieces), one per move, so a position
+    is listed once for each of the given positions it reaches
+    """
+    mover_pieces, opponent_pieces = material
+    mover, opponent = _decode(material, indexes)
+    occupied = np.concatenate([mover, opponent], axis=1)
+    found = []
+    for piece in range(opponent_pieces):
+        # A move onto this square that captured something would have led to a smaller class
+        quiet = ~captured_pieces(opponent[:, piece], opponent, mover).any(axis=1)
+        for direction in range(RAY_TABLE.shape[1]):
+            for positions, start in _slides(opponent, occupied, piece, direction, quiet):
+                before = opponent[positions]
+                before[:, piece] = start
+                before.sort(axis=1)
+                found.append(ranks(before) * BINOMIAL[BOARD_SQUARES][mover_pieces] + ranks(mover[positions]))
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+def retrograde(classes, predecessors):
+    """
+    Solves a group of classes one ply at a time. Positions with a capturing move that wins in p plies, and positions
+    with a move to a position lost at ply p - 1, are won at ply p. Positions whose moves all lose are lost one ply
+    after the longest of them. Positions left unsolved are draws.
+    :param classes: dict of _ClassData by material, with the forward pass results
+    :param predecessors: function (material, indexes) returning the indexes of the positions that reach those positions
+    with a move that doesn't capture, in the table of class (material[1], material[0])
+    :return: dict of the uint8 value tables by material
+    """
+    # Positions with no move left to look at: lost unless a capture wins or draws
+    for data in classes.values():
+        stuck = data.unsolved & (data.remaining == 0) & (data.exit_win == NO_WIN)
+        data.unsolved &= ~(stuck & (data.exit_draw | (data.exit_loss == 0)))
+        stuck &= data.unsolved
+        data.loss_at[stuck] = data.exit_loss[stuck]
+
+    # Positions solved at the ply before, by material
+    frontier = {}
+    ply = 0
+    while True:
+        ply += 1
+        solved = {}
+        for material, data in classes.items():
+            if ply % 2:
+                won = data.unsolved & (data.exit_win == ply)
+                partner = (material[1], material[0])
+                if partner in frontier:
+                    reached = predecessors(partner, frontier[partner])
+                    won[reached[data.unsolved[reached]]] = True
+                solved[material] = np.flatnonzero(won)
+            else:
+                solved[material] = np.flatnonzero(data.unsolved & (data.loss_at == ply))
+        if ply > 255 and any(len(positions) for positions in solved.values()):
+            raise OverflowError('positions more than 255 plies from the end do not fit a tablebase byte')
+        for material, positions in solved.items():
+            data = classes[material]
+            data.values[positions] = ply
+            data.unsolved[positions] = False
+
+        if ply % 2:
+            # Every move into a position won by the opponent is a losing move
+            for material, positions in solved.items():
+                if not len(positions):
+                    continue
+                partner = (material[1], material[0])
+                data = classes[partner]
+                reached = predecessors(material, positions)
+                reached = reached[data.unsolved[reached]]
+                np.subtract.at(data.remaining, reached, 1)
+                lost = np.unique(reached[data.remaining[reached] == 0])
+                lost = lost[(data.exit_win[lost] == NO_WIN) & ~data.exit_draw[lost]]
+                data.loss_at[lost] = np.maximum(ply + 1, data.exit_loss[lost])
+
+        frontier = solved
+        pending = any(len(positions) for positions in solved.values())
+        for data in classes.values():
+            pending = pending or bool((data.unsolved & ((data.loss_at > ply) |
+                                                        ((data.exit_win > ply) & (data.exit_win != NO_WIN)))).any())
+        if not pending:
+            return {material: data.values for material, data in classes.items()}
+
+
+def build_tablebase(max_pieces=2, workers=None, chunk_size=1 << 19, report=None):
+    """
+    Solves every class with 2 to max_pieces pieces per side, the smaller classes first.
+    :param max_pieces: Most pieces per side
+    :param workers: Worker processes, one per CPU if None
+    :param chunk_size: Positions given to a worker at a time
+    :param report: Function called with a line of progress text, or None
+    :return: dict of the uint8 value tables by material
+    """
+    tables = {}
+    groups = []
+    for total in range(2 * MIN_PIECES, 2 * max_pieces + 1):
+        for mover_pieces in range(MIN_PIECES, max_pieces + 1):
+            opponent_pieces = total - mover_pieces
+            if mover_pieces <= opponent_pieces <= max_pieces:
+                groups.append({(mover_pieces, opponent_pieces), (opponent_pieces, mover_pieces)})
+
+    for group in groups:
+        start_time = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tables,)) as pool:
+            classes = {}
+            for material in sorted(group):
+                size = class_size(*material)
+                starts = range(0, size, chunk_size)
+                results = list(pool.map(_forward_chunk, [material] * len(starts), starts,
+                                        [min(size, start + chunk_size) for start in starts]))
+                classes[material] = _ClassData(material, *(np.concatenate(arrays) for arrays in zip(*results)))
+
+            def predecessors(material, indexes):
+                chunks = [indexes[start:start + chunk_size] for start in range(0, len(indexes), chunk_size)]
+                return np.concatenate(list(pool.map(_predecessors_chunk, [material] * len(chunks), chunks)))
+
+            solved = retrograde(classes, predecessors)
+        tables.update(solved)
+        if report is not None:
+            for material in sorted(group):
+                values = solved[material]
+                report('class %d-%d: %d wins, %d losses, longest %d plies, %.1f s' % (
+                    material + (np.count_nonzero(values % 2 == 1), np.count_nonzero((values % 2 == 0) & (values > 0)),
+                                int(values.max()), time.perf_counter() - start_time)))
+    return tables
+
+
+def main():
+    """
+    Builds a tablebase file from the command line: most pieces per side, output path and optionally the number of
+    worker processes.
+    :return: Doesn't return anything
+    """
+    max_pieces = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    path = sys.argv[2] if len(sys.argv) > 2 else 'tablebase.hstb'
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    tables = build_tablebase(max_pieces, workers, report=print)
+    write_tablebase(path, {material: values.tobytes() for material, values in tables.items()})
+    print('wrote %s' % path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+# Self-play tournaments for the Hasami Shogi Game. Plays two players against each other over many games, spread over a
+# pool of worker processes, and writes one JSON line per game to a results file as the games finish. A run that was
+# stopped can be started again with the same arguments and only plays the games missing from the results file.
+#
+# Example: python hasamitournament.py search:depth=2 search:depth=2,mobility=3 --games 1000 --output results.jsonl
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from hasamishogigame import HasamiShogiGame
+from hasamibook import OpeningBook
+from hasamisearch import SearchEngine
+from hasamitablebase import Tablebase
+from hasamimcts import MCTSPlayer
+
+
+class RandomPlayer:
+    """
+    Player that makes a random legal move.
+    """
+
+    def __init__(self):
+        """
+        Random player has no options.
+        """
+
+    def new_game(self):
+        """
+        Called before each game.
+        :return: Does not return anything
+        """
+
+    def choose_move(self, game, rng):
+        """
+        Picks the move to make.
+        :param game: HasamiShogiGame to move in
+        :param rng: random.Random of the game
+        :return: (start cell, end cell), None if there is no legal move
+        """
+        moves = list(game.legal_moves())
+        return rng.choice(moves) if moves else None
+
+
+class SearchPlayer:
+    """
+    Player that makes the best move found by the alpha-beta SearchEngine.
+    """
+
+    def __init__(self, depth=3, time=None, table_bits=16, piece=100, mobility=1, tablebase=None, book=None,
+                 symmetry=0):
+        """
+        Initializes the search engine of the player. Options are given as text from the player spec.
+        :param depth: Deepest search in plies
+        :param time: Seconds per move, or None for no limit
+        :param table_bits: The transposition table holds 2 ** table_bits entries
+        :param piece: Evaluation weight of each captured piece
+        :param mobility: Evaluation weight of each legal move
+        :param tablebase: Path of an endgame tablebase file, or None
+        :param book: Path of an opening book file, or None
+        :param symmetry: 1 to share transposition table entries between symmetric positions
+        """
+        self._depth = int(depth)
+        self._time = None if time is None else float(time)
+        self._engine = SearchEngine(int(table_bits), float(piece), float(mobility),
+                                    None if tablebase is None else Tablebase(tablebase),
+                                    None if book is None else OpeningBook(book), symmetry=bool(int(symmetry)))
+
+    def new_game(self):
+        """
+        Called before each game, empties the search tables.
+        :return: Does not return anything
+        """
+        self._engine.clear()
+
+    def choose_move(self, game, rng):
+        """
+        Picks the move to make.
+        :param game: HasamiShogiGame to move in
+        :param rng: random.Random of the game, not used
+        :return: (start cell, end cell), None if there is no legal move
+        """
+        return self._engine.best_move(game, self._depth, self._time)
+
+
+# Player types by name, used by make_player
+PLAYER_TYPES = {
+    'random': RandomPlayer,
+    'search': SearchPlayer,
+    'mcts': MCTSPlayer,
+}
+
+
+def make_player(spec):
+    """
+    Creates a player from a spec such as 'random' or 'search:depth=2,mobility=3'.
+    :param spec: Player type name, optionally followed by a colon and comma separated name=value options
+    :return: player object with new_game and choose_move methods
+    """
+    name, _, options = spec.partition(':')
+    kwargs = dict(option.split('=', 1) for option in options.split(',') if option)
+    return PLAYER_TYPES[name](**kwargs)
+
+
+def game_seed(seed, game_id):
+    """
+    Returns the seed of one game of a tournament, the same in every process and every run.
+    :param seed: Seed of the tournament
+    :param game_id: Game number in the tournament
+    :return: string seed for random.Random
+    """
+    return '%d-%d' % (seed, game_id)
+
+
+def play_game(black, red, rng, opening_plies=4, max_plies=300):
+    """
+    Plays one game between two players.
+    :param black: player moving the Black pieces
+    :param red: player moving the Red pieces
+    :param rng: random.Random of the game, also used for the random opening moves
+    :param opening_plies: Number of random moves made before the players take over, so games differ
+    :param max_plies: The game is a draw after this many moves
+    :return: (game, plies) with the finished HasamiShogiGame
+    """
+    game = HasamiShogiGame()
+    black.new_game()
+    red.new_game()
+    players = {'BLACK': black, 'RED': red}
+    plies = 0
+    while game.get_game_state() == 'UNFINISHED' and plies < max_plies:
+        if plies < opening_plies:
+            moves = list(game.legal_moves())
+            move = rng.choice(moves) if moves else None
+        else:
+            move = players[game.get_active_player()].choose_move(game, rng)
+        if move is None:
+            break
+        game.make_move(*move)
+        plies += 1
+    return game, plies
+
+
+def _play_chunk(player_a, player_b, seed, game_ids, opening_plies, max_plies):
+    """
+    Worker task, plays a chunk of games. Player A moves Black in even games and Red in odd games.
+    :param player_a: spec of the first player
+    :param player_b: spec of the second player
+    :param seed: Seed of the tournament
+    :param game_ids: Game numbers to play
+    :param opening_plies: Number of random moves at the start of each game
+    :param max_plies: The game is a draw after this many moves
+    :return: list of result dicts, one per game
+    """
+    players = (make_player(player_a), make_player(player_b))
+    results = []
+    for game_id in game_ids:
+        rng = random.Random(game_seed(seed, game_id))
+        black, red = (players[0], players[1]) if game_id % 2 == 0 else (players[1], players[0])
+        start = time.perf_counter()
+        game, plies = play_game(black, red, rng, opening_plies, max_plies)
+        state = game.get_game_state()
+        results.append({
+            'game': game_id,
+            'black': player_a if game_id % 2 == 0 else player_b,
+            'red': player_b if game_id % 2 == 0 else player_a,
+            'winner': {'BLACK_WON': 'BLACK', 'RED_WON': 'RED'}.get(state, 'DRAW'),
+            'plies': plies,
+            'captures': [game.get_num_captured_pieces('BLACK'), game.get_num_captured_pieces('RED')],
+            'seconds': round(time.perf_counter() - start, 6),
+            'worker': os.getpid(),
+        })
+    return results
+
+
+def read_finished(output):
+    """
+    Reads the game numbers already in a results file. A line cut off by an interrupted run is removed from the file.
+    :param output: Path of the results file
+    :return: set of finished game numbers
+    """
+    finished = set()
+    if not os.path.exists(output):
+        return finished
+    with open(output, 'rb+') as results:
+        data = results.read()
+        # Drop a last line without its newline, it was only partly written
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            results.truncate(end)
+        for line in data[:end].splitlines():
+            if line.strip():
+                finished.add(json.loads(line)['game'])
+    return finished
+
+
+def run_tournament(player_a, player_b, num_games, output, workers=None, chunk_size=8, seed=0, opening_plies=4,
+                   max_plies=300):
+    """
+    Plays a tournament between two players over a pool of worker processes. Results are appended to the output file
+    as each chunk of games finishes, and games already in the file are not played again.
+    :param player_a: spec of the first player, see make_player
+    :param player_b: spec of the second player
+    :param num_games: Number of games in the tournament
+    :param output: Path of the JSON lines results file
+    :param workers: Number of worker processes, the number of CPUs if None
+    :param chunk_size: Number of games given to a worker at a time
+    :param seed: Seed of the tournament, each game gets its own seed from it
+    :param opening_plies: Number of random moves at the start of each game
+    :param max_plies: The game is a draw after this many moves
+    :return: dict with the games played, the wins of each player, games/sec and games/sec of each worker
+    """
+    finished = read_finished(output)
+    todo = [game_id for game_id in range(num_games) if game_id not in finished]
+    chunks = [todo[index:index + chunk_size] for index in range(0, len(todo), chunk_size)]
+    wins = {player_a: 0, player_b: 0, 'DRAW': 0}
+    worker_games = {}
+    worker_seconds = {}
+
+    start = time.perf_counter()
+    with open(output, 'a') as results, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_play_chunk, player_a, player_b, seed, chunk, opening_plies, max_plies)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                results.write(json.dumps(result) + '\n')
+                winner = result['winner']
+                if winner == 'DRAW':
+                    wins['DRAW'] += 1
+                else:
+                    # The same spec may play both sides, count the win for whichever side won
+                    wins[result[winner.lower()]] += 1
+                worker = result['worker']
+                worker_games[worker] = worker_games.get(worker, 0) + 1
+                worker_seconds[worker] = worker_seconds.get(worker, 0.0) + result['seconds']
+            results.flush()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'played': len(todo),
+        'skipped': len(finished),
+        'wins': wins,
+        'games_per_sec': len(todo) / elapsed if elapsed > 0 else 0.0,
+        'worker_games_per_sec': {worker: worker_games[worker] / worker_seconds[worker]
+                                 for worker in worker_games if worker_seconds[worker] > 0},
+    }
+
+
+def main():
+    """
+    Runs a tournament from the command line and prints the summary.
+    :return: Doesn't return anything
+    """
+    parser = argparse.ArgumentParser(description='Hasami Shogi self-play tournament')
+    parser.add_argument('player_a', help="first player, for example 'random' or 'search:depth=2,mobility=3'")
+    parser.add_argument('player_b', help='second player')
+    parser.add_argument('--games', type=int, default=100, help='number of games')
+    parser.add_argument('--output', default='tournament.jsonl', help='results file, appended to and resumed from')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, default one per CPU')
+    parser.add_argument('--chunk-size', type=int, default=8, help='games given to a worker at a time')
+    parser.add_argument('--seed', type=int, default=0, help='tournament seed')
+    parser.add_argument('--opening-plies', type=int, default=4, help='random moves at the start of each game')
+    parser.add_argument('--max-plies', type=int, default=300, help='moves before a game is a draw')
+    args = parser.parse_args()
+
+    summary = run_tournament(args.player_a, args.player_b, args.games, args.output, args.workers, args.chunk_size,
+                             args.seed, args.opening_plies, args.max_plies)
+    print('played %d games, %d already in %s' % (summary['played'], summary['skipped'], args.output))
+    for name, count in summary['wins'].items():
+        print('%-30s %d' % (name, count))
+    print('%.2f games/sec' % summary['games_per_sec'])
+    for worker, rate in sorted(summary['worker_games_per_sec'].items()):
+        print('worker %-8d %.2f games/sec' % (worker, rate))
+
+
+if __name__ == '__main__':
+    main()
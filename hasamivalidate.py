@@ -0,0 +1,246 @@
+# Bulk validation of uploaded Hasami Shogi games. Replays each game's moves on one reused HasamiShogiGame per process,
+# and reports the first illegal move, the final position and the result of every game.
+#
+# Games can also be streamed as text, one game per line, for example from `python hasamishogigame.py --headless`. A
+# line holds the cells of the moves in order, 'i1 c1 a1 b1' or 'i1-c1,a1-b1', and gives one tab separated result line:
+# the result ('UNFINISHED', 'BLACK_WON', 'RED_WON', or 'ILLEGAL' at the first illegal or unreadable move), the number
+# of moves made, the captured pieces of Black and Red, and the final position as the hex of a CompactGameState.
+
+import re
+import time
+from collections import deque, namedtuple
+from multiprocessing import Pool
+
+from hasamishogigame import HasamiShogiGame, CompactGameState, STANDARD_GEOMETRY
+
+# Outcome of validating one game. illegal_ply is the index of the first illegal move, or None if every move was legal.
+# The position is the one after the last legal move, as the two bitboards, the player to move and the captured pieces
+# of each player.
+ValidationResult = namedtuple('ValidationResult',
+                              ['illegal_ply', 'result', 'black', 'red', 'active_player', 'black_captured',
+                               'red_captured'])
+
+
+class GameValidator:
+    """
+    Validates games one after the other on a single HasamiShogiGame, which is reset between games.
+    """
+
+    def __init__(self, geometry=STANDARD_GEOMETRY):
+        """
+        Creates the game object that is reused for every game.
+        :param geometry: BoardGeometry of the board the games are played on
+        """
+        self.geometry = geometry
+        self._game = HasamiShogiGame(geometry)
+
+    def validate(self, moves):
+        """
+        Replays one game and stops at the first illegal move. Moves may be cells ('i1', 'c1') or square indexes.
+        :param moves: iterable of (start, end) moves
+        :return: ValidationResult
+        """
+        game = self._game
+        game.reset()
+        make_square_move = game.make_square_move
+        cell_index = self.geometry.cell_index
+        illegal_ply = None
+        for ply, (start, end) in enumerate(moves):
+            if start.__class__ is str:
+                start = cell_index.get(start)
+                end = cell_index.get(end)
+                if start is None or end is None:
+                    illegal_ply = ply
+                    break
+            if not make_square_move(start, end):
+                illegal_ply = ply
+                break
+        black, red = game.get_bitboards()
+        return ValidationResult(illegal_ply, game.get_game_state(), black, red, game.get_active_player(),
+                                game.get_num_captured_pieces('BLACK'), game.get_num_captured_pieces('RED'))
+
+    def validate_all(self, games):
+        """
+        Validates a stream of games in this process.
+        :param games: iterable of move lists
+        :return: yields a ValidationResult per game, in order
+        """
+        validate = self.validate
+        for moves in games:
+            yield validate(moves)
+
+
+# Validator of a worker process, created once by _init_worker
+_worker_validator = None
+
+
+def _init_worker(geometry=STANDARD_GEOMETRY):
+    """
+    Creates the validator of a worker process.
+    :param geometry: BoardGeometry of the board the games are played on
+    :return: Does not return anything
+    """
+    global _worker_validator
+    _worker_validator = GameValidator(geometry)
+
+
+def _validate_chunk(games):
+    """
+    Worker task, validates a chunk of games.
+    :param games: list of move lists
+    :return: list of ValidationResult
+    """
+    return [_worker_validator.validate(moves) for moves in games]
+
+
+def _chunks(items, chunk_size):
+    """
+    Groups a stream into lists.
+    :param items: iterable
+    :param chunk_size: Number of items per list
+    :return: yields lists of chunk_size items, the last one shorter
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ordered_map(task, chunks, workers, geometry=STANDARD_GEOMETRY):
+    """
+    Runs a task on a stream of chunks over a pool of worker processes, keeping results in order. Unlike Pool.imap, only
+    a few chunks per worker are read ahead, so a stream larger than memory is never read in all at once.
+    :param task: Function of a chunk, run in the workers
+    :param chunks: iterable of chunks
+    :param workers: Number of processes
+    :param geometry: BoardGeometry of the board the games are played on
+    :return: yields the result of each chunk, in order
+    """
+    with Pool(workers, initializer=_init_worker, initargs=(geometry,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(task, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def validate_games(games, workers=1, chunk_size=1000, geometry=STANDARD_GEOMETRY):
+    """
+    Validates a stream of games, in this process or in a pool of worker processes, each with its own reused game.
+    :param games: iterable of move lists, each move a (start, end) pair of cells or square indexes
+    :param workers: Number of processes, 1 to validate in this process
+    :param chunk_size: Number of games sent to a worker at a time
+    :param geometry: BoardGeometry of the board the games are played on
+    :return: yields a ValidationResult per game, in the same order as the games
+    """
+    if workers <= 1:
+        yield from GameValidator(geometry).validate_all(games)
+        return
+    for results in _ordered_map(_validate_chunk, _chunks(games, chunk_size), workers, geometry):
+        yield from results
+
+
+# Separators between the cells of a game line
+_SEPARATORS = re.compile(r'[\s,;-]+')
+
+
+def parse_game_line(line):
+    """
+    Reads the moves of one game line. Text that is not a cell is kept, so the move holding it is found illegal.
+    :param line: string, the cells of the moves in order
+    :return: list of (start cell, end cell) moves, the last end cell '' if the line has an odd number of cells
+    """
+    cells = _SEPARATORS.split(line.strip())
+    if cells == ['']:
+        return []
+    if len(cells) % 2:
+        cells.append('')
+    return list(zip(cells[0::2], cells[1::2]))
+
+
+def format_result(result, num_moves, geometry=STANDARD_GEOMETRY):
+    """
+    Formats the result line of a streamed game, see the top of the file.
+    :param result: ValidationResult of the game
+    :param num_moves: Number of moves in the game
+    :param geometry: BoardGeometry of the board the game was played on
+    :return: string, without a newline
+    """
+    state = CompactGameState.pack((result.black, result.red), result.active_player, result.black_captured,
+                                  result.red_captured, geometry)
+    if result.illegal_ply is None:
+        return '%s\t%d\t%d\t%d\t%s' % (result.result, num_moves, result.black_captured, result.red_captured,
+                                       bytes(state).hex())
+    return 'ILLEGAL\t%d\t%d\t%d\t%s' % (result.illegal_ply, result.black_captured, result.red_captured,
+                                        bytes(state).hex())
+
+
+def _stream_chunk(lines):
+    """
+    Worker task, reads, replays and formats a chunk of game lines.
+    :param lines: list of game lines
+    :return: string of result lines, each ending in a newline
+    """
+    validator = _worker_validator
+    output = []
+    for line in lines:
+        moves = parse_game_line(line)
+        output.append(format_result(validator.validate(moves), len(moves), validator.geometry))
+        output.append('\n')
+    return ''.join(output)
+
+
+def stream_games(lines, output, workers=1, chunk_size=1000, geometry=STANDARD_GEOMETRY):
+    """
+    Replays a stream of game lines and writes one result line per game, in order, without rendering any board. Only
+    a few chunks of lines are held in memory at a time, so it can be used as a filter over logs of any size.
+    :param lines: iterable of game lines, such as an open text file
+    :param output: Text file to write the result lines to
+    :param workers: Number of processes, 1 to replay in this process
+    :param chunk_size: Number of lines sent to a worker at a time
+    :param geometry: BoardGeometry of the board the games are played on
+    :return: Number of games
+    """
+    count = 0
+    chunks = _chunks(lines, chunk_size)
+    if workers <= 1:
+        if _worker_validator is None or _worker_validator.geometry is not geometry:
+            _init_worker(geometry)
+        results = map(_stream_chunk, chunks)
+    else:
+        results = _ordered_map(_stream_chunk, chunks, workers, geometry)
+    for chunk in results:
+        output.write(chunk)
+        count += chunk.count('\n')
+    return count
+
+
+def main():
+    """
+    Validates the games of a record file and prints the number of games with illegal moves and the games/sec.
+    :return: Doesn't return anything
+    """
+    import sys
+    from hasamirecord import GameRecordReader
+
+    path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    start = time.perf_counter()
+    count = 0
+    illegal = 0
+    with GameRecordReader(path) as reader:
+        for result in validate_games((record.squares() for record in reader), workers):
+            count += 1
+            illegal += result.illegal_ply is not None
+    elapsed = time.perf_counter() - start
+    print('%d games, %d with illegal moves, %.0f games/sec' % (count, illegal, count / elapsed))
+
+
+if __name__ == '__main__':
+    main()